@@ -0,0 +1,87 @@
+"""
+Keyset (cursor) pagination shared by the list endpoints.
+
+Pages are fetched with ``WHERE <ordering field> < <cursor position>`` on the
+model's ordering index rather than OFFSET, so the cost of a page doesn't
+grow with how deep the client has scrolled. Cursors are opaque (DRF encodes
+the position in the ``cursor`` query param). The page size defaults to
+``settings.API_PAGE_SIZE`` and can be changed per request with
+``?page_size=`` up to ``settings.API_MAX_PAGE_SIZE``.
+
+Relevance-ranked search results are the exception (``WindowCountPagination``):
+they are never scrolled deep, and clients want the match count, which
+would otherwise cost a second query.
+"""
+from django.conf import settings
+from django.db.models import Count, Window
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+
+class KeysetPagination(CursorPagination):
+    page_size = getattr(settings, 'API_PAGE_SIZE', 50)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 500)
+    # trailing pk keeps the order stable when timestamps tie
+    ordering = ('-created_at', '-pk')
+
+
+class SaleDatePagination(KeysetPagination):
+    ordering = ('-sale_date', '-pk')
+
+
+class SubmittedAtPagination(KeysetPagination):
+    ordering = ('-submitted_at', '-pk')
+
+
+class TimestampPagination(KeysetPagination):
+    ordering = ('-timestamp', '-pk')
+
+
+class DayPagination(KeysetPagination):
+    ordering = ('-day', '-pk')
+
+
+class NewestIdPagination(KeysetPagination):
+    ordering = ('-pk',)
+
+
+class RankPagination(KeysetPagination):
+    """For querysets annotated with a relevance ``rank``."""
+    ordering = ('-rank', '-pk')
+
+
+class WindowCountPagination(LimitOffsetPagination):
+    """``?limit=`` / ``?offset=`` pages that read the total from ``COUNT(*) OVER ()`` in the page query.
+
+    Only the first ``max_results`` matches can be paged through.
+    """
+    default_limit = 20
+    max_limit = 100
+    max_results = getattr(settings, 'SEARCH_MAX_RESULTS', 1000)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+        stop = min(self.offset + self.limit, self.max_results)
+        page = []
+        if self.offset < stop:
+            page = list(queryset.annotate(total_count=Window(Count('*')))[self.offset:stop])
+        if page:
+            self.count = page[0].total_count
+        else:
+            # past the end (or the cap): nothing to read the count from
+            self.count = queryset.count() if self.offset else 0
+        return page
+
+    def restore(self, request, count):
+        """Page state for a page read elsewhere (a cache) out of ``count`` matches."""
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+        self.count = count
+
+    def get_next_link(self):
+        if self.offset + self.limit >= self.max_results:
+            return None
+        return super().get_next_link()
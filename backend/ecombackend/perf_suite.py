@@ -0,0 +1,488 @@
+"""
+Query-budget suite for the REST endpoints.
+
+Seeds production-sized data (10k products, 1M sales, 100k submissions, 1k
+page permissions, ...), then requests every route of the apps listed in
+``ROUTE_MODULES`` and records, per case, the status code, number of SQL
+queries, total SQL time and wall time. The numbers are compared with the
+committed ``perf_budget.json``; see ``ecombackend/test_perf_budgets.py``
+for how to run it.
+
+Each case runs twice inside a rolled-back transaction: once to warm the
+process caches (page rules, public schemas, ...) and once measured, so the
+budget describes steady-state requests and write cases don't change the
+data the next case sees.
+
+The suite needs PostgreSQL, like the migrations (JSONB GIN indexes and the
+generated search column); volumes can be scaled down with ``PERF_SCALE``.
+"""
+import io
+import json
+import os
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, resolve
+from django.utils import timezone
+
+
+BUDGET_FILE = os.path.join(os.path.dirname(__file__), 'perf_budget.json')
+
+ROUTE_MODULES = (
+    'products.urls',
+    'productManagement.urls',
+    'productsearch.urls',
+    'forms_app.urls',
+    'users.urls',
+    'UserHome.urls',
+)
+
+# routes the suite deliberately doesn't request
+EXCLUDED_ROUTES = {
+    'api/users/social/tiktok/callback/': 'calls the TikTok OAuth API',
+    'api/users/social/facebook/callback/': 'calls the Facebook OAuth API',
+    'api/users/social/instagram/callback/': 'calls the Instagram OAuth API',
+}
+
+VOLUMES = {
+    'users': 50,
+    'products': 10_000,
+    'sales': 1_000_000,
+    'dashboards': 100,
+    'forms': 10,
+    'submissions': 100_000,
+    'page_permissions': 1_000,
+    'inventory_products': 10_000,
+    'stock_history': 100_000,
+    'price_history': 100_000,
+    'search_logs': 500_000,
+    'profile_fields': 20,
+}
+
+PASSWORD = 'perf-suite-password'
+
+# timings may exceed the budget by this factor (plus TIME_SLACK_MS) before failing
+TIME_TOLERANCE = float(os.getenv('PERF_TIME_TOLERANCE', '2.0'))
+TIME_SLACK_MS = 5.0
+
+# ``needs_rows``: the case filters the seeded data, and must find some of it
+Case = namedtuple('Case', 'name method path payload format needs_rows', defaults=(None, 'json', False))
+
+FIELDS = [
+    {'id': 'name', 'type': 'text', 'labels': {'en': 'Name'}},
+    {'id': 'city', 'type': 'dropdown', 'labels': {'en': 'City'}},
+    {'id': 'amount', 'type': 'number', 'labels': {'en': 'Amount'}},
+]
+CITIES = ['Kathmandu', 'Pokhara', 'Lalitpur', 'Biratnagar', 'Dharan', 'Butwal', 'Chitwan', 'Janakpur']
+
+
+def volumes(scale):
+    return {name: max(3, round(count * scale)) for name, count in VOLUMES.items()}
+
+
+def seed(scale=1.0):
+    """Create the suite's data set; returns the ids the cases point at."""
+    from forms_app.models import DeletionJob, FormSchema, FormSubmission
+    from productManagement.models import Category, PriceHistory, Product, StockHistory
+    from productManagement.history import compact_history
+    from productsearch.analytics import rollup_searches
+    from productsearch.models import SearchLog
+    from products.models import Dashboard, ProductForm, ProductSalesStats, Sales
+    from products.rollup import rebuild_daily_rollup
+    from products.stats import compute_sales_totals
+    from UserHome.models import ProfileField, ProfileValue
+    from users.models import PagePermission, UserRole
+
+    n = volumes(scale)
+    owner = User.objects.create_user(
+        'perf_owner', 'perf@example.com', PASSWORD, is_superuser=True, is_staff=True
+    )
+    UserRole.objects.create(user=owner, role='superemployee')
+    users = User.objects.bulk_create(
+        User(username=f'perf_user_{i}', email=f'perf_user_{i}@example.com') for i in range(n['users'])
+    )
+    UserRole.objects.bulk_create(UserRole(user=u, role='employee') for u in users[::3])
+    other = User.objects.get(username='perf_user_0')
+
+    forms = [
+        FormSchema.objects.create(
+            title=f'Perf form {i}', language_config={'primary': 'en'}, fields_structure=FIELDS, created_by=owner
+        )
+        for i in range(n['forms'])
+    ]
+    form_ids = [f.pk for f in forms]
+
+    products = ProductForm.objects.bulk_create(
+        ProductForm(
+            product_name=f'Product {i}', product_type=f'type{i % 20}', user=owner,
+            form_schema_id=form_ids[i % len(form_ids)] if i % 10 == 0 else None,
+        )
+        for i in range(n['products'])
+    )
+    product_ids = [p.pk for p in products]
+
+    categories = Category.objects.bulk_create(Category(name=f'Category {i}') for i in range(10))
+    inventory = Product.objects.bulk_create(
+        Product(
+            name=f'Item {i}', sku=f'SKU-{i:07d}', category=categories[i % len(categories)],
+            price=(i % 500) + 1, current_stock=i % 50,
+        )
+        for i in range(n['inventory_products'])
+    )
+    inventory_ids = [p.pk for p in inventory]
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO {sales} (product_id, sales_amount, quantity, sale_date, customer_name)
+            SELECT (%s::int[])[1 + g %% %s],
+                   ((g %% 500) + 1)::numeric(12, 2),
+                   1 + g %% 5,
+                   now() - ((g %% 365) || ' days')::interval - ((g %% 86400) || ' seconds')::interval,
+                   'customer ' || (g %% 1000)
+            FROM generate_series(1, %s) AS g
+            """.format(sales=Sales._meta.db_table),
+            [product_ids, len(product_ids), n['sales']],
+        )
+        cursor.execute(
+            """
+            INSERT INTO {submissions} (form_schema_id, data, submitted_at)
+            SELECT (%s::bigint[])[1 + g %% %s],
+                   jsonb_build_object(
+                       'name', 'customer' || g,
+                       -- not g %% n_cities: that shares a factor with the form index, and
+                       -- would leave whole forms without some cities
+                       'city', (%s::text[])[1 + (g / %s) %% %s],
+                       'amount', g %% 1000
+                   ),
+                   now() - (g || ' seconds')::interval
+            FROM generate_series(1, %s) AS g
+            """.format(submissions=FormSubmission._meta.db_table),
+            [form_ids, len(form_ids), CITIES, len(form_ids), len(CITIES), n['submissions']],
+        )
+        cursor.execute(
+            """
+            INSERT INTO {history} (product_id, change_type, quantity, timestamp)
+            SELECT (%s::bigint[])[1 + g %% %s],
+                   (ARRAY['purchase', 'sale', 'return', 'manual_update'])[1 + g %% 4],
+                   1 + g %% 20,
+                   now() - (g || ' minutes')::interval
+            FROM generate_series(1, %s) AS g
+            """.format(history=connection.ops.quote_name(StockHistory._meta.db_table)),
+            [inventory_ids, len(inventory_ids), n['stock_history']],
+        )
+        # a year of repricing on a catalog that existed before it
+        cursor.execute(
+            'UPDATE {products} SET created_at = now() - interval \'400 days\''.format(
+                products=connection.ops.quote_name(Product._meta.db_table)
+            )
+        )
+        cursor.execute(
+            """
+            INSERT INTO {prices} (product_id, old_price, new_price, changed_at)
+            SELECT (%s::bigint[])[1 + g %% %s], 1 + g %% 500, 1 + (g + 1) %% 500,
+                   now() - ((g * 5) || ' minutes')::interval
+            FROM generate_series(1, %s) AS g
+            """.format(prices=connection.ops.quote_name(PriceHistory._meta.db_table)),
+            [inventory_ids, len(inventory_ids), n['price_history']],
+        )
+        # a month of searches over 5,000 distinct queries, most of them for the first few
+        # dozen (as real traffic is), one in seven finding nothing
+        cursor.execute(
+            """
+            INSERT INTO {logs} (user_id, query, results_count, searched_at)
+            SELECT NULL, 'Item ' || floor(5000 * power(((g::bigint * 7919) %% 5000) / 5000.0, 3)),
+                   g %% 7, now() - ((g * 5) || ' seconds')::interval
+            FROM generate_series(1, %s) AS g
+            """.format(logs=connection.ops.quote_name(SearchLog._meta.db_table)),
+            [n['search_logs']],
+        )
+
+    # fold the older half of the stock history into daily summaries, as the nightly job would
+    compact_history(retention_days=30)
+    rollup_searches()
+
+    # the SQL inserts bypass the Sales signals, so build the derived tables directly
+    ProductSalesStats.objects.bulk_create(
+        ProductSalesStats(product_id=product_id, **totals)
+        for product_id, totals in compute_sales_totals().items()
+    )
+    rebuild_daily_rollup()
+
+    dashboards = Dashboard.objects.bulk_create(
+        Dashboard(product_id=product_ids[i], product_name=f'Product {i}', sales_table='sales', user=owner)
+        for i in range(n['dashboards'])
+    )
+    permissions = PagePermission.objects.bulk_create(
+        PagePermission(name=f'Section {i}', path=f'/perf/section-{i}/', allowed_roles='admin,superemployee')
+        for i in range(n['page_permissions'])
+    )
+    fields = ProfileField.objects.bulk_create(
+        ProfileField(user=owner, label=f'Field {i}', field_type='text', order=i)
+        for i in range(n['profile_fields'])
+    )
+    values = ProfileValue.objects.bulk_create(
+        ProfileValue(user=owner, field=field, value=f'value {field.order}') for field in fields[: len(fields) // 2]
+    )
+    job = DeletionJob.objects.create(kind='form', target='gone0000', requested_by=owner, status='done')
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    newest_sale = Sales.objects.order_by('-sales_id').values_list('sales_id', flat=True).first()
+    oldest_sale = Sales.objects.order_by('sales_id').values_list('sales_id', flat=True).first()
+    submission_id = FormSubmission.objects.filter(form_schema_id=form_ids[0]).order_by('-id').values_list('id', flat=True).first()
+
+    return {
+        'owner': owner,
+        'other_user_id': other.pk,
+        'product_id': product_ids[0],
+        'spare_product_id': product_ids[-1],
+        'sale_id': newest_sale,
+        'spare_sale_id': oldest_sale,
+        'dashboard_id': dashboards[0].pk,
+        'spare_dashboard_id': dashboards[-1].pk,
+        'form_id': form_ids[0],
+        'form_slug': forms[0].slug,
+        'spare_form_slug': forms[-1].slug,
+        'submission_id': submission_id,
+        # the first Pokhara submission of the first form (g = n_forms), and every one it prefixes
+        'submission_search': f'customer{len(form_ids)}',
+        'job_id': job.pk,
+        'inventory_id': inventory_ids[0],
+        'inventory_category_id': categories[0].pk,
+        'pos_batch_ids': inventory_ids[:1000],
+        'page_permission_id': permissions[0].pk,
+        'profile_field_id': fields[-1].pk,
+        'filled_field_id': fields[0].pk,
+        'profile_value_id': values[0].pk,
+    }
+
+
+def _png():
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), 'white').save(buffer, format='PNG')
+    return SimpleUploadedFile('avatar.png', buffer.getvalue(), content_type='image/png')
+
+
+def _catalog_csv(rows=2000):
+    """Half existing SKUs (every other one repriced), half new ones."""
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    lines = ['sku,name,price,category']
+    for i in range(rows):
+        sku = f'SKU-{i:07d}' if i % 2 else f'NEW-{i:07d}'
+        lines.append(f'{sku},Item {i},{(i % 500) + 1 + (i % 4 == 1)}.00,Category {i % 12}')
+    return SimpleUploadedFile('catalog.csv', '\n'.join(lines).encode(), content_type='text/csv')
+
+
+def cases(d):
+    """Every request the suite makes, keyed by a stable name."""
+    now = timezone.now()
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    refresh = str(RefreshToken.for_user(d['owner']))
+    slug, pid, sid = d['form_slug'], d['product_id'], d['sale_id']
+    return [
+        # products.urls
+        Case('products.list', 'get', '/api/products/'),
+        Case('products.create', 'post', '/api/products/', {'product_name': 'New', 'product_type': 'type1'}),
+        Case('products.by_type', 'get', '/api/products/by_type/', {'type': 'type1'}),
+        Case('products.retrieve', 'get', f'/api/products/{pid}/'),
+        Case('products.update', 'patch', f'/api/products/{pid}/', {'product_name': 'Renamed'}),
+        Case('products.destroy', 'delete', f"/api/products/{d['spare_product_id']}/"),
+        Case('products.sales_summary', 'get', f'/api/products/{pid}/sales_summary/'),
+        Case('sales.list', 'get', '/api/sales/'),
+        Case('sales.create', 'post', '/api/sales/', {'product': pid, 'sales_amount': '9.99', 'quantity': 1}),
+        Case('sales.analytics', 'get', '/api/sales/analytics/', {'bucket': 'month', 'top': 10}),
+        Case('sales.by_product', 'get', '/api/sales/by_product/', {'product_id': pid}),
+        Case('sales.retrieve', 'get', f'/api/sales/{sid}/'),
+        Case('sales.update', 'patch', f'/api/sales/{sid}/', {'quantity': 3}),
+        Case('sales.destroy', 'delete', f"/api/sales/{d['spare_sale_id']}/"),
+        Case('dashboards.list', 'get', '/api/dashboards/'),
+        Case('dashboards.create', 'post', '/api/dashboards/', {'product': pid, 'product_name': 'Product 0', 'sales_table': 'sales', 'user': d['owner'].pk}),
+        Case('dashboards.retrieve', 'get', f"/api/dashboards/{d['dashboard_id']}/"),
+        Case('dashboards.update', 'patch', f"/api/dashboards/{d['dashboard_id']}/", {'sales_table': 'sales_v2'}),
+        Case('dashboards.destroy', 'delete', f"/api/dashboards/{d['spare_dashboard_id']}/"),
+        Case('dashboards.data', 'get', f"/api/dashboards/{d['dashboard_id']}/data/"),
+        # productManagement.urls
+        Case('inventory.list', 'get', '/api/inventory/products/'),
+        Case('inventory.detail', 'get', f"/api/inventory/products/{d['inventory_id']}/"),
+        Case('inventory.add', 'post', '/api/inventory/products/add/', {'name': 'Thing', 'sku': 'SKU-NEW', 'price': '5.00'}),
+        Case('inventory.import', 'post', '/api/inventory/products/import/', lambda: {'file': _catalog_csv()}, 'multipart'),
+        Case('inventory.stock', 'post', f"/api/inventory/products/{d['inventory_id']}/stock/", {'quantity': 5, 'change_type': 'purchase'}),
+        Case('inventory.stock_bulk', 'post', '/api/inventory/products/stock/bulk/', {'adjustments': [
+            {'product': pid, 'quantity': q, 'change_type': 'sale' if q < 0 else 'purchase'}
+            for pid in d['pos_batch_ids'] for q in (-1, 3)
+        ]}),
+        Case('inventory.prices_at', 'post', '/api/inventory/products/prices/', {'lines': [
+            {'sku': f'SKU-{i:07d}', 'at': (now - timedelta(hours=i % 5000)).isoformat()}
+            for i in range(10_000)
+        ]}),
+        Case('inventory.history', 'get', f"/api/inventory/products/{d['inventory_id']}/history/"),
+        Case('inventory.history_window', 'get', f"/api/inventory/products/{d['inventory_id']}/history/", {
+            'start': (timezone.now() - timedelta(days=20)).isoformat(), 'end': (timezone.now() - timedelta(days=10)).isoformat(),
+        }),
+        Case('inventory.history_daily', 'get', f"/api/inventory/products/{d['inventory_id']}/history/daily/"),
+        Case('inventory.stock_at', 'get', f"/api/inventory/products/{d['inventory_id']}/stock-at/", {
+            'at': (timezone.now() - timedelta(days=10)).isoformat(),
+        }),
+        Case('inventory.stock_at_compacted', 'get', f"/api/inventory/products/{d['inventory_id']}/stock-at/", {
+            'at': (timezone.now() - timedelta(days=45)).isoformat(),
+        }),
+        Case('inventory.low_stock', 'get', '/api/inventory/products/low-stock/', {'threshold': 2}),
+        Case('inventory.low_stock_feed', 'get', '/api/inventory/products/low-stock/'),
+        Case('inventory.low_stock_events', 'get', '/api/inventory/products/low-stock/events/', {'wait': 0}),
+        # productsearch.urls
+        Case('search.products', 'get', '/api/search/', {'q': 'item 12'}),
+        Case('search.products_sku', 'get', '/api/search/', {'q': 'SKU-0000042'}),
+        Case('search.products_category', 'get', '/api/search/', {'q': 'item', 'category': d['inventory_category_id']}),
+        Case('search.autocomplete', 'get', '/api/search/autocomplete/', {'q': 'item 12'}),
+        Case('search.analytics_top', 'get', '/api/search/analytics/top/'),
+        Case('search.analytics_top_zero', 'get', '/api/search/analytics/top/', {'zero_results': 'true', 'limit': 50}),
+        Case('search.analytics_trend', 'get', '/api/search/analytics/trend/', {'interval': 'day', 'since': (now - timedelta(days=30)).isoformat()}),
+        Case('search.analytics_trend_query', 'get', '/api/search/analytics/trend/', {'query': ' ITEM  12 '}),
+        Case('search.cache_stats', 'get', '/api/search/cache/'),
+        # forms_app.urls
+        Case('forms.list', 'get', '/api/forms/'),
+        Case('forms.create', 'post', '/api/forms/', {'title': 'New form', 'language_config': {'primary': 'en'}, 'fields_structure': FIELDS}),
+        Case('forms.retrieve', 'get', f'/api/forms/{slug}/'),
+        Case('forms.update', 'patch', f'/api/forms/{slug}/', {'title': 'Renamed form'}),
+        Case('forms.destroy', 'delete', f"/api/forms/{d['spare_form_slug']}/"),
+        Case('forms.public', 'get', f'/api/forms/{slug}/public/'),
+        Case('forms.submissions', 'get', f'/api/forms/{slug}/submissions/'),
+        Case('forms.submissions_search', 'get', f'/api/forms/{slug}/submissions/', {'search': d['submission_search'], 'filter_city': 'Pokhara'},
+             needs_rows=True),
+        Case('forms.export', 'get', f'/api/forms/{slug}/export/', {'filter_city': 'Pokhara'}, needs_rows=True),
+        Case('forms.related_data', 'get', f'/api/forms/{slug}/related_data/', {'target_slug': slug, 'display_field': 'name', 'q': 'customer1', 'limit': 50}),
+        Case('submissions.list', 'get', '/api/submissions/'),
+        Case('submissions.create', 'post', '/api/submissions/', {'slug': slug, 'data': {'name': 'x', 'city': 'Pokhara', 'amount': 1}}),
+        Case('submissions.retrieve', 'get', f"/api/submissions/{d['submission_id']}/"),
+        Case('submissions.update', 'patch', f"/api/submissions/{d['submission_id']}/", {'form_schema': d['form_id'], 'data': {'name': 'y', 'city': 'Dharan', 'amount': 2}}),
+        Case('submissions.destroy', 'delete', f"/api/submissions/{d['submission_id']}/"),
+        Case('deletion_jobs.list', 'get', '/api/deletion-jobs/'),
+        Case('deletion_jobs.retrieve', 'get', f"/api/deletion-jobs/{d['job_id']}/"),
+        # users.urls
+        Case('users.login', 'post', '/api/users/login/', {'email': 'perf@example.com', 'password': PASSWORD}),
+        Case('users.token_refresh', 'post', '/api/users/token/refresh/', {'refresh': refresh}),
+        Case('users.register', 'post', '/api/users/register/', {'username': 'newbie', 'email': 'newbie@example.com', 'password': PASSWORD}),
+        Case('users.logout', 'post', '/api/users/logout/', {'refresh': refresh}),
+        Case('users.me', 'get', '/api/users/me/'),
+        Case('users.list', 'get', '/api/users/'),
+        Case('users.list_by_role', 'get', '/api/users/', {'role': 'employee'}),
+        Case('users.list_by_prefix', 'get', '/api/users/', {'q': 'perf_user_1'}),
+        Case('users.set_role', 'post', f"/api/users/{d['other_user_id']}/role/", {'role': 'employee'}),
+        Case('page_permissions.list', 'get', '/api/users/page-permissions/'),
+        Case('page_permissions.create', 'post', '/api/users/page-permissions/', {'name': 'New', 'path': '/perf/new/', 'allowed_roles': ['admin']}),
+        Case('page_permissions.retrieve', 'get', f"/api/users/page-permissions/{d['page_permission_id']}/"),
+        Case('page_permissions.update', 'put', f"/api/users/page-permissions/{d['page_permission_id']}/", {'name': 'Renamed', 'path': '/perf/section-0/'}),
+        Case('page_permissions.destroy', 'delete', f"/api/users/page-permissions/{d['page_permission_id']}/"),
+        # UserHome.urls
+        Case('user_home.home', 'get', '/api/user/home/'),
+        Case('user_home.profile_fields', 'get', '/api/user/profile-fields/'),
+        Case('user_home.profile_fields_create', 'post', '/api/user/profile-fields/', {'label': 'Nickname', 'field_type': 'text'}),
+        Case('user_home.profile_field', 'get', f"/api/user/profile-fields/{d['profile_field_id']}/"),
+        Case('user_home.profile_field_update', 'put', f"/api/user/profile-fields/{d['profile_field_id']}/", {'label': 'Renamed', 'field_type': 'text'}),
+        Case('user_home.profile_field_destroy', 'delete', f"/api/user/profile-fields/{d['profile_field_id']}/"),
+        Case('user_home.profile_form', 'get', '/api/user/profile-form/'),
+        Case('user_home.save_profile', 'post', '/api/user/profile/save/', {'data': [{'field': d['filled_field_id'], 'value': 'updated'}]}),
+        Case('user_home.upload_picture', 'post', '/api/user/profile/upload/', lambda: {'profile_picture': _png()}, 'multipart'),
+        Case('user_home.view_profile', 'get', '/api/user/profile/view/'),
+        Case('user_home.delete_value', 'delete', f"/api/user/profile/value/{d['profile_value_id']}/"),
+    ]
+
+
+def _join(prefix, route):
+    return prefix + (route[1:] if route.startswith('^') else route)
+
+
+def _walk(patterns, prefix, inside):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            module = pattern.urlconf_name if isinstance(pattern.urlconf_name, str) else None
+            yield from _walk(pattern.url_patterns, _join(prefix, str(pattern.pattern)), inside or module in ROUTE_MODULES)
+        elif inside and isinstance(pattern, URLPattern):
+            route = _join(prefix, str(pattern.pattern))
+            # DRF's .json-style suffix variants and router root views aren't separate endpoints
+            if '(?P<format>' in route or '<drf_format_suffix' in route or pattern.name == 'api-root':
+                continue
+            yield route
+
+
+def suite_routes():
+    """Every route mounted from ROUTE_MODULES that the suite must request."""
+    return {route for route in _walk(get_resolver().url_patterns, '', False) if route not in EXCLUDED_ROUTES}
+
+
+def uncovered_routes(case_list):
+    covered = {resolve(case.path).route for case in case_list}
+    return sorted(suite_routes() - covered)
+
+
+def measure(client, case):
+    payload = case.payload() if callable(case.payload) else case.payload
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        if case.method == 'get':
+            response = client.get(case.path, payload)
+        else:
+            response = getattr(client, case.method)(case.path, payload, format=case.format)
+        if getattr(response, 'streaming', False):
+            body = b''.join(response.streaming_content)
+        wall = time.perf_counter() - start
+    sql = sum(float(q['time']) for q in queries.captured_queries)
+    result = {
+        'status': response.status_code,
+        'queries': len(queries),
+        'sql_ms': round(sql * 1000, 1),
+        'wall_ms': round(wall * 1000, 1),
+    }
+    if case.needs_rows:
+        # not part of the budget; the suite checks it on every run
+        result['rows'] = body.count(b'\n') if response.streaming else len(response.json()['results'])
+    return result
+
+
+def run_case(client, case):
+    """Warm up, then measure; both runs are rolled back."""
+    for _ in range(2):
+        with transaction.atomic():
+            result = measure(client, case)
+            transaction.set_rollback(True)
+    return result
+
+
+def load_budget(path=BUDGET_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'scale': None, 'endpoints': {}}
+
+
+def write_budget(results, scale, path=BUDGET_FILE):
+    with open(path, 'w') as f:
+        json.dump({'scale': scale, 'endpoints': results}, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def over_budget(result, budget, check_timings=True):
+    """Human-readable reasons ``result`` breaks ``budget`` (empty if it doesn't)."""
+    problems = []
+    if result['status'] != budget['status']:
+        problems.append(f"status {result['status']} (budget {budget['status']})")
+    if result['queries'] > budget['queries']:
+        problems.append(f"{result['queries']} queries (budget {budget['queries']})")
+    if check_timings:
+        for key in ('sql_ms', 'wall_ms'):
+            limit = budget[key] * TIME_TOLERANCE + TIME_SLACK_MS
+            if result[key] > limit:
+                problems.append(f"{key} {result[key]} (budget {budget[key]}, limit {limit:.1f})")
+    return problems
@@ -25,6 +25,10 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DATA_UPLOAD_MAX_MEMORY_SIZE = 104857600  # 100MB
 FILE_UPLOAD_MAX_MEMORY_SIZE = 104857600  # 100MB
+# Spool uploaded files to disk in chunks instead of holding them in memory;
+# FileSystemStorage then moves the temp file into MEDIA_ROOT without a copy.
+FILE_UPLOAD_HANDLERS = ['django.core.files.uploadhandler.TemporaryFileUploadHandler']
+FORM_UPLOAD_WORKERS = int(os.getenv('FORM_UPLOAD_WORKERS', '4'))
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/6.0/howto/deployment/checklist/
@@ -68,6 +72,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'corsheaders',  # Added for CORS support
     'users',
@@ -169,6 +174,62 @@ REST_FRAMEWORK = {
     )
 }
 
+# Shared cache for cached payloads and the version tokens other workers
+# check (page rules, related_data, public form schemas). REDIS_URL selects
+# Redis; CACHE_BACKEND=db uses the database cache table (run
+# `manage.py createcachetable` once); otherwise each process gets its own
+# LocMem cache.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+elif os.getenv('CACHE_BACKEND') == 'db':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+
+# How often each worker re-reads the shared PagePermission version
+# (users/page_rules.py); requests in between match against its compiled rules
+PAGE_RULES_RECHECK_SECONDS = float(os.getenv('PAGE_RULES_RECHECK_SECONDS', '1.0'))
+
+# Keyset pagination for list endpoints (see ecombackend/pagination.py)
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', '50'))
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', '500'))
+# Ranked search results can be paged through this many matches deep
+SEARCH_MAX_RESULTS = int(os.getenv('SEARCH_MAX_RESULTS', '1000'))
+# Per-worker LRU of ranked search pages (productsearch/result_cache.py):
+# at most this many pages (0 turns it off), each kept this many seconds
+SEARCH_CACHE_SIZE = int(os.getenv('SEARCH_CACHE_SIZE', '5000'))
+SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', '300'))
+# How often each worker checks the shared change log for product changes
+# (productsearch/autocomplete.py); lookups in between never leave the process
+AUTOCOMPLETE_REFRESH_SECONDS = float(os.getenv('AUTOCOMPLETE_REFRESH_SECONDS', '1.0'))
+# Search logs are queued in-process and written in batches by a background
+# thread (productsearch/search_log.py); a full queue drops logs, never searches.
+# SEARCH_LOG_ASYNC=False writes each log inline instead.
+SEARCH_LOG_ASYNC = os.getenv('SEARCH_LOG_ASYNC', 'True') == 'True'
+SEARCH_LOG_QUEUE_SIZE = int(os.getenv('SEARCH_LOG_QUEUE_SIZE', '10000'))
+SEARCH_LOG_BATCH_SIZE = int(os.getenv('SEARCH_LOG_BATCH_SIZE', '500'))
+SEARCH_LOG_FLUSH_MS = int(os.getenv('SEARCH_LOG_FLUSH_MS', '200'))
+# prune_search_logs deletes raw search logs older than this (once rolled up hourly)
+SEARCH_LOG_RETENTION_DAYS = int(os.getenv('SEARCH_LOG_RETENTION_DAYS', '30'))
+
+# Largest batch accepted by /api/inventory/products/stock/bulk/
+INVENTORY_BULK_MAX_ADJUSTMENTS = int(os.getenv('INVENTORY_BULK_MAX_ADJUSTMENTS', '10000'))
+# Largest batch of (sku, at) lines accepted by /api/inventory/products/prices/
+INVENTORY_PRICE_LOOKUP_MAX_LINES = int(os.getenv('INVENTORY_PRICE_LOOKUP_MAX_LINES', '100000'))
+# /api/inventory/products/low-stock/events/ polling interval and stream length
+LOW_STOCK_STREAM_POLL_SECONDS = int(os.getenv('LOW_STOCK_STREAM_POLL_SECONDS', '2'))
+LOW_STOCK_STREAM_MAX_SECONDS = int(os.getenv('LOW_STOCK_STREAM_MAX_SECONDS', '300'))
+# compact_stock_history folds StockHistory older than this into daily summaries
+STOCK_HISTORY_RETENTION_DAYS = int(os.getenv('STOCK_HISTORY_RETENTION_DAYS', '90'))
+
 # JWT Settings
 from datetime import timedelta
 SIMPLE_JWT = {
@@ -0,0 +1,77 @@
+"""
+Query-budget regression suite (see ecombackend/perf_suite.py).
+
+Seeding takes a few minutes at full size, so it only runs on request:
+
+    PERF_SUITE=1 python manage.py test ecombackend.test_perf_budgets
+
+``PERF_SCALE=0.01`` seeds 1% of the volumes; query counts and status codes
+are still checked against the budget, timings only when the scale matches
+the one the budget was recorded at. ``PERF_SUITE_UPDATE=1`` rewrites
+``perf_budget.json`` from the current run instead of checking it.
+"""
+import os
+import unittest
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from productsearch import autocomplete, result_cache, search_log
+
+from . import perf_suite
+
+
+SCALE = float(os.getenv('PERF_SCALE', '1.0'))
+UPDATE = bool(os.getenv('PERF_SUITE_UPDATE'))
+
+
+@unittest.skipUnless(os.getenv('PERF_SUITE'), 'set PERF_SUITE=1 to run the query-budget suite')
+class QueryBudgetSuite(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = perf_suite.seed(SCALE)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.data['owner'])
+        self.cases = perf_suite.cases(self.data)
+        # search logs stay queued: a writer thread couldn't see the seeded users
+        patcher = mock.patch.object(search_log, 'writer', search_log.SearchLogWriter(background=False))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # nor could a thread loading the autocomplete index see the seeded products
+        patcher = mock.patch.object(autocomplete, 'BACKGROUND_LOAD', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # without this the measured run of every search case is a cache hit;
+        # the budget should track the search query itself
+        patcher = mock.patch.object(result_cache, 'CACHE_SIZE', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_every_route_has_a_case(self):
+        self.assertEqual(perf_suite.uncovered_routes(self.cases), [])
+
+    def test_endpoints_stay_within_budget(self):
+        budget = perf_suite.load_budget()
+        check_timings = budget['scale'] == SCALE
+        results, failures = {}, []
+        for case in self.cases:
+            result = results[case.name] = perf_suite.run_case(self.client, case)
+            print(f"{case.name:40} {case.method.upper():6} {result['status']} "
+                  f"{result['queries']:4}q {result['sql_ms']:9.1f}ms sql {result['wall_ms']:9.1f}ms wall")
+            if result.pop('rows', None) == 0:
+                # a budget measured on an empty result says nothing about the real one
+                failures.append(f'{case.name}: no rows match the seeded data')
+            if UPDATE:
+                continue
+            expected = budget['endpoints'].get(case.name)
+            if expected is None:
+                failures.append(f'{case.name}: no budget recorded')
+                continue
+            failures.extend(f'{case.name}: {problem}' for problem in perf_suite.over_budget(result, expected, check_timings))
+
+        if UPDATE:
+            perf_suite.write_budget(results, SCALE)
+        self.assertEqual(failures, [], '\n'.join(failures))
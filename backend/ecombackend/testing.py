@@ -0,0 +1,28 @@
+"""
+Test helpers shared by the apps' test suites.
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """Pin an endpoint to a fixed number of queries, independent of its row count.
+
+    ``assertQueryBudget(client, url, budget, grow=...)`` requests ``url``,
+    calls ``grow()`` to add more rows, then requests it again. Both requests
+    must run exactly ``budget`` queries, so an N+1 fails the test even when
+    the first count happens to match.
+    """
+
+    def assertQueryBudget(self, client, url, budget, grow=None, params=None):
+        response = None
+        for round_ in range(2 if grow else 1):
+            if round_:
+                grow()
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url, params)
+            self.assertEqual(response.status_code, 200, f'GET {url} -> {response.status_code}')
+            if len(queries) != budget:
+                executed = '\n'.join(f'{i}. {q["sql"]}' for i, q in enumerate(queries.captured_queries, 1))
+                self.fail(f'GET {url} ran {len(queries)} queries, budget is {budget} (round {round_ + 1}):\n{executed}')
+        return response
@@ -25,6 +25,10 @@ urlpatterns = [
     path('api/users/', include('users.urls')),
     path('api/', include('forms_app.urls')),
     path('api/', include('products.urls')),
+    # Inventory (productManagement) endpoints
+    path('api/inventory/', include('productManagement.urls')),
+    # Product search over the inventory catalog
+    path('api/', include('productsearch.urls')),
     # UserHome app endpoints (profile / dashboard)
     path('api/user/', include('UserHome.urls')),
     path('api/user/', include('accounts.urls')),
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import FormSchema, FormSubmission
+from .models import DeletionJob, FormSchema, FormSubmission
 
 
 @admin.register(FormSchema)
@@ -20,3 +20,10 @@ class FormSubmissionAdmin(admin.ModelAdmin):
     list_filter = ['submitted_at', 'form_schema']
     search_fields = ['form_schema__title']
     readonly_fields = ['submitted_at']
+
+
+@admin.register(DeletionJob)
+class DeletionJobAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'target', 'status', 'files_total', 'files_deleted', 'files_failed', 'created_at', 'finished_at']
+    list_filter = ['status', 'kind']
+    readonly_fields = ['created_at', 'finished_at']
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class FormsAppConfig(AppConfig):
     name = 'forms_app'
+
+    def ready(self):
+        # connect projection table and cache invalidation signals
+        from . import projections, public_cache, related_options  # noqa: F401
@@ -0,0 +1,135 @@
+"""
+Set-based deletion of forms and submissions.
+
+The API deletes the database rows with a handful of statements in one
+transaction and, in the same transaction, copies the storage names of the
+deleted files into a ``PendingFileDeletion`` manifest tied to a
+``DeletionJob``. Nothing touches storage during the request; the
+``gc_deleted_files`` command drains the manifest in batches, deleting
+storage objects on a thread pool, and marks the job done once its manifest
+is empty.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DeletionJob, FormFile, FormSubmission, PendingFileDeletion
+from .related_options import invalidate_related_options
+
+
+GC_BATCH_SIZE = 500
+GC_WORKERS = 8
+MAX_ATTEMPTS = 5
+
+
+def _queue_files(job, where, params):
+    """Copy the names of the FormFile rows matching ``where`` into the job's manifest."""
+    manifest = PendingFileDeletion._meta.db_table
+    files = FormFile._meta.db_table
+    submissions = FormSubmission._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {manifest} (job_id, name, attempts) '
+            f'SELECT %s, f.file, 0 FROM {files} f '
+            f'JOIN {submissions} s ON s.id = f.submission_id WHERE {where}',
+            [job.pk, *params],
+        )
+        return cursor.rowcount
+
+
+def _finish_if_empty(job):
+    if job.files_total == 0:
+        job.status = 'done'
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'finished_at'])
+
+
+def delete_form(form, user=None):
+    """Delete a form, its submissions and file rows; returns the DeletionJob for its files."""
+    files = FormFile._meta.db_table
+    submissions = FormSubmission._meta.db_table
+    form_id = form.pk
+    with transaction.atomic():
+        job = DeletionJob.objects.create(kind='form', target=form.slug, requested_by=user)
+        job.files_total = _queue_files(job, 's.form_schema_id = %s', [form_id])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {files} f USING {submissions} s '
+                f'WHERE s.id = f.submission_id AND s.form_schema_id = %s',
+                [form_id],
+            )
+            cursor.execute(f'DELETE FROM {submissions} WHERE form_schema_id = %s', [form_id])
+        # nothing references the form any more, so this is a single DELETE
+        # (and still runs the FormSchema signals, e.g. dropping its projection)
+        form.delete()
+        job.save(update_fields=['files_total'])
+        _finish_if_empty(job)
+        # the raw DELETE skipped the per-submission signals
+        transaction.on_commit(lambda: invalidate_related_options(form_id))
+    return job
+
+
+def delete_submission(submission, user=None):
+    """Delete one submission and its file rows; returns the DeletionJob for its files."""
+    with transaction.atomic():
+        job = DeletionJob.objects.create(kind='submission', target=str(submission.pk), requested_by=user)
+        job.files_total = _queue_files(job, 's.id = %s', [submission.pk])
+        job.save(update_fields=['files_total'])
+        # FormFile has no signals, so the cascade is one DELETE ... WHERE submission_id IN
+        submission.delete()
+        _finish_if_empty(job)
+    return job
+
+
+def _delete_name(storage, name):
+    try:
+        storage.delete(name)
+        return True
+    except Exception:
+        return False
+
+
+def collect_pending_files(batch_size=GC_BATCH_SIZE, workers=GC_WORKERS, storage=default_storage):
+    """Remove one batch of queued storage files; returns how many manifest rows were handled.
+
+    Rows are claimed with SKIP LOCKED so several workers can drain the
+    manifest at once. Files that keep failing are given up on after
+    ``MAX_ATTEMPTS`` and counted in ``files_failed``.
+    """
+    with transaction.atomic():
+        batch = list(
+            PendingFileDeletion.objects.select_for_update(skip_locked=True)
+            .order_by('id')[:batch_size]
+        )
+        if not batch:
+            return 0
+        job_ids = {row.job_id for row in batch}
+        DeletionJob.objects.filter(pk__in=job_ids, status='pending').update(status='running')
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda row: _delete_name(storage, row.name), batch))
+
+        deleted, failed, retry, done = {}, {}, [], []
+        for row, ok in zip(batch, results):
+            if ok:
+                deleted[row.job_id] = deleted.get(row.job_id, 0) + 1
+            elif row.attempts + 1 >= MAX_ATTEMPTS:
+                failed[row.job_id] = failed.get(row.job_id, 0) + 1
+            else:
+                retry.append(row.pk)
+                continue
+            done.append(row.pk)
+        PendingFileDeletion.objects.filter(pk__in=retry).update(attempts=F('attempts') + 1)
+        PendingFileDeletion.objects.filter(pk__in=done).delete()
+        for job_id in job_ids:
+            DeletionJob.objects.filter(pk=job_id).update(
+                files_deleted=F('files_deleted') + deleted.get(job_id, 0),
+                files_failed=F('files_failed') + failed.get(job_id, 0),
+            )
+        DeletionJob.objects.filter(pk__in=job_ids).exclude(
+            pk__in=PendingFileDeletion.objects.filter(job_id__in=job_ids).values('job_id')
+        ).update(status='done', finished_at=timezone.now())
+    return len(batch)
@@ -0,0 +1,87 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from forms_app.models import FormSchema, FormSubmission
+from forms_app.search import prefix_search_query
+
+
+CITIES = ['Kathmandu', 'Pokhara', 'Lalitpur', 'Biratnagar', 'Dharan', 'Butwal', 'Chitwan', 'Janakpur']
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed synthetic submissions into a throwaway form and compare the old '
+        'icontains/contains filters with the indexed containment and full-text search.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded form and submissions.')
+
+    def handle(self, *args, **options):
+        owner, _ = User.objects.get_or_create(username='bench_search')
+        form = FormSchema.objects.create(
+            title='Search benchmark',
+            language_config={'primary': 'en'},
+            fields_structure=[
+                {'id': 'name', 'type': 'text', 'labels': {'en': 'Name'}},
+                {'id': 'city', 'type': 'dropdown', 'labels': {'en': 'City'}},
+                {'id': 'note', 'type': 'text', 'labels': {'en': 'Note'}},
+            ],
+            created_by=owner,
+        )
+        try:
+            self._seed(form, options['rows'])
+            self._run(form, options['repeat'])
+        finally:
+            if not options['keep']:
+                with connection.cursor() as cursor:
+                    cursor.execute('DELETE FROM forms_app_formsubmission WHERE form_schema_id = %s', [form.id])
+                form.delete()
+
+    def _seed(self, form, rows):
+        start = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO forms_app_formsubmission (form_schema_id, data, submitted_at)
+                SELECT %s,
+                       jsonb_build_object(
+                           'name', 'customer' || g,
+                           'city', (%s::text[])[1 + g %% %s],
+                           'age', g %% 90,
+                           'note', md5(g::text)
+                       ),
+                       now() - (g || ' seconds')::interval
+                FROM generate_series(1, %s) AS g
+                """,
+                [form.id, CITIES, len(CITIES), rows],
+            )
+            cursor.execute('ANALYZE forms_app_formsubmission')
+        self.stdout.write(f'seeded {rows} submissions in {time.perf_counter() - start:.1f}s')
+
+    def _run(self, form, repeat):
+        base = FormSubmission.objects.filter(form_schema=form).order_by('-submitted_at')
+        query = prefix_search_query('customer4242')
+        cases = [
+            ('search: data icontains (old)', lambda: list(base.filter(data__icontains='customer4242')[:50])),
+            ('search: tsvector prefix (new)', lambda: list(base.filter(search_vector=query)[:50])),
+            ('filter: chained contains (old)', lambda: list(
+                base.filter(data__contains={'city': 'Pokhara'}).filter(data__contains={'age': 42})[:50])),
+            ('filter: single contains (new)', lambda: list(
+                base.filter(data__contains={'city': 'Pokhara', 'age': 42})[:50])),
+        ]
+        for label, fn in cases:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                fn()
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+            self.stdout.write(f'{label:34s} p50={statistics.median(timings):8.2f}ms p99={p99:8.2f}ms')
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from forms_app.models import FormSchema
+from forms_app.projections import PROJECTION_BATCH_SIZE, build_projection, projection_ready
+
+
+class Command(BaseCommand):
+    help = (
+        'Create or rebuild the typed projection tables of forms with '
+        'projection_enabled whose field layout changed since the last build.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--slug', help='Only this form (it must have projection_enabled).')
+        parser.add_argument('--force', action='store_true', help='Rebuild even if the table is up to date.')
+        parser.add_argument('--batch-size', type=int, default=PROJECTION_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        forms = FormSchema.objects.filter(projection_enabled=True)
+        if options['slug']:
+            forms = forms.filter(slug=options['slug'])
+            if not forms.exists():
+                raise CommandError(f"No form with slug {options['slug']!r} and projection_enabled")
+
+        for form in forms.order_by('id'):
+            if projection_ready(form) and not options['force']:
+                self.stdout.write(f'{form.slug}: up to date')
+                continue
+            count = build_projection(form, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'{form.slug}: projected {count} submissions'))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from forms_app.deletion import GC_BATCH_SIZE, GC_WORKERS, collect_pending_files
+
+
+class Command(BaseCommand):
+    help = 'Remove storage files queued by form/submission deletes and finish their deletion jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=GC_BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=GC_WORKERS, help='Storage deletes run in parallel.')
+        parser.add_argument('--loop', action='store_true', help='Keep running as a background worker.')
+        parser.add_argument('--interval', type=int, default=10, help='Seconds to sleep when the queue is empty with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            total = 0
+            while True:
+                count = collect_pending_files(batch_size=options['batch_size'], workers=options['workers'])
+                if not count:
+                    break
+                total += count
+            if total:
+                self.stdout.write(f'Processed {total} queued files')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
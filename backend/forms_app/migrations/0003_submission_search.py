@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-18 02:02
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import forms_app.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms_app', '0002_formfile'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formsubmission',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=forms_app.models.JsonbToTsvector('data'), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='formsubmission',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['data'], name='forms_sub_data_path_gin', opclasses=['jsonb_path_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='formsubmission',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='forms_sub_search_gin'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 02:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms_app', '0003_submission_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formschema',
+            name='projection_enabled',
+            field=models.BooleanField(default=False, help_text='Maintain a typed, indexed projection table of submissions'),
+        ),
+        migrations.AddField(
+            model_name='formschema',
+            name='projection_signature',
+            field=models.CharField(blank=True, default='', help_text='Column layout the projection table was last built for', max_length=64),
+        ),
+    ]
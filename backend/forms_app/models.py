@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.utils.crypto import get_random_string
 
 
@@ -43,6 +45,18 @@ class FormSchema(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    # Opt-in typed side table for hot forms (see forms_app.projections)
+    projection_enabled = models.BooleanField(
+        default=False,
+        help_text="Maintain a typed, indexed projection table of submissions"
+    )
+    projection_signature = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        help_text="Column layout the projection table was last built for"
+    )
     
     class Meta:
         ordering = ['-created_at']
@@ -51,6 +65,17 @@ class FormSchema(models.Model):
         return f"{self.title} ({self.slug})"
 
 
+class JsonbToTsvector(models.Func):
+    """
+    jsonb_to_tsvector('simple', <jsonb>, '["string", "numeric"]'): the text
+    and number values of a JSON document, without its keys. The 'simple'
+    config does no stemming, which suits multi-language forms.
+    """
+    function = 'jsonb_to_tsvector'
+    template = "%(function)s('simple'::regconfig, %(expressions)s, '[\"string\", \"numeric\"]'::jsonb)"
+    output_field = SearchVectorField()
+
+
 class FormSubmission(models.Model):
     """
     Stores actual user submissions to a form.
@@ -75,12 +100,23 @@ class FormSubmission(models.Model):
         related_name='submissions'
     )
     ip_address = models.GenericIPAddressField(null=True, blank=True)
+
+    # Full-text document over the values in `data`; PostgreSQL recomputes it
+    # whenever the row is written.
+    search_vector = models.GeneratedField(
+        expression=JsonbToTsvector('data'),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
     
     class Meta:
         ordering = ['-submitted_at']
         indexes = [
             models.Index(fields=['-submitted_at']),
             models.Index(fields=['form_schema', '-submitted_at']),
+            # serves data @> {...} containment filters
+            GinIndex(fields=['data'], opclasses=['jsonb_path_ops'], name='forms_sub_data_path_gin'),
+            GinIndex(fields=['search_vector'], name='forms_sub_search_gin'),
         ]
         
     def __str__(self):
@@ -101,3 +137,57 @@ class FormFile(models.Model):
 
     def __str__(self):
         return f"File {self.file.name} for submission {self.submission.id}"
+
+
+class DeletionJob(models.Model):
+    """
+    Tracks a form or submission deletion whose storage files are removed
+    in the background (see forms_app.deletion).
+    """
+    KIND_CHOICES = [
+        ('form', 'Form'),
+        ('submission', 'Submission'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    target = models.CharField(max_length=255, help_text="Slug or id of the deleted object")
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='deletion_jobs'
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    files_total = models.PositiveIntegerField(default=0)
+    files_deleted = models.PositiveIntegerField(default=0)
+    files_failed = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Delete {self.kind} {self.target} ({self.status})"
+
+
+class PendingFileDeletion(models.Model):
+    """
+    Manifest of storage files still to be removed for a DeletionJob.
+    """
+    job = models.ForeignKey(
+        DeletionJob,
+        on_delete=models.CASCADE,
+        related_name='pending_files'
+    )
+    name = models.CharField(max_length=255, help_text="Storage name of the file")
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,310 @@
+"""
+Typed projection tables for hot forms.
+
+When ``FormSchema.projection_enabled`` is set, submissions of that form are
+mirrored into ``forms_proj_<form id>``: one row per submission and one typed
+column per scalar field in ``fields_structure`` (numbers as double
+precision, dates/times as date/time, choice fields as indexed varchar, free
+text unindexed). Numeric, date and choice columns get B-tree indexes so
+range filters and sorting don't go through JSON extraction.
+
+The table is (re)built by ``build_form_projections`` whenever the column
+layout changes; ``FormSchema.projection_signature`` records the layout it
+was built for and the submissions endpoint only routes to the table while
+the two match. New and edited submissions are upserted by signal handlers.
+They decide from the database on every write (a build may have just
+finished in another process), except when the submission's form was
+loaded with it and doesn't have projection enabled: writes to those forms
+cost no query.
+"""
+import hashlib
+import json
+import math
+import re
+
+from django.apps.registry import Apps
+from django.db import connection, models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.dateparse import parse_date, parse_datetime, parse_time
+
+from .models import FormSchema, FormSubmission
+
+
+NUMBER_TYPES = {'number'}
+DATE_TYPES = {'date'}
+TIME_TYPES = {'time'}
+CHOICE_TYPES = {'select', 'dropdown', 'radio'}
+TEXT_TYPES = {'text', 'textarea', 'email', 'tel', 'url'}
+
+PROJECTION_BATCH_SIZE = 2000
+
+
+class ProjectionColumn:
+    __slots__ = ('field_id', 'column', 'kind')
+
+    def __init__(self, field_id, column, kind):
+        self.field_id = field_id
+        self.column = column
+        self.kind = kind
+
+    @property
+    def sortable(self):
+        return self.kind in ('number', 'date', 'time', 'choice')
+
+    def model_field(self):
+        if self.kind == 'number':
+            return models.FloatField(null=True, db_index=True, db_column=self.column)
+        if self.kind == 'date':
+            return models.DateField(null=True, db_index=True, db_column=self.column)
+        if self.kind == 'time':
+            return models.TimeField(null=True, db_index=True, db_column=self.column)
+        if self.kind == 'choice':
+            return models.CharField(max_length=255, null=True, db_index=True, db_column=self.column)
+        return models.TextField(null=True, db_column=self.column)
+
+    def coerce(self, value):
+        """Convert a raw JSON value to the column type; None if it doesn't fit."""
+        if value is None or value == '' or isinstance(value, (list, dict)):
+            return None
+        try:
+            if self.kind == 'number':
+                if isinstance(value, bool):
+                    return None
+                number = float(value)
+                return number if math.isfinite(number) else None
+            if self.kind == 'date':
+                text = str(value)
+                parsed = parse_date(text)
+                if parsed is None:
+                    moment = parse_datetime(text)
+                    parsed = moment.date() if moment else None
+                return parsed
+            if self.kind == 'time':
+                return parse_time(str(value))
+            if self.kind == 'choice':
+                return str(value)[:255]
+        except (TypeError, ValueError):
+            return None
+        return str(value)
+
+
+def projection_columns(form):
+    """Columns for the scalar fields of a form, in form order."""
+    columns, used = [], set()
+    for field in form.fields_structure or []:
+        field_id, field_type = field.get('id'), field.get('type')
+        if not field_id or field_id in {c.field_id for c in columns}:
+            continue
+        if field_type in NUMBER_TYPES:
+            kind = 'number'
+        elif field_type in DATE_TYPES:
+            kind = 'date'
+        elif field_type in TIME_TYPES:
+            kind = 'time'
+        elif field_type in CHOICE_TYPES:
+            kind = 'choice'
+        elif field_type in TEXT_TYPES:
+            kind = 'text'
+        else:
+            continue
+        base = 'f_' + re.sub(r'[^a-z0-9_]', '_', str(field_id).lower())[:40]
+        column, n = base, 1
+        while column in used:
+            n += 1
+            column = f'{base}_{n}'
+        used.add(column)
+        columns.append(ProjectionColumn(field_id, column, kind))
+    return columns
+
+
+def projection_signature(form):
+    layout = [(c.field_id, c.column, c.kind) for c in projection_columns(form)]
+    return hashlib.sha256(json.dumps(layout).encode()).hexdigest()
+
+
+def projection_table(form):
+    return f'forms_proj_{form.pk}'
+
+
+# dynamic models live in their own registry so they never touch the project apps
+_registry = Apps()
+_models = {}
+
+
+def projection_model(form):
+    """Unmanaged model class for the form's projection table (cached per layout)."""
+    signature = projection_signature(form)
+    key = (form.pk, signature)
+    model = _models.get(key)
+    if model is not None:
+        return model
+    table = projection_table(form)
+    attrs = {
+        '__module__': __name__,
+        'Meta': type('Meta', (), {
+            'app_label': 'forms_app_projections',
+            'db_table': table,
+            'managed': False,
+            'apps': _registry,
+        }),
+        'submission_id': models.BigIntegerField(primary_key=True),
+        'submitted_at': models.DateTimeField(db_index=True),
+    }
+    for column in projection_columns(form):
+        attrs[column.column] = column.model_field()
+    name = f'Projection{form.pk}_{signature[:12]}'
+    model = type(name, (models.Model,), attrs)
+    _models[key] = model
+    return model
+
+
+def projection_ready(form):
+    return form.projection_enabled and form.projection_signature == projection_signature(form)
+
+
+class ProjectionParamError(ValueError):
+    pass
+
+
+RANGE_PREFIXES = (('min_', 'gte'), ('max_', 'lte'))
+
+
+def uses_projection_params(params):
+    return 'sort' in params or any(key.startswith(('min_', 'max_')) for key in params)
+
+
+def projection_queryset(form, params):
+    """Apply ?min_<field>=, ?max_<field>= and ?sort=[-]<field> to the projection table.
+
+    Returns ``(queryset, ordering)`` for keyset pagination. Sorting by a field
+    only lists submissions that have a value for it, since NULLs can't take
+    part in a cursor position.
+    """
+    model = projection_model(form)
+    columns = {c.field_id: c for c in projection_columns(form)}
+    queryset = model.objects.all()
+
+    for key, value in params.items():
+        for prefix, lookup in RANGE_PREFIXES:
+            if not key.startswith(prefix):
+                continue
+            column = columns.get(key[len(prefix):])
+            if column is None or not column.sortable:
+                raise ProjectionParamError(f"{key}: {key[len(prefix):]!r} is not a numeric, date, time or choice field")
+            bound = column.coerce(value)
+            if bound is None:
+                raise ProjectionParamError(f"{key}: {value!r} is not a valid {column.kind}")
+            queryset = queryset.filter(**{f'{column.column}__{lookup}': bound})
+
+    sort = params.get('sort')
+    if not sort:
+        return queryset, ('-submitted_at', '-submission_id')
+    descending = sort.startswith('-')
+    column = columns.get(sort.lstrip('-'))
+    if column is None or not column.sortable:
+        raise ProjectionParamError(f"sort: {sort.lstrip('-')!r} is not a numeric, date, time or choice field")
+    queryset = queryset.filter(**{f'{column.column}__isnull': False})
+    return queryset, (('-' if descending else '') + column.column, '-submission_id')
+
+
+def drop_projection(form):
+    table = projection_table(form)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {connection.ops.quote_name(table)}')
+
+
+def _row(model, columns, submission):
+    data = submission.data if isinstance(submission.data, dict) else {}
+    values = {c.column: c.coerce(data.get(c.field_id)) for c in columns}
+    return model(submission_id=submission.pk, submitted_at=submission.submitted_at, **values)
+
+
+def upsert_projection_rows(form, submissions):
+    model = projection_model(form)
+    columns = projection_columns(form)
+    rows = [_row(model, columns, s) for s in submissions]
+    if not rows:
+        return 0
+    model.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['submission_id'],
+        update_fields=['submitted_at'] + [c.column for c in columns],
+        batch_size=PROJECTION_BATCH_SIZE,
+    )
+    return len(rows)
+
+
+def build_projection(form, batch_size=PROJECTION_BATCH_SIZE):
+    """(Re)create the projection table for the form's current layout and backfill it.
+
+    Returns the number of submissions projected.
+    """
+    model = projection_model(form)
+    # stop routing reads to the old table before it goes away
+    FormSchema.objects.filter(pk=form.pk).update(projection_signature='')
+    drop_projection(form)
+    with connection.schema_editor() as editor:
+        editor.create_model(model)
+    signature = projection_signature(form)
+    submissions = form.submissions.order_by().only('id', 'data', 'submitted_at')
+    high_water = submissions.aggregate(m=models.Max('id'))['m'] or 0
+    count = 0
+    batch = []
+    for submission in submissions.filter(id__lte=high_water).iterator(chunk_size=batch_size):
+        batch.append(submission)
+        if len(batch) >= batch_size:
+            count += upsert_projection_rows(form, batch)
+            batch = []
+    count += upsert_projection_rows(form, batch)
+    # once the signature is stored the signal handlers keep the table current;
+    # catch up on anything submitted while the backfill was running
+    FormSchema.objects.filter(pk=form.pk).update(projection_signature=signature)
+    count += upsert_projection_rows(form, list(submissions.filter(id__gt=high_water)))
+    form.projection_signature = signature
+    return count
+
+
+@receiver(post_save, sender=FormSchema)
+def _form_schema_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if not instance.projection_enabled and instance.projection_signature:
+        drop_projection(instance)
+        FormSchema.objects.filter(pk=instance.pk).update(projection_signature='')
+        instance.projection_signature = ''
+
+
+@receiver(post_delete, sender=FormSchema)
+def _form_schema_deleted(sender, instance, **kwargs):
+    if instance.projection_signature:
+        drop_projection(instance)
+
+
+def _current_form(submission):
+    """The submission's form as stored now, or None if it can't have a projection."""
+    # the form loaded with the request only rules projection out: its
+    # signature may predate a build that finished since, in any process
+    if FormSubmission.form_schema.is_cached(submission) and not submission.form_schema.projection_enabled:
+        return None
+    return FormSchema.objects.filter(pk=submission.form_schema_id).only(
+        'id', 'fields_structure', 'projection_enabled', 'projection_signature'
+    ).first()
+
+
+@receiver(post_save, sender=FormSubmission)
+def _submission_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    form = _current_form(instance)
+    if form is not None and projection_ready(form):
+        # run after commit so a rolled-back submission never lands in the table
+        transaction.on_commit(lambda: upsert_projection_rows(form, [instance]))
+
+
+@receiver(post_delete, sender=FormSubmission)
+def _submission_deleted(sender, instance, **kwargs):
+    form = _current_form(instance)
+    if form is not None and projection_ready(form):
+        projection_model(form).objects.filter(submission_id=instance.pk).delete()
@@ -0,0 +1,118 @@
+"""
+Two-level cache for the anonymous ``/api/forms/<slug>/public/`` endpoint.
+
+The shared cache holds a version pointer per slug (the form's
+``updated_at``) and the serialized schema under ``slug + version``. Each
+process keeps the most recently used payloads in a small in-memory LRU
+keyed the same way, so a warm render costs one shared-cache lookup for the
+pointer and no database queries. Saving or deleting a form moves the
+pointer after commit; older payloads are simply never asked for again.
+
+Every payload carries an ETag derived from its content for
+``If-None-Match`` revalidation.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import FormSchema
+from .serializers import PublicFormSchemaSerializer
+
+
+PUBLIC_SCHEMA_TIMEOUT = 60 * 60 * 24
+LOCAL_CACHE_SIZE = 512
+
+_local = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def _version_key(slug):
+    return f'forms:public:version:{slug}'
+
+
+def _payload_key(slug, version):
+    return f'forms:public:{slug}:{version}'
+
+
+def _version(form):
+    return form.updated_at.isoformat()
+
+
+def _local_get(key):
+    with _local_lock:
+        entry = _local.get(key)
+        if entry is not None:
+            _local.move_to_end(key)
+        return entry
+
+
+def _local_put(key, entry):
+    with _local_lock:
+        _local[key] = entry
+        _local.move_to_end(key)
+        while len(_local) > LOCAL_CACHE_SIZE:
+            _local.popitem(last=False)
+
+
+def _render(form):
+    data = dict(PublicFormSchemaSerializer(form).data)
+    body = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder).encode()
+    return data, '"%s"' % hashlib.sha1(body).hexdigest()
+
+
+def public_schema(slug):
+    """``(data, etag)`` for a form's public schema, or None if there is no such form."""
+    version = cache.get(_version_key(slug))
+    if version is not None:
+        key = (slug, version)
+        entry = _local_get(key)
+        if entry is not None:
+            return entry
+        entry = cache.get(_payload_key(slug, version))
+        if entry is not None:
+            _local_put(key, entry)
+            return entry
+
+    form = FormSchema.objects.select_related('created_by').filter(slug=slug).first()
+    if form is None:
+        return None
+    version = _version(form)
+    entry = _render(form)
+    cache.set(_payload_key(slug, version), entry, timeout=PUBLIC_SCHEMA_TIMEOUT)
+    # add, not set: a save that committed after our read has already moved
+    # the pointer and must not be pointed back at this payload
+    cache.add(_version_key(slug), version, timeout=PUBLIC_SCHEMA_TIMEOUT)
+    _local_put((slug, version), entry)
+    return entry
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    tags = [t.strip() for t in if_none_match.split(',')]
+    return etag in tags or f'W/{etag}' in tags
+
+
+@receiver(post_save, sender=FormSchema)
+def _form_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    slug, version = instance.slug, _version(instance)
+    transaction.on_commit(
+        lambda: cache.set(_version_key(slug), version, timeout=PUBLIC_SCHEMA_TIMEOUT)
+    )
+
+
+@receiver(post_delete, sender=FormSchema)
+def _form_deleted(sender, instance, **kwargs):
+    slug = instance.slug
+    transaction.on_commit(lambda: cache.delete(_version_key(slug)))
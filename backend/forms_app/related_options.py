@@ -0,0 +1,80 @@
+"""
+Cached dropdown options for relationship fields (``related_data``).
+
+The options of a (target form, display field) pair are read with a single
+``SELECT id, data -> field``. The ``?q=`` label prefix and the ``?limit=``
+are applied in that query, newest submissions first along the
+``(form_schema, -submitted_at)`` index, so a typeahead request reads and
+caches only the rows it returns. Each (field, prefix, limit) list is cached
+under a key that includes a per-form version token. Creating, editing or
+deleting a submission of the target form replaces the token, so every
+cached list for that form goes stale at once without having to know which
+ones were cached.
+"""
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.fields.json import KeyTextTransform, KeyTransform
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import FormSubmission
+
+
+OPTIONS_CACHE_TIMEOUT = 60 * 60
+
+
+def _version_key(form_id):
+    return f'forms:related:version:{form_id}'
+
+
+def _form_version(form_id):
+    key = _version_key(form_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_related_options(form_id):
+    cache.set(_version_key(form_id), uuid.uuid4().hex, timeout=None)
+
+
+def load_related_options(form, display_field, prefix=None, limit=None):
+    """[{'id', 'label'}] for submissions of ``form`` whose ``display_field`` starts with ``prefix``."""
+    rows = (
+        form.submissions.filter(data__has_key=display_field)
+        .annotate(label=KeyTransform(display_field, 'data'))
+    )
+    if prefix:
+        rows = rows.annotate(label_text=KeyTextTransform(display_field, 'data')).filter(label_text__istartswith=prefix)
+    rows = rows.values_list('id', 'label')
+    if limit is not None:
+        rows = rows[:limit]
+    return [{'id': pk, 'label': label} for pk, label in rows]
+
+
+def related_options(form, display_field, prefix=None, limit=None):
+    """Cached options for a (target form, display field) pair, matching ``prefix``, at most ``limit``."""
+    prefix = (prefix or '').casefold()
+    params_hash = hashlib.sha1(f'{display_field}\0{prefix}\0{limit}'.encode()).hexdigest()
+    key = f'forms:related:{form.pk}:{_form_version(form.pk)}:{params_hash}'
+    options = cache.get(key)
+    if options is None:
+        options = load_related_options(form, display_field, prefix, limit)
+        cache.set(key, options, timeout=OPTIONS_CACHE_TIMEOUT)
+    return options
+
+
+@receiver(post_save, sender=FormSubmission)
+@receiver(post_delete, sender=FormSubmission)
+def _submission_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # after commit, so a concurrent miss can't re-cache the pre-change rows
+    # under the new version
+    form_id = instance.form_schema_id
+    transaction.on_commit(lambda: invalidate_related_options(form_id))
@@ -0,0 +1,52 @@
+"""
+Search over FormSubmission.data.
+
+``?filter_<field_id>=value`` params become a single ``data @> {...}``
+containment test (served by the jsonb_path_ops GIN index) and ``?search=``
+matches against the generated ``search_vector`` column (GIN indexed).
+Every search word is matched as a prefix so partial input still finds
+submissions, roughly like the old substring search.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def prefix_search_query(text):
+    """'ram kath' -> to_tsquery('simple', 'ram:* & kath:*'); None if no words."""
+    words = _WORD.findall(text.lower())
+    if not words:
+        return None
+    return SearchQuery(' & '.join(f'{w}:*' for w in words), config='simple', search_type='raw')
+
+
+def field_filters(params):
+    return {key[len('filter_'):]: value for key, value in params.items() if key.startswith('filter_')}
+
+
+def search_submissions(submissions, params, ranked=False):
+    """Apply ?filter_<field>= and ?search= to a FormSubmission queryset.
+
+    With ``ranked=True`` matches are annotated with ``rank`` (ts_rank) for
+    relevance ordering.
+    """
+    filters = field_filters(params)
+    if filters:
+        submissions = submissions.filter(data__contains=filters)
+
+    search = params.get('search')
+    if search:
+        query = prefix_search_query(search)
+        if query is not None:
+            submissions = submissions.filter(search_vector=query)
+            if ranked:
+                # ts_rank is float4; widen it so cursor positions round-trip exactly
+                submissions = submissions.annotate(
+                    rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+                )
+    return submissions
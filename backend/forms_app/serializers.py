@@ -1,5 +1,6 @@
+from django.db.models import Count
 from rest_framework import serializers
-from .models import FormSchema, FormSubmission, FormFile
+from .models import DeletionJob, FormSchema, FormSubmission, FormFile
 
 
 class FormFileSerializer(serializers.ModelSerializer):
@@ -9,6 +10,13 @@ class FormFileSerializer(serializers.ModelSerializer):
         fields = ['id', 'file', 'uploaded_at']
 
 
+def with_submission_count(queryset=None):
+    """FormSchema rows ready for FormSchemaSerializer: count annotated, creator joined"""
+    if queryset is None:
+        queryset = FormSchema.objects.all()
+    return queryset.select_related('created_by').annotate(submission_count=Count('submissions'))
+
+
 class FormSchemaSerializer(serializers.ModelSerializer):
     """Serializer for creating and retrieving form schemas"""
     created_by_username = serializers.CharField(source='created_by.username', read_only=True)
@@ -19,13 +27,18 @@ class FormSchemaSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'slug', 'description', 'language_config',
             'fields_structure', 'relationships', 'created_by',
-            'created_by_username', 'created_at', 'updated_at', 'submission_count'
+            'created_by_username', 'created_at', 'updated_at', 'submission_count',
+            'projection_enabled',
         ]
         # created_by is set server-side in perform_create, expose it read-only
         read_only_fields = ['slug', 'created_at', 'updated_at', 'created_by']
 
     def get_submission_count(self, obj):
-        return obj.submissions.count()
+        # annotated by with_submission_count() on list endpoints
+        count = getattr(obj, 'submission_count', None)
+        if count is None:
+            count = obj.submissions.count()
+        return count
 
     def validate_language_config(self, value):
         if 'primary' not in value:
@@ -43,6 +56,20 @@ class FormSchemaSerializer(serializers.ModelSerializer):
         return value
 
 
+class PublicFormSchemaSerializer(serializers.ModelSerializer):
+    """Form structure for anonymous renders (no submission count)"""
+    created_by_username = serializers.CharField(source='created_by.username', read_only=True)
+
+    class Meta:
+        model = FormSchema
+        fields = [
+            'id', 'title', 'slug', 'description', 'language_config',
+            'fields_structure', 'relationships', 'created_by',
+            'created_by_username', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
 class FormSubmissionSerializer(serializers.ModelSerializer):
     """Serializer for submitting and retrieving form data"""
     form_title = serializers.CharField(source='form_schema.title', read_only=True)
@@ -77,3 +104,13 @@ class FormSubmissionListSerializer(serializers.ModelSerializer):
     class Meta:
         model = FormSubmission
         fields = ['id', 'data', 'submitted_at', 'submitted_by', 'files']
+
+
+class DeletionJobSerializer(serializers.ModelSerializer):
+    """Progress of a background file cleanup after a form/submission delete"""
+    class Meta:
+        model = DeletionJob
+        fields = [
+            'id', 'kind', 'target', 'status', 'files_total', 'files_deleted',
+            'files_failed', 'created_at', 'finished_at'
+        ]
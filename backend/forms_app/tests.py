@@ -1,3 +1,343 @@
+import csv
+import io
+import json
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from ecombackend.testing import QueryBudgetMixin
+from .models import FormSchema, FormSubmission
+
+
+FIELDS = [
+    {'id': 'name', 'type': 'text', 'labels': {'en': 'Name'}},
+    {'id': 'tags', 'type': 'checkbox', 'labels': {'en': 'Tags'}},
+]
+
+
+class FormSubmissionExportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='owner')
+        self.form = FormSchema.objects.create(
+            title='Survey', language_config={'primary': 'en'}, fields_structure=FIELDS, created_by=self.user
+        )
+        for i in range(3):
+            FormSubmission.objects.create(form_schema=self.form, data={'name': f'n{i}', 'tags': ['a', 'b']})
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _body(self, resp):
+        return b''.join(resp.streaming_content).decode()
+
+    def test_ndjson_export_streams_one_object_per_line(self):
+        resp = self.client.get(f'/api/forms/{self.form.slug}/export/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in self._body(resp).splitlines()]
+        self.assertEqual([row['data']['name'] for row in lines], ['n2', 'n1', 'n0'])
+
+    def test_csv_export_flattens_fields_structure(self):
+        resp = self.client.get(f'/api/forms/{self.form.slug}/export/', {'output': 'csv'})
+        rows = list(csv.reader(io.StringIO(self._body(resp))))
+        self.assertEqual(rows[0], ['id', 'submitted_at', 'submitted_by', 'ip_address', 'name', 'tags', 'files'])
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][4:6], ['n2', 'a; b'])
+
+    def test_unknown_output_is_rejected(self):
+        resp = self.client.get(f'/api/forms/{self.form.slug}/export/', {'output': 'xml'})
+        self.assertEqual(resp.status_code, 400)
+
+
+class FormSubmissionSearchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='owner')
+        self.form = FormSchema.objects.create(
+            title='Survey', language_config={'primary': 'en'}, fields_structure=FIELDS, created_by=self.user
+        )
+        FormSubmission.objects.create(form_schema=self.form, data={'name': 'Ram Kathmandu', 'tags': ['vip']})
+        FormSubmission.objects.create(form_schema=self.form, data={'name': 'Sita Pokhara', 'tags': ['new']})
+        FormSubmission.objects.create(form_schema=self.form, data={'name': 'Hari', 'tags': ['vip'], 'note': 'kathmandu kathmandu'})
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _names(self, params):
+        resp = self.client.get(f'/api/forms/{self.form.slug}/submissions/', params)
+        self.assertEqual(resp.status_code, 200)
+        return [r['data']['name'] for r in resp.json()['results']]
+
+    def test_prefix_full_text_search(self):
+        self.assertEqual(sorted(self._names({'search': 'kath'})), ['Hari', 'Ram Kathmandu'])
+        self.assertEqual(self._names({'search': 'ram kath'}), ['Ram Kathmandu'])
+        self.assertEqual(self._names({'search': 'name'}), [])
+
+    def test_ranked_search(self):
+        self.assertEqual(self._names({'search': 'kathmandu', 'ordering': 'rank'}), ['Hari', 'Ram Kathmandu'])
+
+    def test_containment_filters(self):
+        self.assertEqual(self._names({'filter_name': 'Hari'}), ['Hari'])
+        self.assertEqual(self._names({'filter_name': 'Hari', 'filter_note': 'other'}), [])
+
+
+class FormProjectionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='owner')
+        self.form = FormSchema.objects.create(
+            title='Orders', language_config={'primary': 'en'}, created_by=self.user, projection_enabled=True,
+            fields_structure=[
+                {'id': 'item', 'type': 'text', 'labels': {'en': 'Item'}},
+                {'id': 'price', 'type': 'number', 'labels': {'en': 'Price'}},
+                {'id': 'due', 'type': 'date', 'labels': {'en': 'Due'}},
+            ],
+        )
+        for item, price, due in [('pen', '5', '2024-01-03'), ('book', 120, '2024-01-01'), ('bag', 'n/a', '2024-01-02')]:
+            FormSubmission.objects.create(form_schema=self.form, data={'item': item, 'price': price, 'due': due})
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _items(self, params):
+        resp = self.client.get(f'/api/forms/{self.form.slug}/submissions/', params)
+        self.assertEqual(resp.status_code, 200, resp.data)
+        return [row['data']['item'] for row in resp.data['results']]
+
+    def test_range_and_sort_need_a_built_projection(self):
+        resp = self.client.get(f'/api/forms/{self.form.slug}/submissions/', {'sort': 'price'})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_range_filter_and_sort_on_projection(self):
+        from django.core.management import call_command
+        call_command('build_form_projections', stdout=io.StringIO())
+
+        self.assertEqual(self._items({'sort': '-price'}), ['book', 'pen'])
+        self.assertEqual(self._items({'min_price': '10'}), ['book'])
+        self.assertEqual(self._items({'max_due': '2024-01-02', 'sort': 'due'}), ['book', 'bag'])
+        self.assertEqual(self._items({'sort': 'price', 'search': 'pen'}), ['pen'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            FormSubmission.objects.create(form_schema=self.form, data={'item': 'lamp', 'price': 60})
+        self.assertEqual(self._items({'min_price': '10', 'sort': 'price'}), ['lamp', 'book'])
+
+        resp = self.client.get(f'/api/forms/{self.form.slug}/submissions/', {'min_item': 'a'})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_writes_to_other_forms_skip_the_form_lookup(self):
+        from django.core.management import call_command
+        call_command('build_form_projections', stdout=io.StringIO())
+        plain = FormSchema.objects.create(title='Notes', language_config={'primary': 'en'}, created_by=self.user)
+        with self.assertNumQueries(1):  # the INSERT
+            submission = FormSubmission.objects.create(form_schema=plain, data={'item': 'memo'})
+        with self.assertNumQueries(2):  # its files, then the submission
+            submission.delete()
+
+    def test_writes_with_a_form_loaded_before_the_build_are_projected(self):
+        from django.core.management import call_command
+        stale = FormSchema.objects.get(pk=self.form.pk)
+        call_command('build_form_projections', stdout=io.StringIO())
+        with self.captureOnCommitCallbacks(execute=True):
+            FormSubmission.objects.create(form_schema=stale, data={'item': 'lamp', 'price': 60})
+        self.assertEqual(self._items({'min_price': '10', 'sort': 'price'}), ['lamp', 'book'])
+
+    def test_layout_change_stops_routing_until_rebuilt(self):
+        from django.core.management import call_command
+        call_command('build_form_projections', stdout=io.StringIO())
+        self.form.fields_structure = self.form.fields_structure + [{'id': 'qty', 'type': 'number', 'labels': {'en': 'Qty'}}]
+        self.form.save()
+        resp = self.client.get(f'/api/forms/{self.form.slug}/submissions/', {'sort': 'price'})
+        self.assertEqual(resp.status_code, 400)
+        call_command('build_form_projections', stdout=io.StringIO())
+        self.form.refresh_from_db()
+        self.assertEqual(self._items({'sort': 'price'}), ['pen', 'book'])
+
+
+class RelatedDataTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='owner')
+        self.form = FormSchema.objects.create(
+            title='Customers', language_config={'primary': 'en'}, fields_structure=FIELDS, created_by=self.user
+        )
+        for name in ['Ram', 'Rita', 'Sita']:
+            FormSubmission.objects.create(form_schema=self.form, data={'name': name})
+        FormSubmission.objects.create(form_schema=self.form, data={'tags': ['x']})
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _labels(self, **params):
+        resp = self.client.get(
+            f'/api/forms/{self.form.slug}/related_data/',
+            {'target_slug': self.form.slug, 'display_field': 'name', **params},
+        )
+        self.assertEqual(resp.status_code, 200)
+        return [o['label'] for o in resp.data]
+
+    def test_prefix_and_limit(self):
+        self.assertEqual(self._labels(), ['Sita', 'Rita', 'Ram'])
+        self.assertEqual(self._labels(q='r'), ['Rita', 'Ram'])
+        self.assertEqual(self._labels(q='r', limit=1), ['Rita'])
+
+    def test_prefix_and_limit_are_applied_in_sql(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self._labels(q='RI', limit=5), ['Rita'])
+        sql = queries.captured_queries[-1]['sql']
+        self.assertIn('LIKE', sql)
+        self.assertIn('LIMIT 5', sql)
+
+    def test_cached_list_is_invalidated_by_new_submissions(self):
+        self._labels()
+        with self.assertNumQueries(1):  # only the target form lookup
+            self._labels()
+        with self.captureOnCommitCallbacks(execute=True):
+            FormSubmission.objects.create(form_schema=self.form, data={'name': 'Hari'})
+        self.assertEqual(self._labels(), ['Hari', 'Sita', 'Rita', 'Ram'])
+
+
+class SubmissionUploadTest(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        media_override = override_settings(MEDIA_ROOT=self.media.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.user = User.objects.create(username='owner')
+        self.form = FormSchema.objects.create(
+            title='Uploads', language_config={'primary': 'en'}, fields_structure=FIELDS, created_by=self.user
+        )
+
+    def _post(self, files):
+        return APIClient().post(
+            '/api/submissions/',
+            {'slug': self.form.slug, 'data': '{}', **files},
+            format='multipart',
+        )
+
+    def test_all_files_are_attached_in_one_insert(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        files = {'photos': [SimpleUploadedFile(f'p{i}.txt', b'x' * 10) for i in range(3)]}
+        with self.assertNumQueries(6):  # form by slug, form by pk, savepoint, submission, files, release
+            resp = self._post(files)
+        self.assertEqual(resp.status_code, 201)
+        submission = FormSubmission.objects.get(pk=resp.data['submission_id'])
+        self.assertEqual(submission.files.count(), 3)
+        for f in submission.files.all():
+            self.assertEqual(f.file.read(), b'x' * 10)
+
+    def test_failed_insert_leaves_no_files_behind(self):
+        import os
+        from unittest import mock
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from .models import FormFile
+        with mock.patch.object(FormFile.objects, 'bulk_create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self._post({'doc': SimpleUploadedFile('a.txt', b'abc')})
+        self.assertFalse(FormSubmission.objects.exists())
+        stored = [name for _, _, names in os.walk(self.media.name) for name in names]
+        self.assertEqual(stored, [])
+
+
+class DeletionJobTest(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.test import override_settings
+        from .models import FormFile
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        media_override = override_settings(MEDIA_ROOT=self.media.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+        self.user = User.objects.create(username='owner', is_superuser=True)
+        self.form = FormSchema.objects.create(
+            title='Survey', language_config={'primary': 'en'}, fields_structure=FIELDS, created_by=self.user
+        )
+        self.paths = []
+        for i in range(3):
+            submission = FormSubmission.objects.create(form_schema=self.form, data={'name': f'n{i}'})
+            f = FormFile.objects.create(submission=submission, file=SimpleUploadedFile(f'f{i}.txt', b'x'))
+            self.paths.append(f.file.path)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_form_delete_returns_job_and_gc_removes_files(self):
+        import os
+        from django.core.management import call_command
+        resp = self.client.delete(f'/api/forms/{self.form.slug}/')
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual((resp.data['status'], resp.data['files_total']), ('pending', 3))
+        self.assertFalse(FormSubmission.objects.exists())
+        self.assertTrue(all(os.path.exists(p) for p in self.paths))
+
+        call_command('gc_deleted_files', stdout=io.StringIO())
+        self.assertFalse(any(os.path.exists(p) for p in self.paths))
+        job = self.client.get(resp.data['status_url']).data
+        self.assertEqual((job['status'], job['files_deleted']), ('done', 3))
+
+    def test_submission_delete(self):
+        submission = FormSubmission.objects.order_by('id').first()
+        resp = self.client.delete(f'/api/submissions/{submission.pk}/')
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(resp.data['files_total'], 1)
+        self.assertEqual(FormSubmission.objects.count(), 2)
+
+
+class PublicSchemaCacheTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='owner')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.form = FormSchema.objects.create(
+                title='Survey', language_config={'primary': 'en'}, fields_structure=FIELDS, created_by=self.user
+            )
+        self.url = f'/api/forms/{self.form.slug}/public/'
+
+    def test_anonymous_render_is_cached_with_etag(self):
+        client = APIClient()
+        first = client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn('submission_count', first.data)
+        with self.assertNumQueries(0):
+            again = client.get(self.url)
+        self.assertEqual(again['ETag'], first['ETag'])
+        self.assertEqual(client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+    def test_saving_the_form_changes_the_etag(self):
+        client = APIClient()
+        etag = client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.form.title = 'Renamed'
+            self.form.save()
+        resp = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data['title'], 'Renamed')
+        self.assertNotEqual(resp['ETag'], etag)
+
+    def test_unknown_slug(self):
+        self.assertEqual(APIClient().get('/api/forms/nope1234/public/').status_code, 404)
+
+
+class FormListQueryBudgetTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='owner', is_superuser=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.add_forms()
+
+    def add_forms(self, n=3):
+        for i in range(n):
+            form = FormSchema.objects.create(
+                title=f'Form {i}', language_config={'primary': 'en'}, fields_structure=FIELDS, created_by=self.user
+            )
+            FormSubmission.objects.create(form_schema=form, data={'name': 'x'})
+
+    def test_form_list(self):
+        # forms with annotated counts
+        resp = self.assertQueryBudget(self.client, '/api/forms/', 1, grow=self.add_forms)
+        self.assertEqual({f['submission_count'] for f in resp.data}, {1})
 
-# Create your tests here.
+    def test_submission_list(self):
+        form = FormSchema.objects.first()
+        grow = lambda: [FormSubmission.objects.create(form_schema=form, data={'name': 'y'}) for _ in range(3)]
+        # form, submissions page, files prefetch
+        self.assertQueryBudget(self.client, f'/api/forms/{form.slug}/submissions/', 3, grow=grow)
@@ -0,0 +1,71 @@
+"""
+File ingestion for form submissions.
+
+Uploads arrive already spooled to temporary files on disk (see
+``FILE_UPLOAD_HANDLERS`` in settings), so memory use doesn't grow with the
+file size. They are moved into storage concurrently on a small thread pool
+*before* the database transaction opens; the submission row and all of its
+``FormFile`` rows are then written in one transaction with a single
+``bulk_create``. If anything fails the stored files are removed again, so a
+submission is either saved with all its files or not at all.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .models import FormFile
+
+
+UPLOAD_WORKERS = getattr(settings, 'FORM_UPLOAD_WORKERS', 4)
+
+
+def uploaded_files(files):
+    """Every file in request.FILES, including repeated keys."""
+    return [f for key in files for f in files.getlist(key)]
+
+
+def store_files(files, storage=default_storage):
+    """Write uploads to storage in parallel; returns the stored names in input order."""
+    if not files:
+        return []
+    field = FormFile._meta.get_field('file')
+    names = [field.generate_filename(None, f.name) for f in files]
+    if len(files) == 1:
+        return [storage.save(names[0], files[0])]
+
+    stored = []
+    with ThreadPoolExecutor(max_workers=min(UPLOAD_WORKERS, len(files))) as pool:
+        futures = [pool.submit(storage.save, name, f) for name, f in zip(names, files)]
+        errors = []
+        for future in futures:
+            try:
+                stored.append(future.result())
+            except Exception as e:
+                errors.append(e)
+    if errors:
+        discard_files(stored, storage)
+        raise errors[0]
+    return stored
+
+
+def discard_files(names, storage=default_storage):
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            pass
+
+
+def save_submission_with_files(serializer, files, storage=default_storage):
+    """Save a validated FormSubmission serializer and attach ``files`` atomically."""
+    stored = store_files(files, storage)
+    try:
+        with transaction.atomic():
+            submission = serializer.save()
+            FormFile.objects.bulk_create([FormFile(submission=submission, file=name) for name in stored])
+    except Exception:
+        discard_files(stored, storage)
+        raise
+    return submission
@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import FormSchemaViewSet, FormSubmissionViewSet
+from .views import DeletionJobViewSet, FormSchemaViewSet, FormSubmissionViewSet
 
 router = DefaultRouter()
 router.register(r'forms', FormSchemaViewSet, basename='form')
 router.register(r'submissions', FormSubmissionViewSet, basename='submission')
+router.register(r'deletion-jobs', DeletionJobViewSet, basename='deletion-job')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,17 +1,28 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from .models import FormSchema, FormSubmission, FormFile
+from rest_framework.reverse import reverse
+from .models import DeletionJob, FormSchema, FormSubmission
 from .serializers import (
+    DeletionJobSerializer,
     FormSchemaSerializer, 
     FormSubmissionSerializer,
     FormSubmissionListSerializer,
+    with_submission_count,
     # FormFileSerializer if needed
 )
 from users.permissions import IsSuperEmployee
-from django.db import transaction, IntegrityError, connection
+from ecombackend.pagination import KeysetPagination, NewestIdPagination, RankPagination, SubmittedAtPagination
+from .deletion import delete_form, delete_submission
+from .exports import EXPORT_FORMATS, streaming_export
+from .projections import ProjectionParamError, projection_queryset, projection_ready, uses_projection_params
+from .public_cache import etag_matches, public_schema
+from .related_options import related_options
+from .search import field_filters, search_submissions
+from .uploads import save_submission_with_files, uploaded_files
 
 
 class FormSchemaViewSet(viewsets.ModelViewSet):
@@ -26,6 +37,8 @@ class FormSchemaViewSet(viewsets.ModelViewSet):
         """Apply different permissions for different actions"""
         if self.action == 'create':
             permission_classes = [IsAuthenticated, IsSuperEmployee]
+        elif self.action == 'public':
+            permission_classes = [AllowAny]
         elif self.action in ['destroy']:
             permission_classes = [IsAuthenticated]  # deny deletion
         elif self.action in ['update', 'partial_update']:
@@ -40,11 +53,17 @@ class FormSchemaViewSet(viewsets.ModelViewSet):
             # Allow superusers or super employees to see all forms
             try:
                 if self.request.user.is_superuser or IsSuperEmployee().has_permission(self.request, self):
-                    return FormSchema.objects.all()
+                    return self.with_counts(FormSchema.objects.all())
             except Exception:
                 pass
-            return FormSchema.objects.filter(created_by=self.request.user)
-        return FormSchema.objects.all()
+            return self.with_counts(FormSchema.objects.filter(created_by=self.request.user))
+        return self.with_counts(FormSchema.objects.all())
+
+    def with_counts(self, queryset):
+        """Annotate submission_count where the response serializes it"""
+        if self.action in ('list', 'retrieve'):
+            return with_submission_count(queryset)
+        return queryset
 
     def perform_create(self, serializer):
         """Automatically assign the current user as the creator"""
@@ -74,98 +93,101 @@ class FormSchemaViewSet(viewsets.ModelViewSet):
         if not (request.user.is_superuser or has_super_emp):
             return Response({"error": "Only superusers or super employees can delete forms."}, status=status.HTTP_403_FORBIDDEN)
 
-        # Perform deletion: remove related files and submissions first to avoid FK integrity errors
+        # Delete the rows set-based; storage files are cleaned up by gc_deleted_files
         form = get_object_or_404(FormSchema, slug=kwargs.get('slug'))
-        try:
-            # First, remove files and submissions inside a transaction and commit
-            with transaction.atomic():
-                files_qs = FormFile.objects.filter(submission__form_schema=form)
-                submissions_qs = FormSubmission.objects.filter(form_schema=form)
-
-                # Debug counts before deletion
-                files_count_before = files_qs.count()
-                subs_count_before = submissions_qs.count()
-                print(f"[form-delete] starting delete for form={form.slug} files_before={files_count_before} subs_before={subs_count_before}")
-
-                # Try to remove files from storage first (ignore storage errors)
-                for f in files_qs:
-                    try:
-                        if getattr(f, 'file', None):
-                            f.file.delete(save=False)
-                    except Exception as ex:
-                        print(f"[form-delete] storage delete failed for file id={f.id}: {ex}")
-                        pass
-
-                # Delete file records and submissions
-                deleted_files = files_qs.delete()
-                deleted_subs = submissions_qs.delete()
-
-                files_count_after_files_delete = FormFile.objects.filter(submission__form_schema=form).count()
-                subs_count_after = FormSubmission.objects.filter(form_schema=form).count()
-                print(f"[form-delete] files_deleted={deleted_files} files_remaining_after_files_delete={files_count_after_files_delete}")
-                print(f"[form-delete] subs_deleted={deleted_subs} subs_remaining_after_subs_delete={subs_count_after}")
-
-            # At this point the deletions are committed. Delete the form in a separate step.
-            try:
-                # Refresh instance to ensure it's up-to-date
-                form.refresh_from_db()
-            except Exception:
-                # form may still exist; ignore refresh errors
-                pass
-
-            try:
-                form.delete()
-            except IntegrityError as e:
-                # If deletion still fails, return helpful error
-                return Response({"error": "Integrity error while deleting form", "detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        except Exception as e:
-            return Response({"error": "Failed to delete form", "detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        job = delete_form(form, request.user)
+        return deletion_accepted(job, request)
 
     @action(detail=True, methods=['get'])
     def public(self, request, slug=None):
-        """Public endpoint to get form structure by slug"""
-        form = get_object_or_404(FormSchema, slug=slug)
-        serializer = self.get_serializer(form)
-        return Response(serializer.data)
+        """Public endpoint to get form structure by slug (cached, supports If-None-Match)"""
+        entry = public_schema(slug)
+        if entry is None:
+            raise Http404
+        data, etag = entry
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(data, headers=headers)
+
+    def filter_submissions(self, form, params, ranked=False):
+        """Apply ?search= and ?filter_<field_id>= to a form's submissions"""
+        return search_submissions(form.submissions.all(), params, ranked=ranked)
 
     @action(detail=True, methods=['get'])
     def submissions(self, request, slug=None):
-        """Get all submissions for a specific form"""
-        form = self.get_object()
-        submissions = form.submissions.all()
-
-        search = request.query_params.get('search', None)
-        if search:
-            submissions = submissions.filter(data__icontains=search)
+        """Get all submissions for a specific form; ?ordering=rank sorts ?search= matches by relevance.
 
-        for key, value in request.query_params.items():
-            if key.startswith('filter_'):
-                field_id = key.replace('filter_', '')
-                submissions = submissions.filter(data__contains={field_id: value})
+        Forms with a built projection table also accept ?min_<field>=,
+        ?max_<field>= and ?sort=[-]<field> on their numeric, date, time and
+        choice fields.
+        """
+        form = self.get_object()
+        params = request.query_params
+        if uses_projection_params(params):
+            if not projection_ready(form):
+                return Response({'error': 'range filters and sort need a projection table for this form'}, status=status.HTTP_400_BAD_REQUEST)
+            return self.projected_submissions(form, request)
+
+        wants_rank = params.get('ordering') == 'rank'
+        submissions = self.filter_submissions(form, params, ranked=wants_rank)
+
+        ranked = 'rank' in submissions.query.annotations
+        paginator = RankPagination() if ranked else SubmittedAtPagination()
+        page = paginator.paginate_queryset(submissions.prefetch_related('files'), request, view=self)
+        serializer = FormSubmissionListSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    def projected_submissions(self, form, request):
+        """Filter and page on the typed projection table, then load that page's submissions"""
+        params = request.query_params
+        try:
+            rows, ordering = projection_queryset(form, params)
+        except ProjectionParamError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if params.get('search') or field_filters(params):
+            rows = rows.filter(submission_id__in=self.filter_submissions(form, params).values('id'))
+
+        paginator = KeysetPagination()
+        paginator.ordering = ordering
+        page = paginator.paginate_queryset(rows.only('submission_id', *[f.lstrip('-') for f in ordering]), request, view=self)
+        ids = [row.submission_id for row in page]
+        by_id = form.submissions.prefetch_related('files').in_bulk(ids)
+        serializer = FormSubmissionListSerializer([by_id[i] for i in ids if i in by_id], many=True)
+        return paginator.get_paginated_response(serializer.data)
 
-        serializer = FormSubmissionListSerializer(submissions, many=True)
-        return Response(serializer.data)
+    @action(detail=True, methods=['get'])
+    def export(self, request, slug=None):
+        """Stream all (filtered) submissions as ?output=ndjson (default) or ?output=csv"""
+        export_format = request.query_params.get('output', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return Response({'error': f"output must be one of: {', '.join(EXPORT_FORMATS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        form = self.get_object()
+        submissions = self.filter_submissions(form, request.query_params)
+        return streaming_export(form, submissions, export_format, request)
 
     @action(detail=True, methods=['get'])
     def related_data(self, request, slug=None):
-        """Get related form data for dropdowns"""
+        """Get related form data for dropdowns; ?q= matches label prefixes, ?limit= caps the list"""
         target_slug = request.query_params.get('target_slug')
         display_field = request.query_params.get('display_field')
 
         if not target_slug:
             return Response({'error': 'target_slug parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if not display_field:
+            return Response([])
 
-        target_form = get_object_or_404(FormSchema, slug=target_slug)
-        submissions = target_form.submissions.all()
-
-        options = []
-        for submission in submissions:
-            if display_field in submission.data:
-                options.append({'id': submission.id, 'label': submission.data[display_field]})
+        limit = request.query_params.get('limit')
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except ValueError:
+                return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+            if limit < 1:
+                return Response({'error': 'limit must be positive'}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(options)
+        target_form = get_object_or_404(FormSchema, slug=target_slug)
+        return Response(related_options(target_form, display_field, request.query_params.get('q'), limit))
 
 
 class FormSubmissionViewSet(viewsets.ModelViewSet):
@@ -174,6 +196,7 @@ class FormSubmissionViewSet(viewsets.ModelViewSet):
     """
     queryset = FormSubmission.objects.all()
     serializer_class = FormSubmissionSerializer
+    pagination_class = SubmittedAtPagination
     # Default: require authentication for most actions, but allow public submission (create)
     permission_classes = [IsAuthenticated]
 
@@ -186,7 +209,9 @@ class FormSubmissionViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Only show submissions for forms the user owns"""
         if self.request.user.is_authenticated:
-            return FormSubmission.objects.filter(form_schema__created_by=self.request.user)
+            return FormSubmission.objects.filter(form_schema__created_by=self.request.user).select_related(
+                'form_schema'
+            ).prefetch_related('files')
         return FormSubmission.objects.none()
 
     def create(self, request, *args, **kwargs):
@@ -217,21 +242,8 @@ class FormSubmissionViewSet(viewsets.ModelViewSet):
                 'errors': serializer.errors
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Save and return the created submission instance
-        submission = serializer.save()
-
-        # Handle any uploaded files in request.FILES (support FormData uploads)
-        for file_key, uploaded in request.FILES.items():
-            # uploaded may be an UploadedFile or list-like; handle both
-            if hasattr(uploaded, 'read'):
-                FormFile.objects.create(submission=submission, file=uploaded)
-            else:
-                # If multiple files under same key
-                try:
-                    for f in uploaded:
-                        FormFile.objects.create(submission=submission, file=f)
-                except Exception:
-                    pass
+        # Save the submission together with any uploaded files (FormData uploads)
+        submission = save_submission_with_files(serializer, uploaded_files(request.FILES))
 
         return Response(
             {'message': 'Form submitted successfully', 'submission_id': submission.id},
@@ -248,40 +260,28 @@ class FormSubmissionViewSet(viewsets.ModelViewSet):
         return ip
 
     def destroy(self, request, *args, **kwargs):
-        """Safely delete a submission: remove files first, commit, then delete the submission."""
+        """Delete a submission and its file rows; storage files are removed in the background."""
         submission = self.get_object()
-        try:
-            # Delete files (storage + DB) in a transaction and commit
-            files_qs = FormFile.objects.filter(submission=submission)
-            files_list = list(files_qs)
-            files_count_before = len(files_list)
-            print(f"[submission-delete] submission={submission.id} files_before={files_count_before}")
-            # Try to delete storage files first
-            for f in files_list:
-                try:
-                    if getattr(f, 'file', None):
-                        f.file.delete(save=False)
-                except Exception as ex:
-                    print(f"[submission-delete] storage delete failed for file id={f.id}: {ex}")
-
-            # Ensure DB rows removed - use transaction for safety
-            with transaction.atomic():
-                # Use raw SQL delete to ensure all rows removed regardless of ORM state
-                with connection.cursor() as cursor:
-                    cursor.execute('DELETE FROM forms_app_formsubmissionfile WHERE submission_id = %s', [submission.id])
-                # double-check
-                remaining = FormFile.objects.filter(submission=submission).count()
-                print(f"[submission-delete] files_deleted_db rows_remaining={remaining}")
-
-            # Now delete the submission itself
-            try:
-                submission.delete()
-            except IntegrityError as e:
-                # If deletion still fails, report remaining referencing rows for debugging
-                refs = list(FormFile.objects.filter(submission=submission).values_list('id', flat=True))
-                print(f"[submission-delete] IntegrityError deleting submission id={submission.id}, remaining file refs={refs}")
-                return Response({"error": "Integrity error while deleting submission", "detail": str(e), "remaining_file_ids": refs}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-            return Response(status=status.HTTP_204_NO_CONTENT)
-        except Exception as e:
-            return Response({"error": "Failed to delete submission", "detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        job = delete_submission(submission, request.user)
+        return deletion_accepted(job, request)
+
+
+class DeletionJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Status of background file cleanup started by form/submission deletes.
+    """
+    serializer_class = DeletionJobSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = NewestIdPagination
+
+    def get_queryset(self):
+        if self.request.user.is_superuser:
+            return DeletionJob.objects.all()
+        return DeletionJob.objects.filter(requested_by=self.request.user)
+
+
+def deletion_accepted(job, request):
+    """202 with the job and where to poll it"""
+    data = DeletionJobSerializer(job).data
+    data['status_url'] = reverse('deletion-job-detail', args=[job.pk], request=request)
+    return Response(data, status=status.HTTP_202_ACCEPTED)
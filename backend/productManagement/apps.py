@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class ProductmanagementConfig(AppConfig):
     name = 'productManagement'
+
+    def ready(self):
+        # connect PriceHistory capture and low-stock alert signals, and the
+        # pre_save read of the values they compare against
+        from . import low_stock, prices, signals  # noqa: F401
@@ -0,0 +1,177 @@
+"""
+Stock history retention: daily snapshots, compaction and point-in-time levels.
+
+Every stock change writes a StockHistory row in the same transaction as
+the ``current_stock`` update (see stock.py), so a product's level at any
+time T is ``current_stock`` minus the changes after T. Replaying that from
+today gets slower as history grows, so:
+
+- ``take_snapshot`` records every product's level at the start of a day,
+  derived in one statement from ``current_stock`` and the history after
+  it (so the two are always consistent). Snapshots are only ever taken at
+  day boundaries.
+- ``compact_history`` moves StockHistory rows older than the retention
+  window into StockDailySummary (net quantity per product, day and change
+  type), snapshotting the window's first day first.
+
+``stock_at`` starts from the nearest snapshot at or before T and adds the
+summaries and fine-grained rows in between. Inside the compacted window
+individual changes are gone, so there the answer has day resolution: the
+level at the start of T's day.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Product, StockDailySummary, StockHistory, StockSnapshot
+
+
+RETENTION_DAYS = getattr(settings, 'STOCK_HISTORY_RETENTION_DAYS', 90)
+COMPACT_BATCH_SIZE = 50000
+
+
+class HistoryParamError(ValueError):
+    pass
+
+
+def parse_moment(value, name):
+    """An aware datetime from an ISO datetime or date (a date means the start of that day)."""
+    try:
+        # well formed but impossible (2024-02-30, 25:00) raises rather than returning None
+        dt = parse_datetime(value)
+        d = parse_date(value) if dt is None else None
+    except ValueError:
+        raise HistoryParamError(f"{name} is not a valid date or time")
+    if dt is None:
+        if d is None:
+            raise HistoryParamError(f"{name} must be an ISO date or datetime")
+        dt = datetime.combine(d, time.min)
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _tables():
+    qn = connection.ops.quote_name
+    return {
+        'products': qn(Product._meta.db_table),
+        'history': qn(StockHistory._meta.db_table),
+        'summaries': qn(StockDailySummary._meta.db_table),
+        'snapshots': qn(StockSnapshot._meta.db_table),
+    }
+
+
+def take_snapshot(day=None):
+    """Snapshot every product that existed at the start of ``day`` (default today).
+
+    Products that already have a snapshot for that day are left alone;
+    returns the number of snapshots written.
+    """
+    day = day or timezone.localdate()
+    at = _start_of_day(day)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            '''
+            INSERT INTO {snapshots} (product_id, taken_at, level)
+            SELECT p.id, %s, p.current_stock - COALESCE(h.delta, 0) - COALESCE(s.delta, 0)
+            FROM {products} p
+            LEFT JOIN (
+                SELECT product_id, SUM(quantity) AS delta FROM {history}
+                WHERE timestamp >= %s GROUP BY product_id
+            ) h ON h.product_id = p.id
+            LEFT JOIN (
+                SELECT product_id, SUM(quantity) AS delta FROM {summaries}
+                WHERE day >= %s GROUP BY product_id
+            ) s ON s.product_id = p.id
+            WHERE p.created_at < %s
+            ON CONFLICT (product_id, taken_at) DO NOTHING
+            '''.format(**_tables()),
+            [at, at, day, at],
+        )
+        return cursor.rowcount
+
+
+def compact_history(retention_days=RETENTION_DAYS, batch_size=COMPACT_BATCH_SIZE, today=None):
+    """Fold StockHistory rows from before the retention window into daily summaries.
+
+    Returns the number of history rows compacted. Each batch moves its rows
+    with a single ``DELETE ... RETURNING`` feeding the summary upsert, so a
+    row is never both deleted and left out of the summaries, and batches
+    commit separately so a long first run can be interrupted.
+    """
+    cutoff_day = (today or timezone.localdate()) - timedelta(days=retention_days)
+    cutoff = _start_of_day(cutoff_day)
+    # the window's first day must be answerable exactly once the rows before it are gone
+    take_snapshot(cutoff_day)
+    tz = timezone.get_current_timezone_name()
+    moved = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                '''
+                WITH moved AS (
+                    DELETE FROM {history} WHERE id IN (
+                        SELECT id FROM {history} WHERE timestamp < %s ORDER BY id LIMIT %s
+                    )
+                    RETURNING product_id, change_type, quantity, (timestamp AT TIME ZONE %s)::date AS day
+                ),
+                folded AS (
+                    INSERT INTO {summaries} (product_id, day, change_type, quantity, entries)
+                    SELECT product_id, day, change_type, SUM(quantity), COUNT(*) FROM moved
+                    GROUP BY product_id, day, change_type
+                    ON CONFLICT (product_id, day, change_type) DO UPDATE
+                    SET quantity = {summaries}.quantity + EXCLUDED.quantity,
+                        entries = {summaries}.entries + EXCLUDED.entries
+                )
+                SELECT COUNT(*) FROM moved
+                '''.format(**_tables()),
+                [cutoff, batch_size, tz],
+            )
+            count = cursor.fetchone()[0]
+        moved += count
+        if count < batch_size:
+            return moved
+
+
+def stock_at(product, at):
+    """``(level, resolution)`` for ``product`` at ``at``, or None if it didn't exist yet.
+
+    ``resolution`` is ``'exact'``, or ``'day'`` when ``at`` falls in a
+    compacted day and the level is the one at the start of that day.
+    """
+    if product.created_at > at:
+        return None
+    day = timezone.localdate(at)
+    resolution = 'exact'
+    if StockDailySummary.objects.filter(product=product, day=day).exists():
+        at, resolution = _start_of_day(day), 'day'
+
+    snapshot = (
+        StockSnapshot.objects.filter(product=product, taken_at__lte=at)
+        .order_by('-taken_at').values_list('taken_at', 'level').first()
+    )
+    history = StockHistory.objects.filter(product=product)
+    summaries = StockDailySummary.objects.filter(product=product)
+    if snapshot is not None:
+        # forwards from the snapshot; its day boundary lines up with the summaries
+        taken_at, level = snapshot
+        fine = history.filter(timestamp__gte=taken_at, timestamp__lte=at)
+        compacted = summaries.filter(day__gte=timezone.localdate(taken_at), day__lt=day)
+        sign = 1
+    else:
+        # backwards from the current level
+        level = product.current_stock
+        fine = history.filter(timestamp__gt=at)
+        compacted = summaries.filter(day__gte=day)
+        sign = -1
+    level += sign * (fine.aggregate(total=Sum('quantity'))['total'] or 0)
+    level += sign * (compacted.aggregate(total=Sum('quantity'))['total'] or 0)
+    return level, resolution
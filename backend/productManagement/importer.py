@@ -0,0 +1,234 @@
+"""
+Bulk catalog import for ``Product``.
+
+Rows come from CSV (with a header) or NDJSON, one product per row/line,
+with ``sku``, ``name``, ``price`` and optional ``category`` (by name) and
+``current_stock`` (only used when the SKU is new; stock on existing
+products is owned by the adjustment endpoints).
+
+Input is read lazily and handled in chunks. Each chunk is validated
+against the model fields, categories are resolved through an in-memory
+name -> id map (unknown names are created once), and the valid rows are
+upserted on ``sku`` with one ``bulk_create(update_conflicts=True)``.
+PriceHistory rows are written only for existing SKUs whose price
+changed, and new SKUs that start out low on stock raise low-stock alerts
+(see low_stock.py); ``products_imported`` is sent for each chunk in
+place of the post_save that bulk_create skips. Every chunk commits on
+its own and yields a progress report with its row errors, so bad rows or
+a failing chunk don't abort the rest of the import.
+"""
+import csv
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+
+from .models import Category, Product
+from .low_stock import record_crossings
+from .prices import record_price_changes
+from .signals import products_imported
+
+
+CHUNK_SIZE = 1000
+FORMATS = ('csv', 'ndjson')
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def detect_format(content_type='', filename=''):
+    """'csv' or 'ndjson' from an upload's content type or file name, or None."""
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    filename = (filename or '').lower()
+    if content_type in ('text/csv', 'application/csv') or filename.endswith('.csv'):
+        return 'csv'
+    if content_type in ('application/x-ndjson', 'application/ndjson', 'application/jsonl') \
+            or filename.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return None
+
+
+def _text_lines(lines, undecodable):
+    """Decoded lines; the numbers of lines that aren't UTF-8 go into ``undecodable``.
+
+    Those lines are decoded with replacement characters, and the rows they
+    belong to are reported as errors instead of ending the stream.
+    """
+    for number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            try:
+                line = line.decode('utf-8-sig')
+            except UnicodeDecodeError:
+                undecodable.add(number)
+                line = line.decode('utf-8', 'replace')
+        yield line
+
+
+def read_rows(lines, fmt):
+    """Yield ``(line_number, row)`` from an iterable of lines.
+
+    ``row`` is a dict, or an ImportFormatError for a line that can't be
+    parsed (so it is reported with the rest of its chunk).
+    """
+    if fmt not in FORMATS:
+        raise ImportFormatError(f'format must be one of {", ".join(FORMATS)}')
+    undecodable = set()
+    lines = _text_lines(lines, undecodable)
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        last = reader.line_num
+        for row in reader:
+            # a quoted field can span lines; the row is bad if any of them was
+            if any(n in undecodable for n in range(last + 1, reader.line_num + 1)):
+                row = ImportFormatError('not valid UTF-8')
+            last = reader.line_num
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(lines, start=1):
+        if number in undecodable:
+            yield number, ImportFormatError('not valid UTF-8')
+            continue
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, ImportFormatError(f'invalid JSON: {e}')
+            continue
+        yield number, row if isinstance(row, dict) else ImportFormatError('expected a JSON object')
+
+
+def _chunks(rows, size):
+    chunk = []
+    for item in rows:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+_fields = {name: Product._meta.get_field(name) for name in ('sku', 'name', 'price', 'current_stock')}
+_category_name = Category._meta.get_field('name')
+
+
+def _clean(row):
+    """``(values, errors)`` for one input row, validated against the model fields."""
+    values, errors = {}, {}
+    for name, field in _fields.items():
+        raw = row.get(name)
+        if isinstance(raw, str):
+            raw = raw.strip()
+        elif isinstance(raw, float):
+            # JSON numbers: 0.2 should mean Decimal('0.2'), not its binary expansion
+            raw = str(raw)
+        if name == 'current_stock' and raw in (None, ''):
+            values[name] = 0
+            continue
+        try:
+            values[name] = field.clean(raw, None)
+        except ValidationError as e:
+            errors[name] = e.messages
+    category = row.get('category')
+    category = category.strip() if isinstance(category, str) else category
+    if category in (None, ''):
+        values['category'] = None
+    else:
+        try:
+            values['category'] = _category_name.clean(category, None)
+        except ValidationError as e:
+            errors['category'] = e.messages
+    return values, errors
+
+
+class CategoryMap:
+    """Category name -> id, loaded once per import; missing names are created on demand."""
+
+    def __init__(self):
+        self._ids = {}
+        for pk, name in Category.objects.order_by('pk').values_list('pk', 'name'):
+            self._ids.setdefault(name, pk)
+
+    def resolve(self, names):
+        missing = sorted({n for n in names if n is not None and n not in self._ids})
+        if missing:
+            for category in Category.objects.bulk_create([Category(name=n) for n in missing]):
+                self._ids[category.name] = category.pk
+        return self._ids
+
+
+def _import_chunk(number, chunk, categories):
+    report = {'chunk': number, 'rows': len(chunk), 'created': 0, 'updated': 0, 'price_changes': 0, 'errors': []}
+    valid = {}
+    for line, row in chunk:
+        if isinstance(row, Exception):
+            report['errors'].append({'line': line, 'errors': {'row': [str(row)]}})
+            continue
+        values, errors = _clean(row)
+        if errors:
+            report['errors'].append({'line': line, 'sku': row.get('sku'), 'errors': errors})
+            continue
+        # ON CONFLICT can't touch a row twice in one statement; the last line for a SKU wins
+        valid[values['sku']] = values
+    if not valid:
+        return report
+
+    try:
+        # outside the chunk's transaction: a rolled-back chunk must not leave
+        # ids in the map for categories that were never committed
+        category_ids = categories.resolve(v['category'] for v in valid.values())
+        with transaction.atomic():
+            existing = {
+                sku: (pk, price)
+                for pk, sku, price in Product.objects.select_for_update()
+                .filter(sku__in=list(valid)).order_by('sku').values_list('pk', 'sku', 'price')
+            }
+            products = Product.objects.bulk_create(
+                [
+                    Product(
+                        sku=sku, name=v['name'], price=v['price'], current_stock=v['current_stock'],
+                        category_id=category_ids.get(v['category']),
+                    )
+                    for sku, v in valid.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['sku'],
+                update_fields=['name', 'price', 'category'],
+            )
+            price_changes = record_price_changes(
+                (existing[sku][0], existing[sku][1], v['price'])
+                for sku, v in valid.items() if sku in existing
+            )
+            # new products can start out low on stock
+            record_crossings(
+                (p.pk, False, p.current_stock, p.reorder_threshold) for p in products if p.sku not in existing
+            )
+            products_imported.send(sender=Product, products=products)
+    except DatabaseError as e:
+        report['errors'].append({'errors': {'chunk': [str(e)]}})
+        return report
+
+    report['updated'] = sum(1 for sku in valid if sku in existing)
+    report['created'] = len(valid) - report['updated']
+    report['price_changes'] = price_changes
+    return report
+
+
+def import_products(rows, chunk_size=CHUNK_SIZE):
+    """Upsert ``(line_number, row)`` pairs (see read_rows); yields one report per chunk."""
+    categories = CategoryMap()
+    for number, chunk in enumerate(_chunks(rows, chunk_size), start=1):
+        yield _import_chunk(number, chunk, categories)
+
+
+def track(reports, totals):
+    """Pass chunk reports through while adding them up into ``totals``."""
+    totals.update(chunks=0, rows=0, created=0, updated=0, price_changes=0, errors=0)
+    for report in reports:
+        totals['chunks'] += 1
+        for key in ('rows', 'created', 'updated', 'price_changes'):
+            totals[key] += report[key]
+        totals['errors'] += len(report['errors'])
+        yield report
@@ -0,0 +1,139 @@
+"""
+Low-stock feed.
+
+A product is low while ``current_stock <= reorder_threshold``; the partial
+index ``inventory_low_stock_idx`` holds exactly those rows, so listing
+them never touches the rest of the catalog.
+
+Stock mutations report what they changed to ``record_crossings``. A
+product that crosses its threshold (either way) gets a StockAlert row in
+the mutation's transaction, and after commit the cached feed's version
+token is replaced. The cache holds only which products are low; each read
+of ``low_stock_feed`` loads their rows fresh by primary key, so stock,
+price and name edits that don't cross a threshold (or a delete) are never
+stale. StockAlert ids double as the event ids of the
+``/low-stock/events/`` stream, so a client reconnecting with
+``Last-Event-ID`` picks up where it left off.
+"""
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Product, StockAlert
+from .serializers import ProductSerializer
+
+
+FEED_VERSION_KEY = 'inventory:low_stock:version'
+FEED_CACHE_TIMEOUT = 60 * 60
+STREAM_POLL_SECONDS = getattr(settings, 'LOW_STOCK_STREAM_POLL_SECONDS', 2)
+# streams end after this long and the client reconnects with Last-Event-ID,
+# so a dashboard left open doesn't hold a worker forever
+STREAM_MAX_SECONDS = getattr(settings, 'LOW_STOCK_STREAM_MAX_SECONDS', 300)
+HEARTBEAT_SECONDS = 15
+
+
+def invalidate_low_stock_feed():
+    cache.set(FEED_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def record_crossings(changes):
+    """Alert on ``[(product_id, was_low, current_stock, reorder_threshold), ...]`` that crossed.
+
+    ``was_low`` is whether the product was low before the change (False for
+    new products); the other values are the product's state after it. Call
+    inside the transaction that made the change; returns the number of
+    alerts written.
+    """
+    alerts = []
+    for product_id, was_low, stock, threshold in changes:
+        is_low = stock <= threshold
+        if is_low != was_low:
+            alerts.append(StockAlert(
+                product_id=product_id, kind='low' if is_low else 'restocked',
+                current_stock=stock, reorder_threshold=threshold,
+            ))
+    if alerts:
+        StockAlert.objects.bulk_create(alerts)
+        transaction.on_commit(invalidate_low_stock_feed)
+    return len(alerts)
+
+
+def low_stock_products():
+    """Products at or below their reorder threshold, emptiest first (served by the partial index)."""
+    return Product.objects.filter(current_stock__lte=F('reorder_threshold')).order_by('current_stock', 'id')
+
+
+def low_stock_feed():
+    """The serialized low-stock list; its ids are cached until the next threshold crossing."""
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        cache.add(FEED_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(FEED_VERSION_KEY)
+    key = f'inventory:low_stock:ids:{version}'
+    ids = cache.get(key)
+    if ids is None:
+        ids = list(low_stock_products().values_list('id', flat=True))
+        cache.set(key, ids, timeout=FEED_CACHE_TIMEOUT)
+    # re-filtered so a product restocked before the new token is out drops off already
+    return ProductSerializer(low_stock_products().filter(pk__in=ids), many=True).data
+
+
+def latest_alert_id():
+    return StockAlert.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def alerts_after(last_id, limit=500):
+    return list(
+        StockAlert.objects.filter(id__gt=last_id).order_by('id')
+        .values('id', 'product_id', 'product__sku', 'kind', 'current_stock', 'reorder_threshold', 'created_at')[:limit]
+    )
+
+
+def alert_stream(last_id, wait=STREAM_MAX_SECONDS):
+    """Server-sent events for alerts after ``last_id``, polling for ``wait`` seconds."""
+    deadline = time.monotonic() + wait
+    last_sent = time.monotonic()
+    yield f'retry: {STREAM_POLL_SECONDS * 1000}\n\n'
+    while True:
+        alerts = alerts_after(last_id)
+        for alert in alerts:
+            last_id = alert['id']
+            data = json.dumps({
+                'product': alert['product_id'],
+                'sku': alert['product__sku'],
+                'current_stock': alert['current_stock'],
+                'reorder_threshold': alert['reorder_threshold'],
+                'at': alert['created_at'],
+            }, cls=DjangoJSONEncoder)
+            yield f"id: {last_id}\nevent: {alert['kind']}\ndata: {data}\n\n"
+        now = time.monotonic()
+        if alerts:
+            last_sent = now
+        elif now - last_sent >= HEARTBEAT_SECONDS:
+            last_sent = now
+            yield ': keep-alive\n\n'
+        if now >= deadline:
+            return
+        if not alerts:
+            time.sleep(min(STREAM_POLL_SECONDS, max(deadline - now, 0)))
+
+
+@receiver(post_save, sender=Product)
+def _stock_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    # read in pre_save (signals.py)
+    previous = getattr(instance, '_previous', {})
+    if not created and 'current_stock' not in previous:
+        return
+    was_low = not created and previous['current_stock'] <= previous['reorder_threshold']
+    record_crossings([(instance.pk, was_low, int(instance.current_stock), int(instance.reorder_threshold))])
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from productManagement.history import COMPACT_BATCH_SIZE, RETENTION_DAYS, compact_history
+
+
+class Command(BaseCommand):
+    help = 'Fold stock history older than the retention window into daily summaries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=RETENTION_DAYS)
+        parser.add_argument('--batch-size', type=int, default=COMPACT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['retention_days'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--retention-days must be >= 0 and --batch-size >= 1.')
+        moved = compact_history(options['retention_days'], options['batch_size'])
+        self.stdout.write(f'Compacted {moved} history rows')
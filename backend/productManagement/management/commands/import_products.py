@@ -0,0 +1,40 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from productManagement.importer import CHUNK_SIZE, FORMATS, detect_format, import_products, read_rows, track
+
+
+class Command(BaseCommand):
+    help = 'Upsert products by SKU from a CSV or NDJSON catalog file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--errors', help='Write rejected rows to this NDJSON file.')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or detect_format(filename=options['path'])
+        if fmt is None:
+            raise CommandError('Cannot tell the format from the file name; pass --format.')
+        error_log = open(options['errors'], 'w') if options['errors'] else None
+        totals = {}
+        try:
+            with open(options['path'], 'rb') as lines:
+                for report in track(import_products(read_rows(lines, fmt), options['chunk_size']), totals):
+                    self.stdout.write(
+                        f"chunk {report['chunk']}: {report['rows']} rows, {report['created']} created, "
+                        f"{report['updated']} updated, {report['price_changes']} price changes, "
+                        f"{len(report['errors'])} errors"
+                    )
+                    if error_log:
+                        for error in report['errors']:
+                            error_log.write(json.dumps(error) + '\n')
+        finally:
+            if error_log:
+                error_log.close()
+        self.stdout.write(
+            f"Imported {totals['rows']} rows in {totals['chunks']} chunks: {totals['created']} created, "
+            f"{totals['updated']} updated, {totals['price_changes']} price changes, {totals['errors']} errors"
+        )
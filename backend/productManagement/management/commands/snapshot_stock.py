@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from productManagement.history import take_snapshot
+
+
+class Command(BaseCommand):
+    help = "Snapshot every product's stock level at the start of a day (run daily)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--day', help='ISO date; defaults to today.')
+
+    def handle(self, *args, **options):
+        day = None
+        if options['day']:
+            day = parse_date(options['day'])
+            if day is None:
+                raise CommandError('--day must be an ISO date.')
+        written = take_snapshot(day)
+        self.stdout.write(f'Wrote {written} snapshots')
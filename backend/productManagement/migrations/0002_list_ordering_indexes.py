@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-18 02:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productManagement', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-created_at'], name='productMana_created_c048ea_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockhistory',
+            index=models.Index(fields=['product', '-timestamp'], name='productMana_product_4efbe3_idx'),
+        ),
+    ]
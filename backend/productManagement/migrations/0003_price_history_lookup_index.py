@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 02:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productManagement', '0002_list_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pricehistory',
+            index=models.Index(fields=['product', 'changed_at'], name='productMana_product_9a0626_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-18 02:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productManagement', '0004_low_stock_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockDailySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('change_type', models.CharField(max_length=50)),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('entries', models.IntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_daily_summaries', to='productManagement.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('product', 'day', 'change_type'), name='inventory_summary_product_day_type')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField()),
+                ('level', models.IntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='productManagement.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('product', 'taken_at'), name='inventory_snapshot_product_time')],
+            },
+        ),
+    ]
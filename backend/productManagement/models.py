@@ -1,4 +1,7 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models import F, Q
+from django.db.models.functions import Upper
 
 
 class Category(models.Model):
@@ -10,16 +13,80 @@ class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     current_stock = models.IntegerField(default=0)
+    # the product is low on stock while current_stock <= reorder_threshold
+    reorder_threshold = models.IntegerField(default=5)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at']),
+            # only low-stock rows are indexed, so the low-stock feed never scans the catalog
+            models.Index(
+                fields=['current_stock', 'id'],
+                condition=Q(current_stock__lte=F('reorder_threshold')),
+                name='inventory_low_stock_idx',
+            ),
+            # trigram indexes for product search (productsearch/search.py); on
+            # UPPER() so they serve both % and the UPPER(col) LIKE of icontains
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='inventory_product_name_trgm'),
+            GinIndex(OpClass(Upper('sku'), name='gin_trgm_ops'), name='inventory_product_sku_trgm'),
+        ]
+
 class StockHistory(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="stock_history")
     change_type = models.CharField(max_length=50)  # purchase, sale, return, manual_update
     quantity = models.IntegerField()
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', '-timestamp']),
+        ]
+
+class StockSnapshot(models.Model):
+    """A product's stock level at the start of a day (see history.py)."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="stock_snapshots")
+    taken_at = models.DateTimeField()
+    level = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'taken_at'], name='inventory_snapshot_product_time'),
+        ]
+
+class StockDailySummary(models.Model):
+    """Net quantity per product, day and change type for StockHistory rows past retention."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="stock_daily_summaries")
+    day = models.DateField()
+    change_type = models.CharField(max_length=50)
+    quantity = models.BigIntegerField(default=0)
+    entries = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'day', 'change_type'], name='inventory_summary_product_day_type'),
+        ]
+
+class StockAlert(models.Model):
+    """A product crossing its reorder threshold, in either direction (see low_stock.py)."""
+    KIND_CHOICES = (
+        ('low', 'Low'),
+        ('restocked', 'Restocked'),
+    )
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="stock_alerts")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    current_stock = models.IntegerField()
+    reorder_threshold = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
 class PriceHistory(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="price_history")
     old_price = models.DecimalField(max_digits=10, decimal_places=2)
     new_price = models.DecimalField(max_digits=10, decimal_places=2)
     changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # point-in-time lookups (see prices.py)
+            models.Index(fields=['product', 'changed_at']),
+        ]
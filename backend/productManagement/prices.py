@@ -0,0 +1,124 @@
+"""
+Price history capture and point-in-time price lookups.
+
+Every change to ``Product.price`` leaves a PriceHistory row: saves go
+through the post_save signal below (the old price is read in pre_save, in
+signals.py), and the bulk catalog import records its changes with
+``record_price_changes`` in the same transaction as its upsert. (``QuerySet.update(price=...)`` skips both, like every other
+signal in the project, so don't reprice that way.)
+
+History rows only exist for changes, never for a product's first price, so
+the price at time T is resolved as: the ``new_price`` of the last change at
+or before T; failing that, the ``old_price`` of the first change after T;
+failing that, the current price. Products created after T had no price
+then. Both lookups walk the (product, changed_at) index, and
+``prices_at`` resolves any number of (sku, timestamp) lines in one query.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .history import HistoryParamError, parse_moment
+from .models import PriceHistory, Product
+
+
+MAX_LOOKUP_LINES = getattr(settings, 'INVENTORY_PRICE_LOOKUP_MAX_LINES', 100000)
+
+
+class PriceLookupError(ValueError):
+    pass
+
+
+def _parse_timestamp(value, name):
+    # a bare date means the start of that day
+    try:
+        return parse_moment(value, name)
+    except HistoryParamError as e:
+        raise PriceLookupError(str(e))
+
+
+def parse_lookup(data):
+    """``[(sku, timestamp), ...]`` from ``{"at", "skus"}`` or ``{"lines": [{"sku", "at"}]}``."""
+    if not isinstance(data, dict):
+        raise PriceLookupError("request body must be an object")
+    if data.get('lines') is not None:
+        items = data['lines']
+        if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+            raise PriceLookupError("lines must be a list of {sku, at} objects")
+        pairs = [(i.get('sku'), i.get('at')) for i in items]
+    else:
+        skus = data.get('skus')
+        if not isinstance(skus, list):
+            raise PriceLookupError("send skus and at, or lines")
+        pairs = [(sku, data.get('at')) for sku in skus]
+    if len(pairs) > MAX_LOOKUP_LINES:
+        raise PriceLookupError(f"at most {MAX_LOOKUP_LINES} lines per request")
+    lines, parsed = [], {}
+    for n, (sku, at) in enumerate(pairs):
+        if not isinstance(sku, str) or not sku:
+            raise PriceLookupError(f"line {n}: sku must be a non-empty string")
+        if not isinstance(at, str):
+            raise PriceLookupError(f"line {n}: at must be an ISO date or datetime")
+        if at not in parsed:
+            parsed[at] = _parse_timestamp(at, f"line {n}: at")
+        lines.append((sku, parsed[at]))
+    return lines
+
+
+def record_price_changes(changes):
+    """Write history for ``[(product_id, old_price, new_price), ...]``, skipping non-changes."""
+    rows = [
+        PriceHistory(product_id=product_id, old_price=old, new_price=new)
+        for product_id, old, new in changes
+        if old != new
+    ]
+    PriceHistory.objects.bulk_create(rows)
+    return len(rows)
+
+
+def prices_at(lines):
+    """Resolve ``[(sku, timestamp), ...]`` to ``[(sku, timestamp, price or None), ...]`` in input order.
+
+    ``price`` is None for unknown SKUs and for products created after the
+    timestamp.
+    """
+    if not lines:
+        return []
+    skus = [sku for sku, _ in lines]
+    stamps = [at for _, at in lines]
+    qn = connection.ops.quote_name
+    products = qn(Product._meta.db_table)
+    history = qn(PriceHistory._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            SELECT CASE WHEN p.created_at <= q.at
+                        THEN COALESCE(before.new_price, after.old_price, p.price) END
+            FROM unnest(%s::varchar[], %s::timestamptz[]) WITH ORDINALITY AS q(sku, at, n)
+            LEFT JOIN {products} p ON p.sku = q.sku
+            LEFT JOIN LATERAL (
+                SELECT h.new_price FROM {history} h
+                WHERE h.product_id = p.id AND h.changed_at <= q.at
+                ORDER BY h.changed_at DESC, h.id DESC LIMIT 1
+            ) before ON TRUE
+            LEFT JOIN LATERAL (
+                SELECT h.old_price FROM {history} h
+                WHERE before.new_price IS NULL AND h.product_id = p.id AND h.changed_at > q.at
+                ORDER BY h.changed_at, h.id LIMIT 1
+            ) after ON TRUE
+            ORDER BY q.n
+            ''',
+            [skus, stamps],
+        )
+        prices = [row[0] for row in cursor.fetchall()]
+    return [(sku, at, price) for (sku, at), price in zip(lines, prices)]
+
+
+@receiver(post_save, sender=Product)
+def _price_saved(sender, instance, created, raw=False, **kwargs):
+    # read in pre_save (signals.py)
+    previous = getattr(instance, '_previous', {}).get('price')
+    if raw or created or previous is None:
+        return
+    price = Product._meta.get_field('price').to_python(instance.price)
+    record_price_changes([(instance.pk, previous, price)])
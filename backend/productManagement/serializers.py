@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Product, StockHistory, PriceHistory
+from .models import Product, StockHistory, PriceHistory, StockDailySummary
 
 class ProductSerializer(serializers.ModelSerializer):
     class Meta:
@@ -11,6 +11,11 @@ class StockHistorySerializer(serializers.ModelSerializer):
         model = StockHistory
         fields = "__all__"
 
+class StockDailySummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StockDailySummary
+        fields = "__all__"
+
 class PriceHistorySerializer(serializers.ModelSerializer):
     class Meta:
         model = PriceHistory
@@ -0,0 +1,29 @@
+from django.db.models.signals import pre_save
+from django.dispatch import Signal, receiver
+
+from .models import Product
+
+
+# sent by the catalog import (inside each chunk's transaction) with the
+# products it created or updated, since bulk_create skips post_save
+products_imported = Signal()
+
+# stored values the post_save handlers compare against (price history in
+# prices.py, threshold crossings in low_stock.py); a group is read whole
+# when a save touches any of its fields
+PREVIOUS_FIELDS = (('price',), ('current_stock', 'reorder_threshold'))
+
+
+@receiver(pre_save, sender=Product)
+def _remember_previous_values(sender, instance, raw=False, update_fields=None, **kwargs):
+    """One read of the stored values every Product post_save handler needs, as ``instance._previous``."""
+    instance._previous = {}
+    if raw or instance.pk is None:
+        return
+    fields = [
+        field for group in PREVIOUS_FIELDS
+        if update_fields is None or set(group) & set(update_fields)
+        for field in group
+    ]
+    if fields:
+        instance._previous = Product.objects.filter(pk=instance.pk).values(*fields).first() or {}
@@ -0,0 +1,134 @@
+"""
+Stock mutations.
+
+``current_stock`` is never read-modify-written in Python: a single
+adjustment is one ``UPDATE ... SET current_stock = current_stock + n
+RETURNING current_stock`` followed by its StockHistory insert, both in one
+transaction, so concurrent sales can't lose each other's changes. Batches
+(the POS sync path) fold their adjustments per product, apply them with a
+CASE-based UPDATE and write the history rows with one ``bulk_create``.
+Both report threshold crossings to the low-stock feed (see low_stock.py).
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .low_stock import record_crossings
+from .models import Product, StockHistory
+
+
+DEFAULT_CHANGE_TYPE = 'manual_update'
+UPDATE_BATCH_SIZE = 1000
+MAX_ADJUSTMENTS = getattr(settings, 'INVENTORY_BULK_MAX_ADJUSTMENTS', 10000)
+
+
+class StockAdjustmentError(ValueError):
+    """An adjustment payload that can't be applied; the message is safe to return to the client."""
+
+
+def _change_type(value):
+    if value in (None, ''):
+        return DEFAULT_CHANGE_TYPE
+    if not isinstance(value, str) or len(value) > StockHistory._meta.get_field('change_type').max_length:
+        raise StockAdjustmentError('change_type must be a string of at most 50 characters')
+    return value
+
+
+def _int(value, name):
+    if isinstance(value, bool):
+        raise StockAdjustmentError(f'{name} must be an integer')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise StockAdjustmentError(f'{name} must be an integer')
+
+
+def parse_adjustment(data):
+    """``(quantity, change_type)`` from a single-product request body."""
+    if not isinstance(data, dict):
+        raise StockAdjustmentError('request body must be an object')
+    return _int(data.get('quantity', 0), 'quantity'), _change_type(data.get('change_type'))
+
+
+def parse_adjustments(items):
+    """``[(product_id, quantity, change_type), ...]`` from a bulk request body."""
+    if not isinstance(items, list) or not items:
+        raise StockAdjustmentError('adjustments must be a non-empty list')
+    if len(items) > MAX_ADJUSTMENTS:
+        raise StockAdjustmentError(f'at most {MAX_ADJUSTMENTS} adjustments per request')
+    parsed = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise StockAdjustmentError(f'adjustments[{i}] must be an object')
+        try:
+            parsed.append((
+                _int(item.get('product'), 'product'),
+                _int(item.get('quantity'), 'quantity'),
+                _change_type(item.get('change_type')),
+            ))
+        except StockAdjustmentError as e:
+            raise StockAdjustmentError(f'adjustments[{i}]: {e}')
+    return parsed
+
+
+def adjust_stock(product_id, quantity, change_type=DEFAULT_CHANGE_TYPE):
+    """Add ``quantity`` (negative to remove) to a product's stock; returns the new level.
+
+    Raises Product.DoesNotExist if there is no such product.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {connection.ops.quote_name(Product._meta.db_table)} SET current_stock = current_stock + %s '
+                f'WHERE id = %s RETURNING current_stock, reorder_threshold',
+                [quantity, product_id],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            raise Product.DoesNotExist(f'Product {product_id} does not exist')
+        stock, threshold = row
+        StockHistory.objects.create(product_id=product_id, change_type=change_type, quantity=quantity)
+        record_crossings([(product_id, stock - quantity <= threshold, stock, threshold)])
+    return stock
+
+
+def apply_adjustments(adjustments):
+    """Apply many ``(product_id, quantity, change_type)`` adjustments in one transaction.
+
+    Returns ``{product_id: new current_stock}``. Every adjustment gets its
+    own StockHistory row. If any product doesn't exist nothing is applied
+    and StockAdjustmentError names the missing ids.
+    """
+    deltas = {}
+    for product_id, quantity, _ in adjustments:
+        deltas[product_id] = deltas.get(product_id, 0) + quantity
+    product_ids = sorted(deltas)
+
+    with transaction.atomic():
+        # ascending id order keeps concurrent batches from locking rows in opposite orders
+        for start in range(0, len(product_ids), UPDATE_BATCH_SIZE):
+            chunk = [pid for pid in product_ids[start:start + UPDATE_BATCH_SIZE] if deltas[pid]]
+            if not chunk:
+                continue
+            Product.objects.filter(pk__in=chunk).update(current_stock=F('current_stock') + Case(
+                *[When(pk=pid, then=Value(deltas[pid])) for pid in chunk],
+                default=Value(0),
+                output_field=IntegerField(),
+            ))
+        rows = Product.objects.filter(pk__in=product_ids).values_list('pk', 'current_stock', 'reorder_threshold')
+        levels, thresholds = {}, {}
+        for pid, stock, threshold in rows:
+            levels[pid], thresholds[pid] = stock, threshold
+        missing = [pid for pid in product_ids if pid not in levels]
+        if missing:
+            raise StockAdjustmentError(f'unknown products: {missing[:20]}')
+        record_crossings(
+            (pid, levels[pid] - deltas[pid] <= thresholds[pid], levels[pid], thresholds[pid])
+            for pid in product_ids
+        )
+        StockHistory.objects.bulk_create(
+            [StockHistory(product_id=pid, change_type=change_type, quantity=quantity)
+             for pid, quantity, change_type in adjustments],
+            batch_size=UPDATE_BATCH_SIZE,
+        )
+    return levels
@@ -1,3 +1,444 @@
-from django.test import TestCase
+import json
+import threading
+from datetime import datetime, time, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import UserRole
+from users.page_rules import get_rule_set
+
+from .models import Category, PriceHistory, Product, StockAlert, StockDailySummary, StockHistory, StockSnapshot
+from .history import compact_history, stock_at, take_snapshot
+from .low_stock import invalidate_low_stock_feed
+from .stock import adjust_stock
+
+
+def employee_client():
+    """An APIClient signed in as an employee; the role is already loaded, so checks cost no queries."""
+    user = User.objects.create_user('clerk', password='pw')
+    UserRole.objects.create(user=user, role='employee')
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+class InventoryPermissionTest(TestCase):
+    def test_writes_and_internal_views_need_an_employee(self):
+        product = Product.objects.create(name='Widget', sku='W-1', price='2.50')
+        anonymous = APIClient()
+        self.assertEqual(anonymous.post('/api/inventory/products/add/', {'name': 'X', 'sku': 'X-1', 'price': '1.00'},
+                                        format='json').status_code, 401)
+        for url in (f'/api/inventory/products/{product.pk}/history/', '/api/inventory/products/low-stock/',
+                    f'/api/inventory/products/{product.pk}/stock-at/'):
+            self.assertEqual(anonymous.get(url).status_code, 401, url)
+        customer = User.objects.create_user('shopper', password='pw')
+        UserRole.objects.create(user=customer, role='user')
+        anonymous.force_authenticate(customer)
+        self.assertEqual(anonymous.get('/api/inventory/products/low-stock/').status_code, 403)
+        # the catalog itself stays public
+        self.assertEqual(APIClient().get(f'/api/inventory/products/{product.pk}/').status_code, 200)
+        self.assertFalse(Product.objects.filter(sku='X-1').exists())
+
+
+class StockUpdateTest(TestCase):
+    def setUp(self):
+        get_rule_set()  # page-permission middleware rules, so the counts below are ours
+        self.client = employee_client()
+        self.product = Product.objects.create(name='Widget', sku='W-1', price='2.50', current_stock=10)
+        self.other = Product.objects.create(name='Gadget', sku='G-1', price='4.00', current_stock=3)
+
+    def test_single_adjustment_is_one_update_and_one_insert(self):
+        url = f'/api/inventory/products/{self.product.pk}/stock/'
+        with self.assertNumQueries(4):  # savepoint, UPDATE ... RETURNING, INSERT, release
+            response = self.client.post(url, {'quantity': -4, 'change_type': 'sale'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['current_stock'], 6)
+        history = StockHistory.objects.get(product=self.product)
+        self.assertEqual((history.change_type, history.quantity), ('sale', -4))
+
+    def test_single_adjustment_errors(self):
+        url = f'/api/inventory/products/{self.product.pk}/stock/'
+        self.assertEqual(self.client.post(url, {'quantity': 'lots'}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, [1], format='json').status_code, 400)
+        missing = self.client.post('/api/inventory/products/999999/stock/', {'quantity': 1}, format='json')
+        self.assertEqual(missing.status_code, 404)
+        self.assertFalse(StockHistory.objects.exists())
+
+    def test_bulk_adjustments(self):
+        adjustments = [{'product': self.product.pk, 'quantity': -1, 'change_type': 'sale'} for _ in range(5)]
+        adjustments += [
+            {'product': self.other.pk, 'quantity': 20, 'change_type': 'purchase'},
+            {'product': self.other.pk, 'quantity': -2},
+        ]
+        # savepoint, CASE UPDATE, SELECT levels, low-stock alerts, history INSERT, release
+        with self.assertNumQueries(6):
+            response = self.client.post('/api/inventory/products/stock/bulk/', {'adjustments': adjustments}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'applied': 7,
+            'current_stock': {str(self.product.pk): 5, str(self.other.pk): 21},
+        })
+        self.assertEqual(StockHistory.objects.count(), 7)
+        self.assertEqual(StockHistory.objects.filter(change_type='manual_update').count(), 1)
+
+    def test_bulk_with_unknown_product_applies_nothing(self):
+        adjustments = [
+            {'product': self.product.pk, 'quantity': 5},
+            {'product': 999999, 'quantity': 1},
+        ]
+        response = self.client.post('/api/inventory/products/stock/bulk/', {'adjustments': adjustments}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('999999', response.json()['error'])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_stock, 10)
+        self.assertFalse(StockHistory.objects.exists())
+
+    def test_bulk_rejects_malformed_payloads(self):
+        url = '/api/inventory/products/stock/bulk/'
+        for payload in ({}, [1], {'adjustments': []}, {'adjustments': [{'product': self.product.pk, 'quantity': 'x'}]}):
+            self.assertEqual(self.client.post(url, payload, format='json').status_code, 400)
+
+    def test_anonymous_adjustments_are_refused(self):
+        anonymous = APIClient()
+        url = f'/api/inventory/products/{self.product.pk}/stock/'
+        self.assertEqual(anonymous.post(url, {'quantity': -10}, format='json').status_code, 401)
+        bulk = {'adjustments': [{'product': self.product.pk, 'quantity': -10}]}
+        self.assertEqual(anonymous.post('/api/inventory/products/stock/bulk/', bulk, format='json').status_code, 401)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_stock, 10)
+
+
+class ConcurrentStockUpdateTest(TransactionTestCase):
+    available_apps = ['productManagement']
+
+    def test_concurrent_adjustments_are_not_lost(self):
+        product = Product.objects.create(name='Widget', sku='W-1', price='2.50', current_stock=100)
+
+        def sell():
+            try:
+                for _ in range(10):
+                    adjust_stock(product.pk, -1, 'sale')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=sell) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        product.refresh_from_db()
+        self.assertEqual(product.current_stock, 60)
+        self.assertEqual(StockHistory.objects.filter(product=product).count(), 40)
+
+
+class ProductImportTest(TestCase):
+    url = '/api/inventory/products/import/'
+
+    def setUp(self):
+        get_rule_set()
+        self.client = employee_client()
+        self.tools = Category.objects.create(name='Tools')
+        Product.objects.create(name='Hammer', sku='H-1', price='10.00', current_stock=7, category=self.tools)
+        Product.objects.create(name='Saw', sku='S-1', price='20.00', current_stock=2)
+
+    def _import(self, body, content_type, chunk_size=2):
+        response = self.client.generic('POST', f'{self.url}?chunk_size={chunk_size}', body, content_type=content_type)
+        self.assertEqual(response.status_code, 200)
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        return lines[:-1], lines[-1]['summary']
+
+    def test_csv_upsert_with_price_history(self):
+        body = (
+            'sku,name,price,category,current_stock\n'
+            'H-1,Claw hammer,12.50,Tools,99\n'
+            'S-1,Saw,20.00,,\n'
+            'D-1,Drill,45.00,Power tools,5\n'
+        )
+        reports, summary = self._import(body, 'text/csv')
+        self.assertEqual(len(reports), 2)
+        self.assertEqual(
+            {k: summary[k] for k in ('rows', 'created', 'updated', 'price_changes', 'errors')},
+            {'rows': 3, 'created': 1, 'updated': 2, 'price_changes': 1, 'errors': 0},
+        )
+        hammer = Product.objects.get(sku='H-1')
+        self.assertEqual((hammer.name, hammer.price, hammer.current_stock), ('Claw hammer', Decimal('12.50'), 7))
+        change = PriceHistory.objects.get()
+        self.assertEqual((change.product, change.old_price, change.new_price), (hammer, Decimal('10.00'), Decimal('12.50')))
+        drill = Product.objects.get(sku='D-1')
+        self.assertEqual((drill.category.name, drill.current_stock), ('Power tools', 5))
+        self.assertEqual(Category.objects.filter(name='Power tools').count(), 1)
+
+    def test_bad_rows_are_reported_without_aborting(self):
+        body = '\n'.join([
+            json.dumps({'sku': 'N-1', 'name': 'Nail', 'price': '0.10'}),
+            json.dumps({'sku': 'N-2', 'name': 'Bad', 'price': 'free'}),
+            '{not json',
+            json.dumps({'name': 'No SKU', 'price': '1.00'}),
+            json.dumps({'sku': 'N-3', 'name': 'Screw', 'price': 0.2, 'category': 'Tools'}),
+        ])
+        reports, summary = self._import(body, 'application/x-ndjson')
+        self.assertEqual(summary['errors'], 3)
+        errors = [e for r in reports for e in r['errors']]
+        self.assertEqual([e['line'] for e in errors], [2, 3, 4])
+        self.assertIn('price', errors[0]['errors'])
+        self.assertIn('sku', errors[2]['errors'])
+        self.assertEqual(set(Product.objects.filter(sku__startswith='N-').values_list('sku', flat=True)), {'N-1', 'N-3'})
+        self.assertEqual(Product.objects.get(sku='N-3').category, self.tools)
+
+    def test_lines_that_are_not_utf8_are_reported(self):
+        body = b'sku,name,price\nL-1,Lamp,1.00\nL-2,Caf\xe9,2.00\nL-3,Rug,3.00\n'
+        reports, summary = self._import(body, 'text/csv')
+        errors = [e for r in reports for e in r['errors']]
+        self.assertEqual([e['line'] for e in errors], [3])
+        self.assertEqual(summary['errors'], 1)
+        self.assertEqual(set(Product.objects.filter(sku__startswith='L-').values_list('sku', flat=True)), {'L-1', 'L-3'})
+        body = b'{"sku": "M-1", "name": "Caf\xe9", "price": "1.00"}\n{"sku": "M-2", "name": "Mug", "price": "2.00"}\n'
+        reports, summary = self._import(body, 'application/x-ndjson')
+        self.assertEqual([e['line'] for r in reports for e in r['errors']], [1])
+        self.assertTrue(Product.objects.filter(sku='M-2').exists())
+
+    def test_anonymous_imports_are_refused(self):
+        body = 'sku,name,price\nH-1,Hijacked,0.01\n'
+        response = APIClient().generic('POST', self.url, body, content_type='text/csv')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(Product.objects.get(sku='H-1').name, 'Hammer')
+
+    def test_chunk_is_a_fixed_number_of_queries(self):
+        rows = ''.join(f'X-{i},Item {i},{i}.00,Tools\n' for i in range(50))
+        body = 'sku,name,price,category\n' + rows
+        # category map; per chunk: savepoint, lock, upsert, alerts for the new (empty) SKUs, release
+        with self.assertNumQueries(1 + 5 * 2):
+            self._import(body, 'text/csv', chunk_size=25)
+        self.assertEqual(Product.objects.filter(sku__startswith='X-').count(), 50)
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.generic('POST', self.url, 'sku\n', content_type='text/plain')
+        self.assertEqual(response.status_code, 415)
+
+
+class PriceHistoryTest(TestCase):
+    url = '/api/inventory/products/prices/'
+
+    def setUp(self):
+        get_rule_set()
+        self.client = employee_client()
+        self.now = timezone.now()
+        self.product = Product.objects.create(name='Lamp', sku='L-1', price='10.00')
+        Product.objects.filter(pk=self.product.pk).update(created_at=self.now - timedelta(days=30))
+        self.product.refresh_from_db()
+
+    def _reprice(self, price, days_ago):
+        self.product.price = price
+        self.product.save()
+        PriceHistory.objects.filter(pk=PriceHistory.objects.latest('pk').pk).update(
+            changed_at=self.now - timedelta(days=days_ago)
+        )
+
+    def test_saves_record_only_real_changes(self):
+        self.product.price = '12.00'
+        self.product.save()
+        self.product.name = 'Desk lamp'
+        self.product.save()
+        self.product.price = '12.0'
+        self.product.save()
+        self.product.save(update_fields=['name'])
+        change = PriceHistory.objects.get()
+        self.assertEqual((change.old_price, change.new_price), (Decimal('10.00'), Decimal('12.00')))
+
+    def test_a_save_reads_previous_values_once(self):
+        self.product.price = '11.00'
+        self.product.current_stock = 1
+        # one read of the previous price, stock and threshold; UPDATE; price history
+        with self.assertNumQueries(3):
+            self.product.save()
+        with self.assertNumQueries(1):
+            self.product.save(update_fields=['name'])
+
+    def test_price_at_timestamps(self):
+        self._reprice('12.00', days_ago=20)
+        self._reprice('15.00', days_ago=10)
+        Product.objects.create(name='New', sku='N-1', price='1.00')
+
+        def at(days_ago):
+            return (self.now - timedelta(days=days_ago)).isoformat()
+
+        lines = [
+            {'sku': 'L-1', 'at': at(25)},   # before any change: the first old price
+            {'sku': 'L-1', 'at': at(20)},   # exactly at a change
+            {'sku': 'L-1', 'at': at(15)},
+            {'sku': 'L-1', 'at': at(1)},
+            {'sku': 'L-1', 'at': at(40)},   # before the product existed
+            {'sku': 'N-1', 'at': timezone.now().isoformat()},  # no history: current price
+            {'sku': 'missing', 'at': at(1)},
+        ]
+        with self.assertNumQueries(1):
+            response = self.client.post(self.url, {'lines': lines}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [p['price'] for p in response.json()['prices']],
+            ['10.00', '12.00', '12.00', '15.00', None, '1.00', None],
+        )
+
+    def test_single_timestamp_for_many_skus(self):
+        self._reprice('12.00', days_ago=5)
+        response = self.client.post(
+            self.url, {'at': (self.now - timedelta(days=7)).isoformat(), 'skus': ['L-1', 'L-1']}, format='json'
+        )
+        self.assertEqual([p['price'] for p in response.json()['prices']], ['10.00', '10.00'])
+
+    def test_bad_lookups(self):
+        for payload in ({}, [1], {'skus': ['L-1'], 'at': 'yesterday'}, {'lines': [{'sku': '', 'at': '2024-01-01'}]},
+                        {'skus': ['L-1'], 'at': '2024-02-30'}, {'lines': [{'sku': 'L-1', 'at': '2024-01-01T25:00'}]}):
+            self.assertEqual(self.client.post(self.url, payload, format='json').status_code, 400)
+        anonymous = APIClient().post(self.url, {'skus': ['L-1'], 'at': '2024-01-01'}, format='json')
+        self.assertEqual(anonymous.status_code, 401)
+
+
+class LowStockFeedTest(TestCase):
+    url = '/api/inventory/products/low-stock/'
+
+    def setUp(self):
+        get_rule_set()
+        self.client = employee_client()
+        self.bolt = Product.objects.create(name='Bolt', sku='B-1', price='0.10', current_stock=50, reorder_threshold=20)
+        self.nut = Product.objects.create(name='Nut', sku='N-1', price='0.05', current_stock=2)
+        invalidate_low_stock_feed()
+
+    def _feed(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return [p['sku'] for p in response.json()]
+
+    def test_feed_uses_per_product_thresholds_and_is_cached(self):
+        self.assertEqual(self._feed(), ['N-1'])
+        with self.assertNumQueries(1):  # the rows; which ones is cached
+            self.assertEqual(self._feed(), ['N-1'])
+        # the legacy ?threshold= filter still works
+        self.assertEqual(len(self.client.get(self.url, {'threshold': 100}).json()), 2)
+
+    def test_crossing_the_threshold_updates_the_feed(self):
+        self._feed()
+        with self.captureOnCommitCallbacks(execute=True):
+            adjust_stock(self.bolt.pk, -30, 'sale')
+        self.assertEqual(self._feed(), ['N-1', 'B-1'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/inventory/products/stock/bulk/', {'adjustments': [
+                {'product': self.nut.pk, 'quantity': 10},
+                {'product': self.bolt.pk, 'quantity': -1},
+            ]}, format='json')
+        self.assertEqual(self._feed(), ['B-1'])
+        self.assertEqual(
+            list(StockAlert.objects.order_by('id').values_list('product__sku', 'kind', 'current_stock')),
+            [('N-1', 'low', 2), ('B-1', 'low', 20), ('N-1', 'restocked', 12)],
+        )
+
+    def test_feed_rows_are_never_stale(self):
+        self._feed()
+        with self.captureOnCommitCallbacks(execute=True):
+            adjust_stock(self.nut.pk, -1, 'sale')
+            Product.objects.filter(pk=self.nut.pk).update(name='Hex nut')
+        self.assertEqual(self.client.get(self.url).json()[0]['current_stock'], 1)
+        self.assertEqual(self.client.get(self.url).json()[0]['name'], 'Hex nut')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.nut.delete()
+        self.assertEqual(self._feed(), [])
+
+    def test_moves_that_stay_on_one_side_do_not_alert(self):
+        adjust_stock(self.bolt.pk, -10, 'sale')
+        adjust_stock(self.nut.pk, 1, 'return')
+        self.assertEqual(StockAlert.objects.count(), 1)  # the nut starting out low
+
+    def test_threshold_changes_alert(self):
+        self.bolt.reorder_threshold = 60
+        self.bolt.save()
+        self.assertEqual(StockAlert.objects.filter(product=self.bolt).get().kind, 'low')
+
+    def test_event_stream(self):
+        first = StockAlert.objects.get().pk
+        adjust_stock(self.bolt.pk, -40, 'sale')
+        response = self.client.get(f'{self.url}events/', {'wait': 0}, HTTP_LAST_EVENT_ID=str(first))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertNotIn('"N-1"', body)
+        self.assertIn('event: low\n', body)
+        self.assertIn('"sku": "B-1"', body)
+        self.assertIn(f'id: {first + 1}\n', body)
+
+
+class StockHistoryRetentionTest(TestCase):
+    def setUp(self):
+        get_rule_set()
+        self.client = employee_client()
+        self.today = timezone.localdate()
+        self.product = Product.objects.create(name='Crate', sku='C-1', price='9.00', current_stock=0)
+        Product.objects.filter(pk=self.product.pk).update(created_at=self._at(200))
+        self.product.refresh_from_db()
+        for days_ago, hour, quantity, change_type in [
+            (150, 9, 100, 'restock'), (120, 12, -30, 'sale'), (120, 15, -10, 'sale'), (10, 9, 5, 'return'),
+        ]:
+            adjust_stock(self.product.pk, quantity, change_type)
+            StockHistory.objects.filter(pk=StockHistory.objects.latest('pk').pk).update(
+                timestamp=self._at(days_ago, hour))
+        self.product.refresh_from_db()
+
+    def _at(self, days_ago, hour=0):
+        return timezone.make_aware(datetime.combine(self.today - timedelta(days=days_ago), time(hour)))
+
+    def test_compaction_keeps_levels_answerable(self):
+        before = {days_ago: stock_at(self.product, self._at(days_ago, 13)) for days_ago in (150, 120, 100, 5)}
+        self.assertEqual(before[120], (70, 'exact'))
+
+        self.assertEqual(compact_history(retention_days=90, batch_size=2, today=self.today), 3)
+        self.assertEqual(StockHistory.objects.count(), 1)
+        self.assertEqual(
+            list(StockDailySummary.objects.order_by('day').values_list('change_type', 'quantity', 'entries')),
+            [('restock', 100, 1), ('sale', -40, 2)],
+        )
+        self.assertEqual(StockSnapshot.objects.get().level, 60)
+        # compacted days answer with the level at the start of the day
+        self.assertEqual(stock_at(self.product, self._at(150, 13)), (0, 'day'))
+        self.assertEqual(stock_at(self.product, self._at(120, 13)), (100, 'day'))
+        self.assertEqual(stock_at(self.product, self._at(100, 13)), before[100])
+        self.assertEqual(stock_at(self.product, self._at(5, 13)), (65, 'exact'))
+        self.assertIsNone(stock_at(self.product, self._at(300)))
+
+        # a second run has nothing left to move and doesn't duplicate the snapshot
+        self.assertEqual(compact_history(retention_days=90, today=self.today), 0)
+        self.assertEqual(StockSnapshot.objects.count(), 1)
+
+    def test_snapshot_is_the_level_at_the_start_of_the_day(self):
+        self.assertEqual(take_snapshot(self.today - timedelta(days=120)), 1)
+        self.assertEqual(StockSnapshot.objects.get().level, 100)
+        self.assertEqual(take_snapshot(self.today - timedelta(days=120)), 0)
+        self.assertEqual(take_snapshot(self.today - timedelta(days=250)), 0)  # before the product existed
+        self.assertEqual(stock_at(self.product, self._at(120, 13)), (70, 'exact'))
+
+    def test_history_endpoints(self):
+        base = f'/api/inventory/products/{self.product.pk}'
+        self.assertEqual(self.client.get('/api/inventory/products/999999/history/').status_code, 404)
+        window = self.client.get(f'{base}/history/', {'start': str(self.today - timedelta(days=130)),
+                                                      'end': str(self.today - timedelta(days=20))})
+        self.assertEqual([row['quantity'] for row in window.json()['results']], [-10, -30])
+        self.assertEqual(self.client.get(f'{base}/history/', {'start': 'soon'}).status_code, 400)
+
+        compact_history(retention_days=90, today=self.today)
+        daily = self.client.get(f'{base}/history/daily/').json()['results']
+        self.assertEqual([row['change_type'] for row in daily], ['sale', 'restock'])
+        response = self.client.get(f'{base}/stock-at/', {'at': self._at(120, 13).isoformat()})
+        self.assertEqual(response.json()['stock'], 100)
+        self.assertEqual(response.json()['resolution'], 'day')
+        self.assertEqual(self.client.get(f'{base}/stock-at/').status_code, 400)
+
+    def test_impossible_dates_are_rejected(self):
+        base = f'/api/inventory/products/{self.product.pk}'
+        for url, params in [(f'{base}/stock-at/', {'at': '2024-02-30'}),
+                            (f'{base}/history/', {'start': '2024-01-01T25:00:00'}),
+                            (f'{base}/history/daily/', {'end': '2024-13-01'})]:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('not a valid date', response.json()['error'])
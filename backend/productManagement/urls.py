@@ -1,11 +1,17 @@
 from django.urls import path
-from .views import ProductListAPI, ProductDetailAPI, AddProductAPI, UpdateStockAPI, StockHistoryAPI, LowStockAPI
+from .views import ProductListAPI, ProductDetailAPI, AddProductAPI, UpdateStockAPI, BulkUpdateStockAPI, ImportProductsAPI, PricesAtAPI, StockHistoryAPI, DailyStockHistoryAPI, StockAtAPI, LowStockAPI, LowStockEventsAPI
 
 urlpatterns = [
     path('products/', ProductListAPI.as_view()),
     path('products/<int:pk>/', ProductDetailAPI.as_view()),
     path('products/add/', AddProductAPI.as_view()),
+    path('products/import/', ImportProductsAPI.as_view()),
     path('products/<int:pk>/stock/', UpdateStockAPI.as_view()),
+    path('products/stock/bulk/', BulkUpdateStockAPI.as_view()),
     path('products/<int:pk>/history/', StockHistoryAPI.as_view()),
+    path('products/<int:pk>/history/daily/', DailyStockHistoryAPI.as_view()),
+    path('products/<int:pk>/stock-at/', StockAtAPI.as_view()),
     path('products/low-stock/', LowStockAPI.as_view()),
+    path('products/low-stock/events/', LowStockEventsAPI.as_view()),
+    path('products/prices/', PricesAtAPI.as_view()),
 ]
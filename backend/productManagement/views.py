@@ -1,16 +1,30 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
+from django.utils import timezone
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Product, StockHistory
-from .serializers import ProductSerializer, StockHistorySerializer
+from .models import Product, StockDailySummary, StockHistory
+from .serializers import ProductSerializer, StockDailySummarySerializer, StockHistorySerializer
+from .history import HistoryParamError, parse_moment, stock_at
+from .importer import CHUNK_SIZE, detect_format, import_products, read_rows, track
+from .low_stock import STREAM_MAX_SECONDS, alert_stream, latest_alert_id, low_stock_feed
+from .prices import PriceLookupError, parse_lookup, prices_at
+from .stock import StockAdjustmentError, adjust_stock, apply_adjustments, parse_adjustment, parse_adjustments
+from ecombackend.pagination import DayPagination, KeysetPagination, TimestampPagination
+from users.permissions import IsEmployee
 
 # List all products
 class ProductListAPI(APIView):
     def get(self, request):
-        products = Product.objects.all()
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data)
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(Product.objects.all(), request, view=self)
+        serializer = ProductSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 # Get product detail
 class ProductDetailAPI(APIView):
@@ -21,6 +35,8 @@ class ProductDetailAPI(APIView):
 
 # Add product
 class AddProductAPI(APIView):
+    permission_classes = [IsAuthenticated, IsEmployee]
+
     def post(self, request):
         serializer = ProductSerializer(data=request.data)
         if serializer.is_valid():
@@ -30,33 +46,168 @@ class AddProductAPI(APIView):
 
 # Update stock
 class UpdateStockAPI(APIView):
+    permission_classes = [IsAuthenticated, IsEmployee]
+
     def post(self, request, pk):
-        product = Product.objects.get(id=pk)
-        qty = int(request.data.get("quantity", 0))
-        change_type = request.data.get("change_type", "manual_update")
-        
-        product.current_stock += qty
-        product.save()
-
-        StockHistory.objects.create(
-            product=product,
-            change_type=change_type,
-            quantity=qty
-        )
-        return Response({"message": "Stock updated successfully"})
-
-# Get stock history
+        try:
+            qty, change_type = parse_adjustment(request.data)
+            current = adjust_stock(pk, qty, change_type)
+        except StockAdjustmentError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Product.DoesNotExist:
+            return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"message": "Stock updated successfully", "current_stock": current})
+
+# Apply many stock adjustments at once (POS sync)
+class BulkUpdateStockAPI(APIView):
+    permission_classes = [IsAuthenticated, IsEmployee]
+
+    def post(self, request):
+        if not isinstance(request.data, dict):
+            return Response({"error": "request body must be an object"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            adjustments = parse_adjustments(request.data.get("adjustments"))
+            levels = apply_adjustments(adjustments)
+        except StockAdjustmentError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "applied": len(adjustments),
+            "current_stock": {str(pid): stock for pid, stock in levels.items()},
+        })
+
+# Bulk catalog import (CSV or NDJSON), streamed back as one NDJSON report per chunk
+class ImportProductsAPI(APIView):
+    permission_classes = [IsAuthenticated, IsEmployee]
+
+    def post(self, request):
+        upload = None
+        if request.content_type.startswith('multipart/form-data'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({"error": "file is required"}, status=status.HTTP_400_BAD_REQUEST)
+            fmt = detect_format(upload.content_type, upload.name)
+        else:
+            fmt = detect_format(request.content_type)
+        if fmt is None:
+            return Response(
+                {"error": "send text/csv or application/x-ndjson (or a .csv/.ndjson file)"},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+        try:
+            chunk_size = int(request.query_params.get("chunk_size", CHUNK_SIZE))
+        except ValueError:
+            return Response({"error": "chunk_size must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        chunk_size = max(1, min(chunk_size, 10 * CHUNK_SIZE))
+        lines = upload if upload is not None else (request.stream or [])
+
+        def stream():
+            totals = {}
+            for report in track(import_products(read_rows(lines, fmt), chunk_size), totals):
+                yield json.dumps(report, cls=DjangoJSONEncoder) + "\n"
+            yield json.dumps({"summary": totals}) + "\n"
+
+        return StreamingHttpResponse(stream(), content_type="application/x-ndjson")
+
+# Prices in effect at given timestamps, for many SKUs at once
+class PricesAtAPI(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            lines = parse_lookup(request.data)
+        except PriceLookupError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"prices": [
+            {"sku": sku, "at": at, "price": None if price is None else str(price)}
+            for sku, at, price in prices_at(lines)
+        ]})
+
+# Get stock history (?start= / ?end= bound the window)
 class StockHistoryAPI(APIView):
+    permission_classes = [IsAuthenticated, IsEmployee]
+
     def get(self, request, pk):
-        product = Product.objects.get(id=pk)
-        history = product.stock_history.all()
-        serializer = StockHistorySerializer(history, many=True)
-        return Response(serializer.data)
+        if not Product.objects.filter(pk=pk).exists():
+            return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+        history = StockHistory.objects.filter(product_id=pk)
+        try:
+            if request.GET.get("start"):
+                history = history.filter(timestamp__gte=parse_moment(request.GET["start"], "start"))
+            if request.GET.get("end"):
+                history = history.filter(timestamp__lt=parse_moment(request.GET["end"], "end"))
+        except HistoryParamError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        paginator = TimestampPagination()
+        page = paginator.paginate_queryset(history, request, view=self)
+        serializer = StockHistorySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+# Daily summaries of compacted stock history
+class DailyStockHistoryAPI(APIView):
+    permission_classes = [IsAuthenticated, IsEmployee]
+
+    def get(self, request, pk):
+        if not Product.objects.filter(pk=pk).exists():
+            return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+        summaries = StockDailySummary.objects.filter(product_id=pk)
+        try:
+            if request.GET.get("start"):
+                summaries = summaries.filter(day__gte=timezone.localdate(parse_moment(request.GET["start"], "start")))
+            if request.GET.get("end"):
+                summaries = summaries.filter(day__lt=timezone.localdate(parse_moment(request.GET["end"], "end")))
+        except HistoryParamError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        paginator = DayPagination()
+        page = paginator.paginate_queryset(summaries, request, view=self)
+        serializer = StockDailySummarySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+# Stock level at a point in time
+class StockAtAPI(APIView):
+    permission_classes = [IsAuthenticated, IsEmployee]
+
+    def get(self, request, pk):
+        product = Product.objects.filter(pk=pk).first()
+        if product is None:
+            return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            at = parse_moment(request.GET.get("at", ""), "at")
+        except HistoryParamError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        result = stock_at(product, at)
+        level, resolution = result if result is not None else (None, "exact")
+        return Response({"product": product.pk, "at": at, "stock": level, "resolution": resolution})
 
 # Low stock alert
 class LowStockAPI(APIView):
+    permission_classes = [IsAuthenticated, IsEmployee]
+
     def get(self, request):
-        threshold = int(request.GET.get("threshold", 5))
+        threshold = request.GET.get("threshold")
+        if threshold is None:
+            # each product's own reorder threshold; cached until a product crosses it
+            return Response(low_stock_feed())
+        try:
+            threshold = int(threshold)
+        except ValueError:
+            return Response({"error": "threshold must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
         low_stock_products = Product.objects.filter(current_stock__lte=threshold)
         serializer = ProductSerializer(low_stock_products, many=True)
         return Response(serializer.data)
+
+# Low stock alerts as server-sent events
+class LowStockEventsAPI(APIView):
+    permission_classes = [IsAuthenticated, IsEmployee]
+
+    def get(self, request):
+        last_id = request.headers.get("Last-Event-ID") or request.GET.get("after")
+        try:
+            last_id = int(last_id) if last_id else latest_alert_id()
+            wait = int(request.GET.get("wait", STREAM_MAX_SECONDS))
+        except ValueError:
+            return Response({"error": "Last-Event-ID/after and wait must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        wait = max(0, min(wait, STREAM_MAX_SECONDS))
+        response = StreamingHttpResponse(alert_stream(last_id, wait), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
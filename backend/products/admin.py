@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ProductForm, Sales, Dashboard
+from .models import ProductForm, Sales, Dashboard, ProductSalesStats
 
 
 @admin.register(ProductForm)
@@ -38,3 +38,9 @@ class DashboardAdmin(admin.ModelAdmin):
     list_filter = ['created_at', 'user']
     search_fields = ['product_name', 'user__username']
     readonly_fields = ['dashboard_id', 'created_at', 'updated_at']
+
+
+@admin.register(ProductSalesStats)
+class ProductSalesStatsAdmin(admin.ModelAdmin):
+    list_display = ['product', 'sales_count', 'total_amount', 'total_quantity', 'last_sale_date']
+    readonly_fields = ['product', 'sales_count', 'total_amount', 'total_quantity', 'last_sale_date']
@@ -0,0 +1,168 @@
+"""
+Shared sales analytics used by the Sales and ProductForm viewsets.
+
+Everything is computed from one grouped query over Sales (GROUP BY product,
+plus the time bucket when one is requested); overall totals, the per-product
+breakdown and the timeline are folded from those rows in Python instead of
+issuing separate aggregate()/count() scans.
+"""
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+BUCKETS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+class AnalyticsParamError(ValueError):
+    pass
+
+
+def _parse_bound(value, name, end=False):
+    if not value:
+        return None
+    try:
+        # well formed but impossible (2024-02-30, 25:00) raises rather than returning None
+        dt = parse_datetime(value)
+        d = parse_date(value) if dt is None else None
+    except ValueError:
+        raise AnalyticsParamError(f"{name} is not a valid date or time")
+    if dt is None:
+        if d is None:
+            raise AnalyticsParamError(f"{name} must be an ISO date or datetime")
+        if end and d == date.max:
+            return None  # the whole last representable day: no upper bound
+        dt = datetime.combine(d, time.min)
+        if end:
+            # a bare end date includes the whole day
+            dt += timedelta(days=1)
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt
+
+
+def parse_analytics_params(query_params):
+    """Validate ?bucket=, ?start=, ?end= and ?top= into keyword arguments."""
+    bucket = query_params.get('bucket') or None
+    if bucket is not None and bucket not in BUCKETS:
+        raise AnalyticsParamError(f"bucket must be one of: {', '.join(BUCKETS)}")
+    top = query_params.get('top')
+    if top:
+        try:
+            top = int(top)
+        except ValueError:
+            raise AnalyticsParamError('top must be an integer')
+        if top < 1:
+            raise AnalyticsParamError('top must be positive')
+    else:
+        top = None
+    return {
+        'bucket': bucket,
+        'start': _parse_bound(query_params.get('start'), 'start'),
+        'end': _parse_bound(query_params.get('end'), 'end', end=True),
+        'top': top,
+    }
+
+
+def _period(value):
+    """Bucket keys come back as datetimes from Sales and dates from the rollup."""
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.date()
+    return value
+
+
+def grouped_sales_rows(queryset, bucket=None):
+    """GROUP BY product (and bucket) over a Sales queryset."""
+    group_by = ['product_id', 'product__product_name']
+    if bucket:
+        queryset = queryset.annotate(bucket=BUCKETS[bucket]('sale_date'))
+        group_by.append('bucket')
+    return queryset.order_by().values(*group_by).annotate(
+        revenue=Sum('sales_amount'),
+        quantity=Sum('quantity'),
+        count=Count('sales_id'),
+    )
+
+
+def fold_rows(row_sources, bucket=None, top=None):
+    """Fold grouped rows (from one or more sources) into the analytics payload."""
+    total_revenue = Decimal('0')
+    total_quantity = 0
+    total_count = 0
+    by_product = {}
+    timeline = {}
+    for rows in row_sources:
+        for row in rows:
+            revenue = row['revenue'] or Decimal('0')
+            quantity = row['quantity'] or 0
+            count = row['count']
+            total_revenue += revenue
+            total_quantity += quantity
+            total_count += count
+
+            product = by_product.get(row['product_id'])
+            if product is None:
+                product = by_product[row['product_id']] = {
+                    'product_id': row['product_id'],
+                    'product__product_name': row['product__product_name'],
+                    'total': Decimal('0'),
+                    'quantity': 0,
+                    'count': 0,
+                }
+            product['total'] += revenue
+            product['quantity'] += quantity
+            product['count'] += count
+
+            if bucket:
+                period = _period(row['bucket'])
+                point = timeline.get(period)
+                if point is None:
+                    point = timeline[period] = {
+                        'period': period,
+                        'revenue': Decimal('0'),
+                        'quantity': 0,
+                        'count': 0,
+                    }
+                point['revenue'] += revenue
+                point['quantity'] += quantity
+                point['count'] += count
+
+    products = sorted(by_product.values(), key=lambda p: (-p['total'], p['product_id']))
+    if top is not None:
+        products = products[:top]
+
+    result = {
+        'total_revenue': total_revenue,
+        'total_sales': total_count,
+        'total_quantity': total_quantity,
+        'average_sale': total_revenue / total_count if total_count else 0,
+        'by_product': products,
+    }
+    if bucket:
+        result['bucket'] = bucket
+        result['timeline'] = [timeline[k] for k in sorted(timeline)]
+    return result
+
+
+def sales_analytics(queryset, bucket=None, start=None, end=None, top=None):
+    """Summarise a Sales queryset in a single SQL pass.
+
+    ``start`` is inclusive and ``end`` exclusive. ``top`` limits the
+    per-product breakdown to the N best products by revenue (overall totals
+    still cover every product).
+    """
+    if start is not None:
+        queryset = queryset.filter(sale_date__gte=start)
+    if end is not None:
+        queryset = queryset.filter(sale_date__lt=end)
+    return fold_rows([grouped_sales_rows(queryset, bucket)], bucket=bucket, top=top)
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class ProductsConfig(AppConfig):
     name = 'products'
+
+    def ready(self):
+        # connect ProductSalesStats / SalesDailyRollup maintenance signals
+        from . import stats, rollup  # noqa: F401
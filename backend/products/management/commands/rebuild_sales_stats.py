@@ -0,0 +1,69 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from products.models import ProductSalesStats
+from products.stats import compute_sales_totals
+
+
+FIELDS = ('total_amount', 'total_quantity', 'sales_count', 'last_sale_date')
+
+
+class Command(BaseCommand):
+    help = 'Verify ProductSalesStats against the Sales table and rebuild rows that drifted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report drift, do not write.')
+        parser.add_argument('--product', type=int, action='append', dest='products', help='Limit to product id (repeatable).')
+
+    def handle(self, *args, **options):
+        product_ids = options['products']
+        with transaction.atomic():
+            expected = compute_sales_totals(product_ids)
+            stored_qs = ProductSalesStats.objects.select_for_update()
+            if product_ids:
+                stored_qs = stored_qs.filter(product_id__in=product_ids)
+            stored = {s.product_id: s for s in stored_qs}
+
+            drifted, missing, stale = [], [], []
+            for product_id, totals in expected.items():
+                row = stored.get(product_id)
+                if row is None:
+                    missing.append(product_id)
+                elif any(getattr(row, f) != totals[f] for f in FIELDS):
+                    drifted.append(product_id)
+            for product_id, row in stored.items():
+                if product_id not in expected and (row.sales_count or row.total_amount != Decimal('0')):
+                    stale.append(product_id)
+
+            self.stdout.write(
+                f'checked={len(expected)} missing={len(missing)} drifted={len(drifted)} stale={len(stale)}'
+            )
+            for product_id in drifted:
+                row = stored[product_id]
+                diff = ', '.join(
+                    f'{f}: {getattr(row, f)} != {expected[product_id][f]}'
+                    for f in FIELDS if getattr(row, f) != expected[product_id][f]
+                )
+                self.stdout.write(f'  product {product_id}: {diff}')
+
+            if options['check']:
+                if missing or drifted or stale:
+                    raise CommandError('Sales stats drift detected')
+                self.stdout.write(self.style.SUCCESS('Sales stats are consistent'))
+                return
+
+            ProductSalesStats.objects.bulk_create(
+                [ProductSalesStats(product_id=pid, **expected[pid]) for pid in missing]
+            )
+            for pid in drifted:
+                for f in FIELDS:
+                    setattr(stored[pid], f, expected[pid][f])
+            ProductSalesStats.objects.bulk_update([stored[pid] for pid in drifted], FIELDS, batch_size=1000)
+            ProductSalesStats.objects.filter(product_id__in=stale).update(
+                total_amount=0, total_quantity=0, sales_count=0, last_sale_date=None
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {len(missing) + len(drifted) + len(stale)} product sales stats rows'
+        ))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.rollup import rebuild_daily_rollup, refresh_daily_rollup
+
+
+class Command(BaseCommand):
+    help = 'Fold completed days of Sales into SalesDailyRollup past the high-water mark.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Drop the rollup and recompute it from scratch.')
+        parser.add_argument('--batch-size', type=int, default=100000)
+        parser.add_argument('--loop', action='store_true', help='Keep running as a background worker.')
+        parser.add_argument('--interval', type=int, default=300, help='Seconds between refreshes with --loop.')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            count = rebuild_daily_rollup()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt sales rollup from {count} sales'))
+            if not options['loop']:
+                return
+        while True:
+            count = refresh_daily_rollup(batch_size=options['batch_size'])
+            self.stdout.write(f'Rolled up {count} sales')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
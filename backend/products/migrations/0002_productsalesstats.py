@@ -0,0 +1,44 @@
+# Generated by Django 6.0 on 2026-10-18 01:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+def backfill_sales_stats(apps, schema_editor):
+    Sales = apps.get_model('products', 'Sales')
+    ProductSalesStats = apps.get_model('products', 'ProductSalesStats')
+    rows = Sales.objects.order_by().values('product_id').annotate(
+        total_amount=Sum('sales_amount'),
+        total_quantity=Sum('quantity'),
+        sales_count=Count('sales_id'),
+        last_sale_date=Max('sale_date'),
+    )
+    ProductSalesStats.objects.bulk_create(
+        [ProductSalesStats(**row) for row in rows.iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSalesStats',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales_stats', serialize=False, to='products.productform')),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_quantity', models.BigIntegerField(default=0)),
+                ('sales_count', models.IntegerField(default=0)),
+                ('last_sale_date', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Product sales stats',
+            },
+        ),
+        migrations.RunPython(backfill_sales_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 6.0 on 2026-10-18 01:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_productsalesstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesDailyRollup',
+            fields=[
+                ('rollup_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesRollupState',
+            fields=[
+                ('state_id', models.AutoField(primary_key=True, serialize=False)),
+                ('last_sales_id', models.IntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='sales',
+            index=models.Index(fields=['-sale_date'], name='products_sa_sale_da_53bf07_idx'),
+        ),
+        migrations.AddField(
+            model_name='salesdailyrollup',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='products.productform'),
+        ),
+        migrations.AddIndex(
+            model_name='salesdailyrollup',
+            index=models.Index(fields=['day'], name='products_sa_day_8aad50_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='salesdailyrollup',
+            constraint=models.UniqueConstraint(fields=('product', 'day'), name='unique_sales_rollup_product_day'),
+        ),
+    ]
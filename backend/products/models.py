@@ -69,6 +69,7 @@ class Sales(models.Model):
         verbose_name_plural = 'Sales'
         indexes = [
             models.Index(fields=['product', '-sale_date']),
+            models.Index(fields=['-sale_date']),
         ]
     
     def __str__(self):
@@ -105,3 +106,69 @@ class Dashboard(models.Model):
     
     def __str__(self):
         return f"Dashboard for {self.product_name} by {self.user.username}"
+
+
+class ProductSalesStats(models.Model):
+    """
+    Running sales totals per product, maintained on every Sales write
+    (see products.stats) so listings don't aggregate the sales history.
+    """
+    product = models.OneToOneField(
+        ProductForm,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='sales_stats'
+    )
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_quantity = models.BigIntegerField(default=0)
+    sales_count = models.IntegerField(default=0)
+    last_sale_date = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'Product sales stats'
+
+    def __str__(self):
+        return f"Stats for product #{self.product_id}: {self.sales_count} sales"
+
+
+class SalesDailyRollup(models.Model):
+    """
+    Per-product, per-day sales totals rolled up from Sales by the
+    refresh_sales_rollup command (see products.rollup). Covers every sale
+    up to SalesRollupState.last_sales_id; newer rows form the live tail.
+    """
+    rollup_id = models.BigAutoField(primary_key=True)
+    product = models.ForeignKey(
+        ProductForm,
+        on_delete=models.CASCADE,
+        related_name='daily_rollups'
+    )
+    day = models.DateField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    quantity = models.BigIntegerField(default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'day'], name='unique_sales_rollup_product_day'),
+        ]
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+
+    def __str__(self):
+        return f"Rollup {self.product_id} {self.day}: {self.count} sales"
+
+
+class SalesRollupState(models.Model):
+    """
+    Single-row high-water mark for SalesDailyRollup: every Sales row with
+    sales_id <= last_sales_id is already counted in the rollup.
+    """
+    state_id = models.AutoField(primary_key=True)
+    last_sales_id = models.IntegerField(default=0)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Sales rollup through #{self.last_sales_id}"
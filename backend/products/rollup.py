@@ -0,0 +1,262 @@
+"""
+Incremental daily sales rollup.
+
+``refresh_daily_rollup`` folds Sales rows past the high-water mark
+(SalesRollupState.last_sales_id) into SalesDailyRollup, stopping at the
+first row dated on or after the cutoff (start of today by default) so the
+rollup only ever holds complete days. Updates and deletes of rows already
+behind the mark (and inserts that commit after the mark moved past their
+id) are applied to the rollup as deltas by signal handlers.
+
+The handlers read the mark with FOR SHARE and the refresh takes the state
+row FOR UPDATE, so a refresh never advances past a Sales write whose
+transaction is still open: it waits for the writer to commit, or the
+writer waits for the refresh and then sees the moved mark. That only
+holds while the handler runs in the write's transaction, so Sales writes
+should be wrapped in ``transaction.atomic()`` (the Sales viewset does).
+
+``rollup_sales_analytics`` answers the same questions as
+``products.analytics.sales_analytics``: whole days inside the requested
+range come from the rollup, while partial edge days and the live tail
+(rows past the mark) are read from Sales.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .analytics import fold_rows, grouped_sales_rows
+from .models import Sales, SalesDailyRollup, SalesRollupState
+from .stats import deleted_with_product
+
+
+ROLLUP_BUCKETS = {
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+STATE_PK = 1
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def current_mark():
+    return (
+        SalesRollupState.objects.filter(pk=STATE_PK)
+        .values_list('last_sales_id', flat=True)
+        .first()
+    ) or 0
+
+
+def _shared_mark():
+    """``current_mark()`` read FOR SHARE; the lock lasts until the caller's transaction ends."""
+    if not connection.features.has_select_for_update:
+        return current_mark()
+    # Django's select_for_update() only emits FOR UPDATE, which would
+    # serialize every Sales writer on the state row
+    meta = SalesRollupState._meta
+    sql = 'SELECT %s FROM %s WHERE %s = %%s FOR SHARE' % (
+        connection.ops.quote_name(meta.get_field('last_sales_id').column),
+        connection.ops.quote_name(meta.db_table),
+        connection.ops.quote_name(meta.pk.column),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [STATE_PK])
+        row = cursor.fetchone()
+    if row is None:
+        # no refresh yet; create the row so there is something to lock
+        SalesRollupState.objects.get_or_create(pk=STATE_PK)
+        return _shared_mark()
+    return row[0]
+
+
+def refresh_daily_rollup(cutoff=None, batch_size=100000):
+    """Roll complete days past the high-water mark into SalesDailyRollup.
+
+    Returns the number of Sales rows folded in. Each batch of ``batch_size``
+    ids commits on its own so a long catch-up can be interrupted safely.
+    """
+    if cutoff is None:
+        cutoff = _start_of_day(timezone.localdate())
+    processed = 0
+    while True:
+        with transaction.atomic():
+            state, _ = SalesRollupState.objects.select_for_update().get_or_create(pk=STATE_PK)
+            mark = state.last_sales_id
+            # the rollup must stay contiguous in sales_id, so stop at the first
+            # row that belongs to an incomplete day
+            stop = (
+                Sales.objects.filter(sales_id__gt=mark, sale_date__gte=cutoff)
+                .order_by('sales_id')
+                .values_list('sales_id', flat=True)
+                .first()
+            )
+            last_id = Sales.objects.aggregate(last=Max('sales_id'))['last'] or 0
+            upper = min(mark + batch_size, last_id if stop is None else stop - 1)
+            if upper <= mark:
+                state.refreshed_at = timezone.now()
+                state.save(update_fields=['refreshed_at'])
+                return processed
+            rows = list(
+                Sales.objects.filter(sales_id__gt=mark, sales_id__lte=upper)
+                .order_by()
+                .annotate(day=TruncDate('sale_date'))
+                .values('product_id', 'day')
+                .annotate(
+                    revenue=Sum('sales_amount'),
+                    quantity=Sum('quantity'),
+                    count=Count('sales_id'),
+                )
+            )
+            _merge_rollup_rows(rows)
+            state.last_sales_id = upper
+            state.refreshed_at = timezone.now()
+            state.save(update_fields=['last_sales_id', 'refreshed_at'])
+            processed += sum(r['count'] for r in rows)
+
+
+def _merge_rollup_rows(rows):
+    keys = {(r['product_id'], r['day']) for r in rows}
+    product_ids = {k[0] for k in keys}
+    days = {k[1] for k in keys}
+    existing = {
+        (r.product_id, r.day): r
+        for r in SalesDailyRollup.objects.filter(product_id__in=product_ids, day__in=days)
+    }
+    to_create, to_update = [], []
+    for r in rows:
+        current = existing.get((r['product_id'], r['day']))
+        if current is None:
+            to_create.append(SalesDailyRollup(
+                product_id=r['product_id'],
+                day=r['day'],
+                revenue=r['revenue'] or 0,
+                quantity=r['quantity'] or 0,
+                count=r['count'],
+            ))
+        else:
+            current.revenue += r['revenue'] or 0
+            current.quantity += r['quantity'] or 0
+            current.count += r['count']
+            to_update.append(current)
+    SalesDailyRollup.objects.bulk_create(to_create, batch_size=1000)
+    SalesDailyRollup.objects.bulk_update(to_update, ['revenue', 'quantity', 'count'], batch_size=1000)
+
+
+def rebuild_daily_rollup(cutoff=None):
+    """Discard the rollup and the mark, then refresh from scratch."""
+    with transaction.atomic():
+        SalesDailyRollup.objects.all().delete()
+        SalesRollupState.objects.filter(pk=STATE_PK).update(last_sales_id=0)
+    return refresh_daily_rollup(cutoff=cutoff)
+
+
+def _apply_rollup_delta(product_id, day, revenue, quantity, count):
+    updated = SalesDailyRollup.objects.filter(product_id=product_id, day=day).update(
+        revenue=F('revenue') + revenue,
+        quantity=F('quantity') + quantity,
+        count=F('count') + count,
+    )
+    if updated or count <= 0:
+        return
+    try:
+        with transaction.atomic():
+            SalesDailyRollup.objects.create(
+                product_id=product_id, day=day, revenue=revenue, quantity=quantity, count=count
+            )
+    except IntegrityError:
+        _apply_rollup_delta(product_id, day, revenue, quantity, count)
+
+
+@receiver(post_save, sender=Sales)
+def _rolled_up_sale_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or instance.sales_id > _shared_mark():
+        return
+    day = timezone.localtime(instance.sale_date).date()
+    # set by products.stats in pre_save
+    previous = getattr(instance, '_stats_previous', None)
+    if created or previous is None:
+        # committed behind a refresh that already moved the mark past it
+        _apply_rollup_delta(instance.product_id, day, Decimal(instance.sales_amount), instance.quantity, 1)
+        return
+    old_product_id, old_amount, old_quantity = previous
+    amount = Decimal(instance.sales_amount)
+    if old_product_id == instance.product_id:
+        if old_amount != amount or old_quantity != instance.quantity:
+            _apply_rollup_delta(instance.product_id, day, amount - old_amount, instance.quantity - old_quantity, 0)
+        return
+    _apply_rollup_delta(old_product_id, day, -old_amount, -old_quantity, -1)
+    _apply_rollup_delta(instance.product_id, day, amount, instance.quantity, 1)
+
+
+@receiver(post_delete, sender=Sales)
+def _rolled_up_sale_deleted(sender, instance, origin=None, **kwargs):
+    if deleted_with_product(origin) or instance.sales_id > _shared_mark():
+        return
+    day = timezone.localtime(instance.sale_date).date()
+    _apply_rollup_delta(instance.product_id, day, -Decimal(instance.sales_amount), -instance.quantity, -1)
+
+
+def _grouped_rollup_rows(queryset, bucket=None):
+    group_by = ['product_id', 'product__product_name']
+    if bucket == 'day':
+        queryset = queryset.annotate(bucket=F('day'))
+        group_by.append('bucket')
+    elif bucket:
+        queryset = queryset.annotate(bucket=ROLLUP_BUCKETS[bucket]('day'))
+        group_by.append('bucket')
+    return queryset.order_by().values(*group_by).annotate(
+        revenue=Sum('revenue'),
+        quantity=Sum('quantity'),
+        count=Sum('count'),
+    )
+
+
+def rollup_sales_analytics(product_filter=None, bucket=None, start=None, end=None, top=None):
+    """Rollup-backed equivalent of ``sales_analytics``.
+
+    ``product_filter`` is a dict of lookups valid on both Sales and
+    SalesDailyRollup (e.g. ``{'product__user': user}``).
+    """
+    product_filter = product_filter or {}
+    mark = current_mark()
+
+    # whole local days fully inside [start, end)
+    first_day = last_day = None
+    if start is not None:
+        first_day = timezone.localtime(start).date()
+        if _start_of_day(first_day) < start:
+            first_day += timedelta(days=1)
+    if end is not None:
+        last_day = timezone.localtime(end).date()
+
+    rollup = SalesDailyRollup.objects.filter(**product_filter)
+    if first_day is not None:
+        rollup = rollup.filter(day__gte=first_day)
+    if last_day is not None:
+        rollup = rollup.filter(day__lt=last_day)
+
+    # raw rows: the live tail, plus rolled-up rows on partial edge days
+    raw_condition = Q(sales_id__gt=mark)
+    if first_day is not None:
+        raw_condition |= Q(sale_date__lt=_start_of_day(first_day))
+    if last_day is not None:
+        raw_condition |= Q(sale_date__gte=_start_of_day(last_day))
+    raw = Sales.objects.filter(raw_condition, **product_filter)
+    if start is not None:
+        raw = raw.filter(sale_date__gte=start)
+    if end is not None:
+        raw = raw.filter(sale_date__lt=end)
+
+    if first_day is not None and last_day is not None and first_day >= last_day:
+        sources = [grouped_sales_rows(raw, bucket)]
+    else:
+        sources = [_grouped_rollup_rows(rollup, bucket), grouped_sales_rows(raw, bucket)]
+    return fold_rows(sources, bucket=bucket, top=top)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import ProductForm, Sales, Dashboard
+from .stats import stats_for
 # Try importing FormSchemaSerializer from current app name, support fallback if project uses 'forms_app_new'
 try:
     from forms_app_old.serializers import FormSchemaSerializer
@@ -18,7 +19,7 @@ class ProductFormSerializer(serializers.ModelSerializer):
     user_username = serializers.CharField(source='user.username', read_only=True)
     form_schema_details = FormSchemaSerializer(source='form_schema', read_only=True)
     total_sales = serializers.SerializerMethodField()
-    sales_count = serializers.IntegerField(source='sales.count', read_only=True)
+    sales_count = serializers.SerializerMethodField()
     
     class Meta:
         model = ProductForm
@@ -31,7 +32,11 @@ class ProductFormSerializer(serializers.ModelSerializer):
         read_only_fields = ['product_id', 'created_at', 'user']  # user is read-only now
     
     def get_total_sales(self, obj):
-        return sum(sale.sales_amount for sale in obj.sales.all())
+        # read the maintained running total (select_related('sales_stats') upstream)
+        return stats_for(obj)[0]
+
+    def get_sales_count(self, obj):
+        return stats_for(obj)[2]
 
 
 
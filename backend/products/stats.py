@@ -0,0 +1,145 @@
+"""
+Incremental maintenance of ProductSalesStats.
+
+Every Sales insert, update and delete adjusts the owning product's running
+totals with a single UPDATE using F() expressions, so concurrent writers
+don't lose increments. Callers that need the sale and its totals to commit
+together should wrap the write in ``transaction.atomic()`` (the Sales
+viewset does).
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, QuerySet, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import ProductSalesStats, Sales
+
+
+def _latest_sale_date(product_id):
+    return Subquery(
+        Sales.objects.filter(product_id=product_id)
+        .order_by('-sale_date')
+        .values('sale_date')[:1]
+    )
+
+
+def apply_sale_delta(product_id, amount, quantity, count, sale_date=None, recompute_last=False):
+    """Add (or subtract, with negative values) a sale to the product's totals."""
+    updates = {
+        'total_amount': F('total_amount') + amount,
+        'total_quantity': F('total_quantity') + quantity,
+        'sales_count': F('sales_count') + count,
+    }
+    if recompute_last:
+        updates['last_sale_date'] = _latest_sale_date(product_id)
+    elif sale_date is not None:
+        updates['last_sale_date'] = Greatest(Coalesce('last_sale_date', Value(sale_date)), Value(sale_date))
+
+    if ProductSalesStats.objects.filter(product_id=product_id).update(**updates):
+        return
+    if count < 0:
+        # row missing for a removal: totals are out of sync, rebuild from source
+        rebuild_product_stats(product_id)
+        return
+    try:
+        with transaction.atomic():
+            ProductSalesStats.objects.create(
+                product_id=product_id,
+                total_amount=amount,
+                total_quantity=quantity,
+                sales_count=count,
+                last_sale_date=sale_date,
+            )
+    except IntegrityError:
+        # created concurrently; apply the delta to that row instead
+        ProductSalesStats.objects.filter(product_id=product_id).update(**updates)
+
+
+def compute_sales_totals(product_ids=None):
+    """Aggregate Sales into {product_id: totals} in one grouped query."""
+    qs = Sales.objects.all()
+    if product_ids is not None:
+        qs = qs.filter(product_id__in=product_ids)
+    rows = qs.order_by().values('product_id').annotate(
+        total_amount=Sum('sales_amount'),
+        total_quantity=Sum('quantity'),
+        sales_count=Count('sales_id'),
+        last_sale_date=Max('sale_date'),
+    )
+    return {row.pop('product_id'): row for row in rows}
+
+
+def rebuild_product_stats(product_id):
+    totals = compute_sales_totals([product_id]).get(product_id)
+    if totals is None:
+        ProductSalesStats.objects.filter(product_id=product_id).delete()
+        return
+    ProductSalesStats.objects.update_or_create(product_id=product_id, defaults=totals)
+
+
+def stats_for(product):
+    """Return (total_amount, total_quantity, sales_count, last_sale_date) for a product."""
+    try:
+        stats = product.sales_stats
+    except ProductSalesStats.DoesNotExist:
+        return Decimal('0'), 0, 0, None
+    return stats.total_amount, stats.total_quantity, stats.sales_count, stats.last_sale_date
+
+
+@receiver(pre_save, sender=Sales)
+def _remember_previous_sale(sender, instance, **kwargs):
+    instance._stats_previous = None
+    if instance.pk is not None:
+        instance._stats_previous = (
+            Sales.objects.filter(pk=instance.pk)
+            .values_list('product_id', 'sales_amount', 'quantity')
+            .first()
+        )
+
+
+@receiver(post_save, sender=Sales)
+def _sale_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_stats_previous', None)
+    amount = Decimal(instance.sales_amount)
+    if created or previous is None:
+        apply_sale_delta(instance.product_id, amount, instance.quantity, 1, sale_date=instance.sale_date)
+        return
+    old_product_id, old_amount, old_quantity = previous
+    if old_product_id == instance.product_id:
+        if old_amount != amount or old_quantity != instance.quantity:
+            apply_sale_delta(instance.product_id, amount - old_amount, instance.quantity - old_quantity, 0)
+        return
+    apply_sale_delta(old_product_id, -old_amount, -old_quantity, -1, recompute_last=True)
+    apply_sale_delta(instance.product_id, amount, instance.quantity, 1, sale_date=instance.sale_date)
+
+
+def deleted_with_product(origin):
+    """True when a Sales post_delete with this ``origin`` is a cascade from deleting its product.
+
+    Sales only reference their product, so a delete that didn't start from
+    Sales themselves (a ProductForm, or the user owning it) takes the
+    product and its totals with it. Nothing is kept between signals, so a
+    delete that fails or rolls back leaves nothing behind either.
+    """
+    if origin is None:
+        return False
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return not issubclass(model, Sales)
+
+
+@receiver(post_delete, sender=Sales)
+def _sale_deleted(sender, instance, origin=None, **kwargs):
+    if deleted_with_product(origin):
+        return
+    apply_sale_delta(
+        instance.product_id,
+        -Decimal(instance.sales_amount),
+        -instance.quantity,
+        -1,
+        recompute_last=True,
+    )
@@ -1,3 +1,273 @@
-from django.test import TestCase
+import threading
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models.signals import post_delete
+from django.test import TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+
+from ecombackend.testing import QueryBudgetMixin
+from forms_app.models import FormSchema
+from .models import Dashboard, ProductForm, ProductSalesStats, Sales
+
+
+class ProductSalesStatsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='seller')
+        self.product = ProductForm.objects.create(product_name='Tea', product_type='drink', user=self.user)
+        self.other = ProductForm.objects.create(product_name='Coffee', product_type='drink', user=self.user)
+
+    def stats(self, product):
+        return ProductSalesStats.objects.get(product=product)
+
+    def test_create_update_delete_maintain_totals(self):
+        first = Sales.objects.create(product=self.product, sales_amount=Decimal('10.00'), quantity=2)
+        second = Sales.objects.create(product=self.product, sales_amount=Decimal('5.50'), quantity=1)
+        stats = self.stats(self.product)
+        self.assertEqual((stats.total_amount, stats.total_quantity, stats.sales_count), (Decimal('15.50'), 3, 2))
+        self.assertEqual(stats.last_sale_date, second.sale_date)
+
+        first.sales_amount = Decimal('12.00')
+        first.save()
+        self.assertEqual(self.stats(self.product).total_amount, Decimal('17.50'))
+
+        second.product = self.other
+        second.save()
+        stats = self.stats(self.product)
+        self.assertEqual((stats.total_amount, stats.sales_count, stats.last_sale_date), (Decimal('12.00'), 1, first.sale_date))
+        self.assertEqual(self.stats(self.other).total_amount, Decimal('5.50'))
+
+        first.delete()
+        stats = self.stats(self.product)
+        self.assertEqual((stats.total_amount, stats.total_quantity, stats.sales_count, stats.last_sale_date), (Decimal('0.00'), 0, 0, None))
+
+    def test_deleting_product_cascades_stats(self):
+        Sales.objects.create(product=self.product, sales_amount=Decimal('3.00'))
+        self.product.delete()
+        self.assertFalse(ProductSalesStats.objects.filter(product_id=self.product.pk).exists())
+
+    def test_failed_product_delete_leaves_later_sale_deletes_counted(self):
+        sale = Sales.objects.create(product=self.product, sales_amount=Decimal('3.00'))
+        Sales.objects.create(product=self.product, sales_amount=Decimal('4.00'))
+
+        def fail(sender, instance, **kwargs):
+            raise RuntimeError('disk full')
+        # fails mid-cascade, after the sales are gone and before the product is
+        post_delete.connect(fail, sender=ProductSalesStats)
+        try:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.product.delete()
+        finally:
+            post_delete.disconnect(fail, sender=ProductSalesStats)
+        sale.delete()
+        self.assertEqual(self.stats(self.product).total_amount, Decimal('4.00'))
+
+    def test_deleting_the_owner_cascades_stats(self):
+        Sales.objects.create(product=self.product, sales_amount=Decimal('3.00'))
+        self.user.delete()
+        self.assertFalse(ProductSalesStats.objects.exists())
+
+    def test_rebuild_command_repairs_drift(self):
+        Sales.objects.create(product=self.product, sales_amount=Decimal('8.00'), quantity=4)
+        ProductSalesStats.objects.filter(product=self.product).update(total_amount=Decimal('1.00'), sales_count=9)
+        with self.assertRaisesMessage(CommandError, 'drift detected'):
+            call_command('rebuild_sales_stats', '--check', stdout=StringIO())
+        call_command('rebuild_sales_stats', stdout=StringIO())
+        stats = self.stats(self.product)
+        self.assertEqual((stats.total_amount, stats.total_quantity, stats.sales_count), (Decimal('8.00'), 4, 1))
+        call_command('rebuild_sales_stats', '--check', stdout=StringIO())
+
+
+class SalesAnalyticsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='seller')
+        self.tea = ProductForm.objects.create(product_name='Tea', product_type='drink', user=self.user)
+        self.coffee = ProductForm.objects.create(product_name='Coffee', product_type='drink', user=self.user)
+        Sales.objects.create(product=self.tea, sales_amount=Decimal('10.00'), quantity=1)
+        Sales.objects.create(product=self.tea, sales_amount=Decimal('20.00'), quantity=3)
+        Sales.objects.create(product=self.coffee, sales_amount=Decimal('5.00'), quantity=2)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_analytics_single_query(self):
+        from .analytics import sales_analytics
+        with self.assertNumQueries(1):
+            result = sales_analytics(Sales.objects.all(), bucket='day', top=1)
+        self.assertEqual(result['total_revenue'], Decimal('35.00'))
+        self.assertEqual(result['total_sales'], 3)
+        self.assertEqual(result['total_quantity'], 6)
+        self.assertEqual(len(result['by_product']), 1)
+        self.assertEqual(result['by_product'][0]['product__product_name'], 'Tea')
+        self.assertEqual(sum(p['count'] for p in result['timeline']), 3)
+
+    def test_analytics_endpoint_params(self):
+        resp = self.client.get('/api/sales/analytics/', {'bucket': 'month'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['total_sales'], 3)
+        self.assertEqual(len(resp.json()['timeline']), 1)
+        resp = self.client.get('/api/sales/analytics/', {'start': '2000-01-01', 'end': '2000-01-31'})
+        self.assertEqual(resp.json()['total_sales'], 0)
+        self.assertEqual(self.client.get('/api/sales/analytics/', {'bucket': 'year'}).status_code, 400)
+        resp = self.client.get('/api/sales/analytics/', {'end': '9999-12-31'})
+        self.assertEqual(resp.json()['total_sales'], 3)
+
+    def test_impossible_dates_are_rejected(self):
+        for url, params in [('/api/sales/analytics/', {'start': '2024-02-30'}),
+                            ('/api/sales/analytics/', {'end': '2024-01-01T25:00:00'}),
+                            (f'/api/products/{self.tea.pk}/sales_summary/', {'start': '2024-13-01'})]:
+            resp = self.client.get(url, params)
+            self.assertEqual(resp.status_code, 400)
+            self.assertIn('not a valid date', resp.json()['error'])
+
+
+class SalesDailyRollupTest(TestCase):
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        self.user = User.objects.create(username='seller')
+        self.tea = ProductForm.objects.create(product_name='Tea', product_type='drink', user=self.user)
+        self.coffee = ProductForm.objects.create(product_name='Coffee', product_type='drink', user=self.user)
+        now = timezone.now()
+        self.sales = []
+        for days_ago, product, amount in [(5, self.tea, '10.00'), (5, self.coffee, '4.00'), (3, self.tea, '7.50'),
+                                          (1, self.coffee, '2.25'), (0, self.tea, '1.00')]:
+            sale = Sales.objects.create(product=product, sales_amount=Decimal(amount), quantity=2)
+            Sales.objects.filter(pk=sale.pk).update(sale_date=now - timedelta(days=days_ago))
+            sale.refresh_from_db()
+            self.sales.append(sale)
+
+    def assertMatchesRaw(self, **params):
+        from .analytics import sales_analytics
+        from .rollup import rollup_sales_analytics
+        raw = sales_analytics(Sales.objects.all(), **params)
+        rolled = rollup_sales_analytics(None, **params)
+        for key in ('total_revenue', 'total_sales', 'total_quantity', 'by_product', 'timeline'):
+            self.assertEqual(rolled.get(key), raw.get(key), key)
+
+    def test_refresh_and_range_queries_match_raw(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import SalesDailyRollup, SalesRollupState
+        from .rollup import refresh_daily_rollup
+        self.assertEqual(refresh_daily_rollup(), 4)
+        self.assertEqual(SalesRollupState.objects.get().last_sales_id, self.sales[3].sales_id)
+        self.assertEqual(SalesDailyRollup.objects.count(), 4)
+        self.assertEqual(refresh_daily_rollup(), 0)
+
+        now = timezone.now()
+        self.assertMatchesRaw()
+        self.assertMatchesRaw(bucket='day')
+        self.assertMatchesRaw(bucket='month', top=1)
+        self.assertMatchesRaw(start=now - timedelta(days=4, hours=3), end=now - timedelta(hours=1))
+        self.assertMatchesRaw(start=now - timedelta(days=3, hours=1), end=now - timedelta(days=2, hours=23))
+
+        self.sales[2].delete()
+        self.sales[1].sales_amount = Decimal('6.00')
+        self.sales[1].save()
+        self.assertMatchesRaw(bucket='week')
+
+
+class ConcurrentRollupRefreshTest(TransactionTestCase):
+    # the writer and the refresh run on their own connections
+    available_apps = ['products']
+
+    def test_refresh_waits_for_an_open_sale_write(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import SalesDailyRollup
+        from .rollup import refresh_daily_rollup
+        user = User.objects.create(username='rollup-seller')
+        self.addCleanup(user.delete)
+        tea = ProductForm.objects.create(product_name='Tea', product_type='drink', user=user)
+        # a second product, so the two writes don't queue on one ProductSalesStats row
+        coffee = ProductForm.objects.create(product_name='Coffee', product_type='drink', user=user)
+        two_days_ago = timezone.now() - timedelta(days=2)
+        refresh_daily_rollup()
+
+        saved, release = threading.Event(), threading.Event()
+
+        def write():
+            try:
+                with transaction.atomic():
+                    sale = Sales.objects.create(product=tea, sales_amount=Decimal('3.00'))
+                    Sales.objects.filter(pk=sale.pk).update(sale_date=two_days_ago)
+                    saved.set()
+                    release.wait(5)
+            finally:
+                connection.close()
+
+        def refresh():
+            try:
+                refresh_daily_rollup()
+            finally:
+                connection.close()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        self.assertTrue(saved.wait(5))
+        # a later id commits first; the refresh must not move the mark past the open write
+        later = Sales.objects.create(product=coffee, sales_amount=Decimal('5.00'))
+        Sales.objects.filter(pk=later.pk).update(sale_date=two_days_ago)
+        refresher = threading.Thread(target=refresh)
+        refresher.start()
+        refresher.join(0.5)
+        self.assertTrue(refresher.is_alive())
+        release.set()
+        writer.join(5)
+        refresher.join(5)
+
+        self.assertEqual(
+            sorted(SalesDailyRollup.objects.values_list('product__product_name', 'count', 'revenue')),
+            [('Coffee', 1, Decimal('5.00')), ('Tea', 1, Decimal('3.00'))],
+        )
+
+
+class KeysetPaginationTest(TestCase):
+    def test_sales_list_pages_with_cursor(self):
+        user = User.objects.create(username='seller')
+        product = ProductForm.objects.create(product_name='Tea', product_type='drink', user=user)
+        for i in range(5):
+            Sales.objects.create(product=product, sales_amount=Decimal(i + 1))
+        client = APIClient()
+        client.force_authenticate(user)
+
+        seen = []
+        url = '/api/sales/?page_size=2'
+        while url:
+            resp = client.get(url)
+            self.assertEqual(resp.status_code, 200)
+            body = resp.json()
+            self.assertLessEqual(len(body['results']), 2)
+            seen.extend(r['sales_id'] for r in body['results'])
+            url = body['next']
+        self.assertEqual(sorted(seen, reverse=True), seen)
+        self.assertEqual(len(set(seen)), 5)
+
+
+class ListQueryBudgetTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='seller')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.add_rows()
+
+    def add_rows(self, n=3):
+        for i in range(n):
+            form = FormSchema.objects.create(title=f'F{i}', language_config={'primary': 'en'}, created_by=self.user)
+            product = ProductForm.objects.create(product_name=f'P{i}', product_type='t', user=self.user, form_schema=form)
+            Sales.objects.create(product=product, sales_amount=Decimal('1.00'))
+            Dashboard.objects.create(product=product, product_name=product.product_name, sales_table='sales', user=self.user)
+
+    def test_product_list(self):
+        # products (+ user, stats), form schemas with counts
+        resp = self.assertQueryBudget(self.client, '/api/products/', 2, grow=self.add_rows)
+        self.assertEqual(resp.data['results'][0]['form_schema_details']['submission_count'], 0)
+
+    def test_sales_list(self):
+        self.assertQueryBudget(self.client, '/api/sales/', 1, grow=self.add_rows)
+
+    def test_dashboard_list(self):
+        self.assertQueryBudget(self.client, '/api/dashboards/', 2, grow=self.add_rows)
@@ -1,14 +1,20 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Sum, Count, Avg
+from django.db import transaction
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 from rest_framework.permissions import IsAuthenticated
 from users.permissions import IsSuperEmployee  # Assuming you have this
+from ecombackend.pagination import KeysetPagination, SaleDatePagination
+from forms_app.serializers import with_submission_count
 
 from .models import ProductForm, Sales, Dashboard
 from .serializers import ProductFormSerializer, SalesSerializer, DashboardSerializer
+from .stats import stats_for
+from .analytics import AnalyticsParamError, parse_analytics_params
+from .rollup import rollup_sales_analytics
 
 User = get_user_model()
 
@@ -17,6 +23,7 @@ class ProductFormViewSet(viewsets.ModelViewSet):
     queryset = ProductForm.objects.all()
     serializer_class = ProductFormSerializer
     lookup_field = 'product_id'
+    pagination_class = KeysetPagination
 
     permission_classes = [IsAuthenticated]
 
@@ -30,9 +37,12 @@ class ProductFormViewSet(viewsets.ModelViewSet):
         return [perm() for perm in permission_classes]
 
     def get_queryset(self):
+        queryset = ProductForm.objects.select_related('user', 'sales_stats').prefetch_related(
+            Prefetch('form_schema', queryset=with_submission_count())
+        )
         if self.request.user.is_authenticated:
-            return ProductForm.objects.filter(user=self.request.user)
-        return ProductForm.objects.all()
+            return queryset.filter(user=self.request.user)
+        return queryset
 
     def perform_create(self, serializer):
         if self.request.user.is_authenticated:
@@ -47,13 +57,29 @@ class ProductFormViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def sales_summary(self, request, product_id=None):
         product = self.get_object()
-        sales = product.sales.all()
+        recent_sales = SalesSerializer(product.sales.select_related('product')[:5], many=True).data
+        try:
+            params = parse_analytics_params(request.query_params)
+        except AnalyticsParamError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if any(params[k] for k in ('bucket', 'start', 'end')):
+            # windowed/bucketed summaries come from the shared analytics pass
+            analytics = rollup_sales_analytics({'product': product}, **params)
+            return Response({
+                'total_sales': analytics['total_revenue'],
+                'total_quantity': analytics['total_quantity'],
+                'sales_count': analytics['total_sales'],
+                'average_sale': analytics['average_sale'],
+                'timeline': analytics.get('timeline', []),
+                'recent_sales': recent_sales,
+            })
+        total, quantity, count, _ = stats_for(product)
         summary = {
-            'total_sales': sales.aggregate(total=Sum('sales_amount'))['total'] or 0,
-            'total_quantity': sales.aggregate(total=Sum('quantity'))['total'] or 0,
-            'sales_count': sales.count(),
-            'average_sale': sales.aggregate(avg=Avg('sales_amount'))['avg'] or 0,
-            'recent_sales': SalesSerializer(sales[:5], many=True).data
+            'total_sales': total,
+            'total_quantity': quantity,
+            'sales_count': count,
+            'average_sale': total / count if count else 0,
+            'recent_sales': recent_sales
         }
         return Response(summary)
 
@@ -63,14 +89,16 @@ class ProductFormViewSet(viewsets.ModelViewSet):
         products = self.get_queryset()
         if product_type:
             products = products.filter(product_type=product_type)
-        serializer = self.get_serializer(products, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(products)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
 
 class SalesViewSet(viewsets.ModelViewSet):
     queryset = Sales.objects.all()
     serializer_class = SalesSerializer
     lookup_field = 'sales_id'
+    pagination_class = SaleDatePagination
 
     permission_classes = [IsAuthenticated]
 
@@ -84,9 +112,23 @@ class SalesViewSet(viewsets.ModelViewSet):
         return [perm() for perm in permission_classes]
 
     def get_queryset(self):
+        queryset = Sales.objects.select_related('product')
         if self.request.user.is_authenticated:
-            return Sales.objects.filter(product__user=self.request.user)
-        return Sales.objects.all()
+            return queryset.filter(product__user=self.request.user)
+        return queryset
+
+    # keep each Sales write and its ProductSalesStats update in one transaction
+    @transaction.atomic
+    def perform_create(self, serializer):
+        serializer.save()
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        serializer.save()
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
 
     @action(detail=False, methods=['get'])
     def by_product(self, request):
@@ -94,23 +136,20 @@ class SalesViewSet(viewsets.ModelViewSet):
         if not product_id:
             return Response({'error': 'product_id parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
         sales = self.get_queryset().filter(product_id=product_id)
-        serializer = self.get_serializer(sales, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(sales)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def analytics(self, request):
-        queryset = self.get_queryset()
-        analytics = {
-            'total_revenue': queryset.aggregate(total=Sum('sales_amount'))['total'] or 0,
-            'total_sales': queryset.count(),
-            'total_quantity': queryset.aggregate(total=Sum('quantity'))['total'] or 0,
-            'average_sale': queryset.aggregate(avg=Avg('sales_amount'))['avg'] or 0,
-            'by_product': queryset.values('product__product_name').annotate(
-                total=Sum('sales_amount'),
-                count=Count('sales_id')
-            )
-        }
-        return Response(analytics)
+        """Totals and per-product breakdown; supports ?bucket=day|week|month, ?start=, ?end= and ?top=N"""
+        try:
+            params = parse_analytics_params(request.query_params)
+        except AnalyticsParamError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        product_filter = {'product__user': request.user} if request.user.is_authenticated else None
+        # whole days come from SalesDailyRollup, the rest from the live Sales tail
+        return Response(rollup_sales_analytics(product_filter, **params))
 
 
 class DashboardViewSet(viewsets.ModelViewSet):
@@ -130,9 +169,12 @@ class DashboardViewSet(viewsets.ModelViewSet):
         return [perm() for perm in permission_classes]
 
     def get_queryset(self):
+        queryset = Dashboard.objects.select_related('user', 'product__user', 'product__sales_stats').prefetch_related(
+            Prefetch('product__form_schema', queryset=with_submission_count())
+        )
         if self.request.user.is_authenticated:
-            return Dashboard.objects.filter(user=self.request.user)
-        return Dashboard.objects.all()
+            return queryset.filter(user=self.request.user)
+        return queryset
 
     def perform_create(self, serializer):
         product = serializer.validated_data.get('product')
@@ -149,13 +191,14 @@ class DashboardViewSet(viewsets.ModelViewSet):
     def data(self, request, dashboard_id=None):
         dashboard = self.get_object()
         product = dashboard.product
+        total, _, count, _ = stats_for(product)
         data = {
             'dashboard': self.get_serializer(dashboard).data,
             'product': ProductFormSerializer(product).data,
             'sales_summary': {
-                'total_sales': product.sales.aggregate(total=Sum('sales_amount'))['total'] or 0,
-                'sales_count': product.sales.count(),
-                'recent_sales': SalesSerializer(product.sales.all()[:10], many=True).data
+                'total_sales': total,
+                'sales_count': count,
+                'recent_sales': SalesSerializer(product.sales.select_related('product')[:10], many=True).data
             }
         }
         return Response(data)
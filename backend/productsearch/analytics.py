@@ -0,0 +1,166 @@
+"""
+Search analytics: hourly rollups of SearchLog, and raw-log retention.
+
+``rollup_searches`` folds SearchLog into SearchQueryHourly. There is one row
+per normalized query (lower-cased, whitespace collapsed) and hour, holding
+the number of searches, how many of them found nothing, and the summed
+result counts. Each hour also gets a ``TOTAL`` row over all its queries.
+Most queries are searched once or twice an hour, so per-query rows barely
+shrink the long tail; the totals are what keep volume trends cheap.
+
+Each run recomputes whole hours from the raw rows, starting an hour before
+the latest rolled-up hour and running through the current hour. So a run
+is idempotent, and it only ever reads the last couple of hours through the
+``searched_at`` index. Rows the batched writer (search_log.py) inserts
+late still land in their hour, and the open hour is refreshed on every
+run. Schedule it every few minutes.
+
+``prune_search_logs`` deletes raw rows older than ``SEARCH_LOG_RETENTION_DAYS``.
+It never deletes rows from hours a rollup would still recompute.
+
+``top_queries`` and ``query_trend`` read the rollups only. Their windows are
+whole hours: ``since`` is rounded down to the start of its hour.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Max, Min, Sum
+from django.db.models.functions import TruncDay
+from django.utils import timezone
+
+from productManagement.history import parse_moment
+
+from .models import SearchLog, SearchQueryHourly
+
+
+RETENTION_DAYS = getattr(settings, 'SEARCH_LOG_RETENTION_DAYS', 30)
+PRUNE_BATCH_SIZE = 50000
+DEFAULT_WINDOW = timedelta(days=7)
+INTERVALS = ('hour', 'day')
+MAX_TOP = 100
+# the query of each hour's all-queries row; blank searches aren't rolled up
+TOTAL = ''
+
+
+class AnalyticsParamError(ValueError):
+    pass
+
+
+def normalize_query(query):
+    """The rollup key for ``query``: what the SQL in ``rollup_searches`` computes."""
+    return ' '.join(query.split()).lower()
+
+
+def _hour(dt):
+    return timezone.localtime(dt).replace(minute=0, second=0, microsecond=0)
+
+
+def _tables():
+    qn = connection.ops.quote_name
+    return {'logs': qn(SearchLog._meta.db_table), 'rollups': qn(SearchQueryHourly._meta.db_table)}
+
+
+def _resume_hour():
+    """Where the next rollup starts recomputing, or None before the first one."""
+    latest = SearchQueryHourly.objects.aggregate(latest=Max('hour'))['latest']
+    return None if latest is None else latest - timedelta(hours=1)
+
+
+def rollup_searches(now=None):
+    """Recompute the hourly rollups from the last rolled-up hour on; returns the rows written."""
+    start = _resume_hour()
+    if start is None:
+        first = SearchLog.objects.aggregate(first=Min('searched_at'))['first']
+        if first is None:
+            return 0
+        start = _hour(first)
+    end = _hour(now or timezone.now()) + timedelta(hours=1)
+    tz = timezone.get_current_timezone_name()
+    with transaction.atomic(), connection.cursor() as cursor:
+        # overlapping runs would insert the same hours; reports keep reading meanwhile
+        cursor.execute('LOCK TABLE {rollups} IN SHARE ROW EXCLUSIVE MODE'.format(**_tables()))
+        cursor.execute('DELETE FROM {rollups} WHERE hour >= %s AND hour < %s'.format(**_tables()), [start, end])
+        cursor.execute(
+            r'''
+            INSERT INTO {rollups} (query, hour, searches, zero_results, results_total)
+            SELECT COALESCE(query, %s), hour,
+                   COUNT(*), COUNT(*) FILTER (WHERE results_count = 0), SUM(results_count)
+            FROM (
+                SELECT lower(regexp_replace(btrim(query), '\s+', ' ', 'g')) AS query,
+                       date_trunc('hour', searched_at AT TIME ZONE %s) AT TIME ZONE %s AS hour,
+                       results_count
+                FROM {logs}
+                WHERE searched_at >= %s AND searched_at < %s AND btrim(query) <> ''
+            ) logs
+            GROUP BY GROUPING SETS ((query, hour), (hour))
+            '''.format(**_tables()),
+            [TOTAL, tz, tz, start, end],
+        )
+        return cursor.rowcount
+
+
+def prune_search_logs(retention_days=RETENTION_DAYS, batch_size=PRUNE_BATCH_SIZE, now=None):
+    """Delete raw SearchLog rows past retention that are already rolled up; returns the count."""
+    resume = _resume_hour()
+    if resume is None:
+        return 0
+    cutoff = min((now or timezone.now()) - timedelta(days=retention_days), resume)
+    deleted = 0
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                '''
+                DELETE FROM {logs} WHERE id IN (
+                    SELECT id FROM {logs} WHERE searched_at < %s ORDER BY searched_at LIMIT %s
+                )
+                '''.format(**_tables()),
+                [cutoff, batch_size],
+            )
+            count = cursor.rowcount
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+def parse_window(params):
+    """``(since, until)`` from ``?since=`` / ``?until=`` (default: the last seven days)."""
+    try:
+        until = parse_moment(params['until'], 'until') if params.get('until') else timezone.now()
+        since = parse_moment(params['since'], 'since') if params.get('since') else until - DEFAULT_WINDOW
+    except ValueError as e:  # HistoryParamError, or anything parse_moment lets through
+        raise AnalyticsParamError(str(e))
+    if since >= until:
+        raise AnalyticsParamError("since must be before until")
+    return _hour(since), until
+
+
+def _window(since, until):
+    return SearchQueryHourly.objects.filter(hour__gte=since, hour__lt=until)
+
+
+def top_queries(since, until, limit=10, zero_results=False):
+    """The ``limit`` most searched queries in the window (or those most often finding nothing)."""
+    rows = _window(since, until).exclude(query=TOTAL).values('query').annotate(
+        total=Sum('searches'), zero=Sum('zero_results'), results=Sum('results_total'),
+    )
+    if zero_results:
+        rows = rows.filter(zero__gt=0)
+    rows = rows.order_by('-zero' if zero_results else '-total', '-total', 'query')[:limit]
+    return [
+        {
+            'query': row['query'],
+            'searches': row['total'],
+            'zero_results': row['zero'],
+            'avg_results': round(row['results'] / row['total'], 2),
+        }
+        for row in rows
+    ]
+
+
+def query_trend(since, until, interval='hour', query=None):
+    """Search and zero-result counts per ``interval`` in the window, for one query or all of them."""
+    rows = _window(since, until).filter(query=TOTAL if query is None else normalize_query(query))
+    period = F('hour') if interval == 'hour' else TruncDay('hour')
+    rows = rows.values(period=period).annotate(total=Sum('searches'), zero=Sum('zero_results')).order_by('period')
+    return [{'period': row['period'], 'searches': row['total'], 'zero_results': row['zero']} for row in rows]
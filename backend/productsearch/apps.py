@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class ProductsearchConfig(AppConfig):
     name = 'productsearch'
+
+    def ready(self):
+        # connect the autocomplete index's change-log signals
+        from . import autocomplete  # noqa: F401
+        # connect the result cache's invalidation signals
+        from . import result_cache  # noqa: F401
@@ -0,0 +1,357 @@
+"""
+In-process typeahead index for ``/api/search/autocomplete/``.
+
+Each worker keeps the catalog's names and SKUs in memory, so a lookup never
+touches the database:
+
+- ``PrefixIndex`` is immutable. Names and SKUs are concatenated into one
+  string each, with offset arrays, and ``entries`` is an ``array('Q')`` of
+  packed ``(slot, position)`` pairs, one per word start in a name plus one
+  per SKU. The entries are sorted by the casefolded text from that
+  position on, so a prefix lookup is a bisect plus a forward read of ``k``
+  entries: O(log n + k).
+- ``Overlay`` holds products changed since the index was built, in a
+  small sorted list. Lookups skip their stale rows in the index and merge
+  in the overlay's. Once it outgrows ``OVERLAY_LIMIT`` (or 5% of the
+  catalog) a background thread rebuilds the index from memory and swaps
+  it in.
+
+Writes reach every worker through a change log in the shared cache. After
+commit, Product saves and deletes, plus the catalog import (via the
+``products_imported`` signal), append their rows under the next number of
+a shared counter. Workers read the entries they haven't applied, at most
+once per ``REFRESH_SECONDS``. A hole in the log that stays unfilled for
+``GAP_GRACE_SECONDS`` (an evicted entry), or falling more than
+``MAX_CATCHUP`` entries behind, means a reload from the database. Loads
+run in a background thread, the first one included: until it finishes,
+lookups return no results instead of waiting ~10s for a million products,
+and later reloads keep serving the old index and overlay. The log is
+replayed on top of the new index once it is swapped in. ``QuerySet.update(name=...)``
+bypasses all of this, like the other Product signals.
+"""
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from productManagement.models import Product
+from productManagement.signals import products_imported
+
+
+SEQ_KEY = 'productsearch:autocomplete:seq'
+CHANGE_LOG_TIMEOUT = 60 * 60
+REFRESH_SECONDS = getattr(settings, 'AUTOCOMPLETE_REFRESH_SECONDS', 1.0)
+GAP_GRACE_SECONDS = 10
+OVERLAY_LIMIT = 20000
+# more unseen log entries than this and a reload is cheaper than replaying them
+MAX_CATCHUP = 1000
+# False loads the index inline on the first lookup (tests: a load thread
+# has its own connection and can't see their uncommitted products)
+BACKGROUND_LOAD = True
+
+# entry flag; the low 8 bits are a character position in the name (at most 255 long)
+_SKU = 1 << 8
+
+
+def normalize(text):
+    return ' '.join(text.split()).casefold()
+
+
+def _word_starts(name):
+    previous = ' '
+    for position, ch in enumerate(name):
+        if ch.isalnum() and not previous.isalnum():
+            yield position
+        previous = ch
+
+
+def _keys(name, sku):
+    """The index keys of one product, as in PrefixIndex."""
+    return [name[position:].casefold() for position in _word_starts(name)] + ([sku.casefold()] if sku else [])
+
+
+class PrefixIndex:
+    """Sorted, packed prefix index over ``(id, name, sku)`` rows."""
+    __slots__ = ('ids', 'names', 'name_offsets', 'skus', 'sku_offsets', 'entries')
+
+    def __init__(self, products=()):
+        self.ids = array('q')
+        self.name_offsets = array('Q', [0])
+        self.sku_offsets = array('Q', [0])
+        names, skus, entries = [], [], array('Q')
+        for slot, (pk, name, sku) in enumerate(products):
+            name = ' '.join(name.split())
+            self.ids.append(pk)
+            names.append(name)
+            skus.append(sku)
+            self.name_offsets.append(self.name_offsets[-1] + len(name))
+            self.sku_offsets.append(self.sku_offsets[-1] + len(sku))
+            entries.extend((slot << 9) | position for position in _word_starts(name))
+            if sku:
+                entries.append((slot << 9) | _SKU)
+        self.names = ''.join(names)
+        self.skus = ''.join(skus)
+        del names, skus
+        # sort one first-character bucket at a time, so only that bucket's
+        # keys are ever materialized (all of them at once is ~7x the index)
+        buckets = {}
+        for entry in entries:
+            buckets.setdefault(self._first(entry), array('Q')).append(entry)
+        del entries
+        self.entries = array('Q')
+        for first in sorted(buckets):
+            self.entries.extend(sorted(buckets.pop(first), key=self._key))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nbytes(self):
+        return sum(sys.getsizeof(getattr(self, name)) for name in self.__slots__)
+
+    def name(self, slot):
+        return self.names[self.name_offsets[slot]:self.name_offsets[slot + 1]]
+
+    def sku(self, slot):
+        return self.skus[self.sku_offsets[slot]:self.sku_offsets[slot + 1]]
+
+    def rows(self):
+        for slot, pk in enumerate(self.ids):
+            yield pk, self.name(slot), self.sku(slot)
+
+    def _first(self, entry):
+        slot = entry >> 9
+        if entry & _SKU:
+            return self.skus[self.sku_offsets[slot]].casefold()[:1]
+        return self.names[self.name_offsets[slot] + (entry & 0xFF)].casefold()[:1]
+
+    def _key(self, entry):
+        slot = entry >> 9
+        if entry & _SKU:
+            return self.sku(slot).casefold()
+        return self.names[self.name_offsets[slot] + (entry & 0xFF):self.name_offsets[slot + 1]].casefold()
+
+    def matches(self, prefix, skip):
+        """Yield ``(key, id, name, sku)`` for keys starting with ``prefix``, in key order."""
+        entries = self.entries
+        for i in range(bisect_left(entries, prefix, key=self._key), len(entries)):
+            key = self._key(entries[i])
+            if not key.startswith(prefix):
+                return
+            slot = entries[i] >> 9
+            pk = self.ids[slot]
+            if pk not in skip:
+                yield key, pk, self.name(slot), self.sku(slot)
+
+
+class Overlay:
+    """Products changed since the index was built: ``id -> (name, sku)``, or None once deleted."""
+
+    def __init__(self):
+        self.products = {}
+        self.entries = []  # sorted (key, id)
+
+    def __len__(self):
+        return len(self.products)
+
+    def apply(self, pk, name, sku):
+        old = self.products.get(pk)
+        if old is not None:
+            for key in _keys(*old):
+                i = bisect_left(self.entries, (key, pk))
+                if i < len(self.entries) and self.entries[i] == (key, pk):
+                    del self.entries[i]
+        self.products[pk] = None if name is None else (' '.join(name.split()), sku)
+        if name is not None:
+            for key in _keys(*self.products[pk]):
+                insort(self.entries, (key, pk))
+
+    def matches(self, prefix):
+        for i in range(bisect_left(self.entries, (prefix,)), len(self.entries)):
+            key, pk = self.entries[i]
+            if not key.startswith(prefix):
+                return
+            yield (key, pk, *self.products[pk])
+
+
+def lookup(index, overlay, prefix, limit):
+    """Top ``limit`` distinct products with a name word or SKU starting with ``prefix``."""
+    base = index.matches(prefix, overlay.products)
+    changed = overlay.matches(prefix)
+    results, seen = [], set()
+    a, b = next(base, None), next(changed, None)
+    while (a or b) and len(results) < limit:
+        if b is None or (a is not None and a[0] <= b[0]):
+            match, a = a, next(base, None)
+        else:
+            match, b = b, next(changed, None)
+        if match[1] not in seen:
+            seen.add(match[1])
+            results.append({'id': match[1], 'name': match[2], 'sku': match[3]})
+    return results
+
+
+_lock = threading.Lock()
+_state = {
+    'index': None, 'overlay': Overlay(), 'seq': 0, 'checked': 0.0, 'gap_since': None, 'rebuilding': False,
+    'reloader': None,
+}
+
+
+def _read_catalog():
+    """``(seq, index)``: the log position, then an index of every product in the database."""
+    # read the log position first: anything committed later is replayed on top
+    seq = cache.get(SEQ_KEY) or 0
+    rows = Product.objects.order_by('pk').values_list('pk', 'name', 'sku').iterator(chunk_size=10000)
+    return seq, PrefixIndex(rows)
+
+
+def _install(seq, index):
+    _state.update(index=index, overlay=Overlay(), seq=seq, gap_since=None)
+
+
+def _reloading():
+    # a thread, not a flag: a forked worker's copy of it is simply not alive
+    reloader = _state['reloader']
+    return reloader is not None and reloader.is_alive()
+
+
+def _start_reload():
+    _state['reloader'] = threading.Thread(target=_reload, name='autocomplete-reload', daemon=True)
+    _state['reloader'].start()
+
+
+def _reload():
+    """Reload the index from the database, then swap it in (lookups use the old one meanwhile)."""
+    try:
+        seq, index = _read_catalog()
+        with _lock:
+            _install(seq, index)
+            # replay what was logged while we read, on the next lookup
+            _state['checked'] = 0.0
+    finally:
+        connection.close()
+
+
+def _apply(changes):
+    overlay = _state['overlay']
+    for pk, name, sku in changes:
+        overlay.apply(pk, name, sku)
+    limit = max(OVERLAY_LIMIT, len(_state['index']) // 20)
+    if len(overlay) > limit and not _state['rebuilding']:
+        # a million products take ~10s to index; keep serving from index + overlay meanwhile
+        _state['rebuilding'] = True
+        threading.Thread(target=_rebuild, args=(_state['index'], dict(overlay.products)), daemon=True).start()
+
+
+def _rebuild(index, snapshot):
+    """Fold ``snapshot`` (an overlay's products) into a new index and swap it in."""
+    try:
+        rows = [row for row in index.rows() if row[0] not in snapshot]
+        rows += [(pk, *product) for pk, product in snapshot.items() if product is not None]
+        rows.sort()
+        rebuilt = PrefixIndex(rows)
+        with _lock:
+            if _state['index'] is not index or _reloading():
+                return  # reloaded meanwhile, or about to be
+            overlay = Overlay()
+            for pk, product in _state['overlay'].products.items():
+                # only what changed after the snapshot still needs the overlay
+                if pk not in snapshot or snapshot[pk] != product:
+                    overlay.apply(pk, *(product or (None, None)))
+            _state['index'], _state['overlay'] = rebuilt, overlay
+    finally:
+        _state['rebuilding'] = False
+
+
+def _refresh():
+    now = time.monotonic()
+    if _state['index'] is not None and now - _state['checked'] < REFRESH_SECONDS:
+        return
+    _state['checked'] = now
+    if _state['index'] is None:
+        if not BACKGROUND_LOAD:
+            _install(*_read_catalog())
+        elif not _reloading():
+            _start_reload()
+        return
+    if _reloading():
+        return
+    latest = cache.get(SEQ_KEY) or 0
+    if latest == _state['seq']:
+        return
+    # behind by too much, or the counter went backwards (the shared cache was cleared)
+    if latest < _state['seq'] or latest - _state['seq'] > MAX_CATCHUP:
+        _start_reload()
+        return
+    wanted = range(_state['seq'] + 1, latest + 1)
+    logged = cache.get_many([f'{SEQ_KEY}:{seq}' for seq in wanted])
+    for seq in wanted:
+        changes = logged.get(f'{SEQ_KEY}:{seq}')
+        if changes is None:
+            # numbered but not written yet, or evicted: wait a little, then reload
+            if _state['gap_since'] is None:
+                _state['gap_since'] = now
+            elif now - _state['gap_since'] > GAP_GRACE_SECONDS:
+                _start_reload()
+            return
+        _apply(changes)
+        _state['seq'] = seq
+        _state['gap_since'] = None
+
+
+def autocomplete(text, limit=10):
+    """Products whose name has a word, or whose SKU, starting with ``text``."""
+    prefix = normalize(text)
+    if not prefix:
+        return []
+    with _lock:
+        _refresh()
+        if _state['index'] is None:
+            return []  # still loading
+        return lookup(_state['index'], _state['overlay'], prefix, limit)
+
+
+def publish(changes):
+    """Append ``[(id, name, sku), ...]`` (name None for deletes) to the shared change log."""
+    changes = list(changes)
+    if not changes:
+        return
+    cache.add(SEQ_KEY, 0, timeout=None)
+    seq = cache.incr(SEQ_KEY)
+    cache.set(f'{SEQ_KEY}:{seq}', changes, timeout=CHANGE_LOG_TIMEOUT)
+    # this worker sees its own writes on the next lookup
+    _state['checked'] = 0.0
+
+
+def reset():
+    """Forget the local index (the next lookup starts reloading it)."""
+    with _lock:
+        _state.update(index=None, overlay=Overlay(), seq=0, checked=0.0, gap_since=None, rebuilding=False,
+                      reloader=None)
+
+
+@receiver(post_save, sender=Product)
+def _product_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not {'name', 'sku'} & set(update_fields)):
+        return
+    change = [(instance.pk, instance.name, instance.sku)]
+    transaction.on_commit(lambda: publish(change))
+
+
+@receiver(post_delete, sender=Product)
+def _product_deleted(sender, instance, **kwargs):
+    change = [(instance.pk, None, None)]
+    transaction.on_commit(lambda: publish(change))
+
+
+@receiver(products_imported)
+def _products_imported(sender, products, **kwargs):
+    change = [(p.pk, p.name, p.sku) for p in products]
+    transaction.on_commit(lambda: publish(change))
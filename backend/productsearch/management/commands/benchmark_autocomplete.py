@@ -0,0 +1,72 @@
+import random
+import resource
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from productsearch.autocomplete import Overlay, PrefixIndex, lookup, normalize
+
+from .benchmark_search import ADJECTIVES, BRANDS, NOUNS
+
+
+class Command(BaseCommand):
+    help = ('Build the autocomplete index over synthetic products in memory (no database) and report its '
+            'size, build time and lookup latency.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1_000_000)
+        parser.add_argument('--samples', type=int, default=10_000)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        count = options['products']
+        rows = [
+            (g, f'{BRANDS[g % len(BRANDS)]} {ADJECTIVES[(g // 7) % len(ADJECTIVES)]} '
+                f'{NOUNS[(g // 3) % len(NOUNS)]} {g % 997}', f'BENCH{g:07d}')
+            for g in range(1, count + 1)
+        ]
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        index = PrefixIndex(rows)
+        built = time.perf_counter() - started
+        # ru_maxrss is in KiB on Linux
+        peak = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) * 1024
+        size = index.nbytes()
+        self.stdout.write(
+            f'{count} products, {len(index.entries)} entries: built in {built:.1f}s; '
+            f'{size / 2**20:.0f} MiB held ({size / count:.0f} B/product), '
+            f'~{peak / 2**20:.0f} MiB extra peak RSS while building'
+        )
+
+        overlay = Overlay()
+        started = time.perf_counter()
+        for g in rng.sample(range(1, count + 1), 1000):
+            overlay.apply(g, f'Renamed {NOUNS[g % len(NOUNS)]} {g}', f'BENCH{g:07d}')
+        self.stdout.write(f'1000 overlay updates: {(time.perf_counter() - started) * 1e3:.1f} ms')
+
+        words = BRANDS + ADJECTIVES + NOUNS
+        shapes = {
+            '1 char': lambda: rng.choice(words)[:1],
+            '3 chars': lambda: rng.choice(words)[:3],
+            'word': lambda: rng.choice(words),
+            'two words': lambda: f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)[:2]}',
+            'sku': lambda: f'bench{rng.randint(1, count):07d}'[:9],
+            'no match': lambda: 'zzz',
+        }
+        self.stdout.write(f"{'shape':10} {'p50 us':>8} {'p99 us':>8} {'max us':>8}")
+        for name, make in shapes.items():
+            timings = []
+            for _ in range(options['samples']):
+                prefix = normalize(make())
+                started = time.perf_counter()
+                lookup(index, overlay, prefix, options['limit'])
+                timings.append((time.perf_counter() - started) * 1e6)
+            timings.sort()
+            self.stdout.write(
+                f'{name:10} {statistics.median(timings):8.1f} '
+                f'{timings[int(len(timings) * 0.99)]:8.1f} {timings[-1]:8.1f}'
+            )
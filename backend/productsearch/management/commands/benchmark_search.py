@@ -0,0 +1,105 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework.test import APIRequestFactory
+
+from productManagement.models import Category, Product
+from productsearch.views import SearchProductsAPI
+
+
+BRANDS = ['Acme', 'Zenith', 'Nordic', 'Summit', 'Apex', 'Orbit', 'Vertex', 'Harbor', 'Maple', 'Falcon',
+          'Cobalt', 'Aurora', 'Titan', 'Pioneer', 'Evergreen', 'Crescent', 'Atlas', 'Lumen', 'Sierra', 'Redwood']
+ADJECTIVES = ['Wireless', 'Stainless', 'Compact', 'Portable', 'Ergonomic', 'Organic', 'Vintage', 'Heavy Duty',
+              'Waterproof', 'Smart', 'Classic', 'Deluxe', 'Foldable', 'Rechargeable', 'Ceramic', 'Bamboo',
+              'Leather', 'Cotton', 'Magnetic', 'Adjustable', 'Insulated', 'Solar', 'Digital', 'Premium', 'Mini']
+NOUNS = ['Lamp', 'Kettle', 'Backpack', 'Headphones', 'Keyboard', 'Mouse', 'Blender', 'Toaster', 'Speaker',
+         'Charger', 'Bottle', 'Jacket', 'Sneakers', 'Watch', 'Camera', 'Tripod', 'Drill', 'Hammer', 'Wrench',
+         'Tent', 'Pillow', 'Blanket', 'Mug', 'Pan', 'Knife', 'Chair', 'Desk', 'Shelf', 'Mirror', 'Clock', 'Fan',
+         'Heater', 'Router', 'Monitor', 'Cable', 'Notebook', 'Pen', 'Umbrella', 'Wallet', 'Sunglasses']
+SKU_PREFIX = 'BENCH'
+
+
+def _typo(word, rng):
+    i = rng.randrange(1, len(word) - 1)
+    return word[:i] + word[i + 1:] if rng.random() < 0.5 else word[:i] + word[i] + word[i:]
+
+
+class Command(BaseCommand):
+    help = ('Seed synthetic products in a rolled-back transaction and report p50/p99 latency of '
+            '/api/search/ per query shape.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1_000_000)
+        parser.add_argument('--samples', type=int, default=200, help='Requests per query shape.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            categories = self._seed(options['products'])
+            shapes = self._shapes(rng, options['products'], categories)
+            self.stdout.write(f"{'shape':14} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'matches':>9}")
+            for name, params in shapes.items():
+                self._report(name, params, options['samples'], rng)
+            transaction.set_rollback(True)
+
+    def _seed(self, count):
+        started = time.monotonic()
+        categories = [c.pk for c in Category.objects.bulk_create(Category(name=f'Bench {i}') for i in range(20))]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO {products} (name, sku, category_id, price, current_stock, reorder_threshold, created_at)
+                SELECT (%s::text[])[1 + g %% %s] || ' ' || (%s::text[])[1 + (g / 7) %% %s] || ' '
+                           || (%s::text[])[1 + (g / 3) %% %s] || ' ' || (g %% 997),
+                       %s || lpad(g::text, 7, '0'),
+                       (%s::bigint[])[1 + g %% %s],
+                       1 + g %% 500, g %% 100, 5, now()
+                FROM generate_series(1, %s) AS g
+                """.format(products=connection.ops.quote_name(Product._meta.db_table)),
+                [BRANDS, len(BRANDS), ADJECTIVES, len(ADJECTIVES), NOUNS, len(NOUNS),
+                 SKU_PREFIX, categories, len(categories), count],
+            )
+            # what autovacuum would do after a bulk load: flush the GIN pending lists, refresh stats
+            for index in ('inventory_product_name_trgm', 'inventory_product_sku_trgm'):
+                cursor.execute('SELECT gin_clean_pending_list(%s::regclass)', [index])
+            for model in (Product, Category):
+                cursor.execute('ANALYZE {}'.format(connection.ops.quote_name(model._meta.db_table)))
+        self.stdout.write(f'Seeded {count} products in {time.monotonic() - started:.0f}s')
+        return categories
+
+    def _shapes(self, rng, count, categories):
+        sku = lambda: f'{SKU_PREFIX}{rng.randint(1, count):07d}'
+        return {
+            'word': lambda: {'q': rng.choice(NOUNS).lower()},
+            'phrase': lambda: {'q': f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}'},
+            'typo': lambda: {'q': _typo(rng.choice([w for w in NOUNS + ADJECTIVES if len(w) > 4]).lower(), rng)},
+            'sku_exact': lambda: {'q': sku()},
+            'sku_partial': lambda: {'q': sku()[:-2]},
+            'word+category': lambda: {'q': rng.choice(NOUNS), 'category': rng.choice(categories)},
+            'deep_page': lambda: {'q': rng.choice(NOUNS), 'offset': 900, 'limit': 100},
+        }
+
+    def _report(self, name, params, samples, rng):
+        view = SearchProductsAPI.as_view()
+        factory = APIRequestFactory(SERVER_NAME=(settings.ALLOWED_HOSTS or ['localhost'])[0].lstrip('.'))
+        for _ in range(3):
+            view(factory.get('/api/search/', params()))
+        timings, matches = [], []
+        for _ in range(samples):
+            request = factory.get('/api/search/', params())
+            started = time.perf_counter()
+            response = view(request)
+            response.render()
+            timings.append((time.perf_counter() - started) * 1000)
+            matches.append(response.data['count'])
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f'{name:14} {statistics.median(timings):8.1f} {p99:8.1f} {timings[-1]:8.1f} '
+            f'{statistics.mean(matches):9.0f}'
+        )
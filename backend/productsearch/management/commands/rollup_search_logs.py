@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from productsearch.analytics import PRUNE_BATCH_SIZE, RETENTION_DAYS, prune_search_logs, rollup_searches
+
+
+class Command(BaseCommand):
+    help = 'Roll search logs up into hourly query counts, then prune raw logs past retention.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=RETENTION_DAYS)
+        parser.add_argument('--batch-size', type=int, default=PRUNE_BATCH_SIZE)
+        parser.add_argument('--no-prune', action='store_true', help='Only roll up.')
+
+    def handle(self, *args, **options):
+        if options['retention_days'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--retention-days must be >= 0 and --batch-size >= 1.')
+        rows = rollup_searches()
+        self.stdout.write(f'Wrote {rows} hourly rollup rows')
+        if not options['no_prune']:
+            pruned = prune_search_logs(options['retention_days'], options['batch_size'])
+            self.stdout.write(f'Pruned {pruned} search logs')
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 03:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productsearch', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='searchlog',
+            name='searched_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
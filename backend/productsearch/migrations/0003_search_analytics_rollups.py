@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-18 03:19
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productsearch', '0002_searchlog_searched_at_default'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='searchlog',
+            name='searched_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='SearchQueryHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=255)),
+                ('hour', models.DateTimeField()),
+                ('searches', models.IntegerField(default=0)),
+                ('zero_results', models.IntegerField(default=0)),
+                ('results_total', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='productsearch_hourly_hour')],
+                'constraints': [models.UniqueConstraint(fields=('query', 'hour'), name='productsearch_hourly_query_hour')],
+            },
+        ),
+    ]
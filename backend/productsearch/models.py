@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from products.models import ProductForm
 from django.contrib.auth.models import User
 
@@ -6,5 +7,26 @@ class SearchLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     query = models.CharField(max_length=255)
     results_count = models.IntegerField()
-    searched_at = models.DateTimeField(auto_now_add=True)
+    # set when the search happens; the row itself is written later, in a batch (search_log.py)
+    searched_at = models.DateTimeField(default=timezone.now, db_index=True)
     product = models.ForeignKey(ProductForm, on_delete=models.CASCADE, null=True) 
+
+
+class SearchQueryHourly(models.Model):
+    """Searches per normalized query and hour, rolled up from SearchLog (see analytics.py)."""
+    # '' is the hour's total over all queries
+    query = models.CharField(max_length=255)
+    hour = models.DateTimeField()
+    searches = models.IntegerField(default=0)
+    zero_results = models.IntegerField(default=0)
+    # summed rather than averaged, so hours add up; the average is results_total / searches
+    results_total = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['query', 'hour'], name='productsearch_hourly_query_hour'),
+        ]
+        indexes = [
+            models.Index(fields=['hour'], name='productsearch_hourly_hour'),
+        ]
+
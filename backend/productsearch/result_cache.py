@@ -0,0 +1,138 @@
+"""
+Per-process cache of ranked search results for ``/api/search/``.
+
+Search traffic is skewed: a few queries make up most of the volume, and
+every miss is a trigram query over the whole catalog. Each process keeps an
+LRU of ``SEARCH_CACHE_SIZE`` pages, keyed by the case-folded query (matching
+is case-insensitive), the category filter, ``limit`` and ``offset``. A page
+is stored as its ``(id, rank)`` pairs plus the match count, in packed
+arrays, and expires after ``SEARCH_CACHE_TTL`` seconds.
+
+Keys also carry a version token from the shared cache. The token is
+replaced after commit whenever a product is created, deleted, or has its
+name, SKU or category changed (saves, deletes, the catalog import, and
+category deletes). Pages cached under the old token then miss and age out
+of the LRU. Price and stock aren't cached: a hit loads its page's rows by
+primary key. So stock movements, which are raw UPDATEs on every sale, never
+invalidate anything and are never stale.
+
+``stats()`` counts hits, misses, evictions and expirations for this
+process, to size the cache by.
+"""
+import threading
+import time
+import uuid
+from array import array
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from productManagement.models import Category, Product
+from productManagement.signals import products_imported
+
+from .search import search_products
+
+
+VERSION_KEY = 'productsearch:results:version'
+CACHE_SIZE = getattr(settings, 'SEARCH_CACHE_SIZE', 5000)
+TTL = getattr(settings, 'SEARCH_CACHE_TTL', 300)
+# saves touching only other fields (stock, price, thresholds) can't change a result page
+MATCHED_FIELDS = {'name', 'sku', 'category', 'category_id'}
+
+_entries = OrderedDict()  # key -> (expires, count, ids, ranks)
+_lock = threading.Lock()
+_counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate():
+    cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def _get(key):
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry[0] <= now:
+            del _entries[key]
+            _counters['expirations'] += 1
+            entry = None
+        if entry is None:
+            _counters['misses'] += 1
+            return None
+        _entries.move_to_end(key)
+        _counters['hits'] += 1
+        return entry[1:]
+
+
+def _put(key, count, page):
+    if CACHE_SIZE <= 0:
+        return
+    entry = (time.monotonic() + TTL, count, array('q', [p.pk for p in page]), array('d', [p.rank for p in page]))
+    with _lock:
+        _entries[key] = entry
+        _entries.move_to_end(key)
+        while len(_entries) > CACHE_SIZE:
+            _entries.popitem(last=False)
+            _counters['evictions'] += 1
+
+
+def cached_search(query, category, paginator, request):
+    """The page of ``search_products(query, category)`` that ``paginator`` would return, cached."""
+    key = (_version(), query.lower(), category, paginator.get_limit(request), paginator.get_offset(request))
+    cached = _get(key)
+    if cached is None:
+        page = paginator.paginate_queryset(search_products(query, category), request)
+        _put(key, paginator.count, page)
+        return page
+    count, ids, ranks = cached
+    paginator.restore(request, count)
+    products = Product.objects.select_related('category').in_bulk(list(ids))
+    page = []
+    for pk, rank in zip(ids, ranks):
+        product = products.get(pk)
+        if product is not None:  # deleted since, and the new token isn't out yet
+            product.rank = rank
+            page.append(product)
+    return page
+
+
+def stats():
+    with _lock:
+        return {**_counters, 'size': len(_entries), 'capacity': CACHE_SIZE, 'ttl': TTL}
+
+
+def clear():
+    """Drop this process's entries and reset its counters."""
+    with _lock:
+        _entries.clear()
+        _counters.update(hits=0, misses=0, evictions=0, expirations=0)
+
+
+@receiver(post_save, sender=Product)
+def _product_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not MATCHED_FIELDS & set(update_fields)):
+        return
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+def _deleted(sender, **kwargs):
+    transaction.on_commit(invalidate)
+
+
+@receiver(products_imported)
+def _products_imported(sender, **kwargs):
+    transaction.on_commit(invalidate)
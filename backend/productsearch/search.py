@@ -0,0 +1,59 @@
+"""
+Ranked search over the inventory catalog (``productManagement.Product``).
+
+A product matches when its name or SKU contains the query (case-insensitive)
+or its name is trigram-similar to it (pg_trgm's ``%``, so typos still match). The
+tests are served by the GIN trigram indexes on ``UPPER(name)`` and
+``UPPER(sku)``, so nothing scans the table. SKUs are only matched as
+substrings: codes share prefixes, so nearly every SKU is "similar" to any
+other. Matches are ranked by name similarity, with SKU hits boosted above
+it (an exact SKU first, then SKUs containing the query).
+
+Trigrams need three characters, so shorter queries are rejected rather than
+turned into a scan of the whole index.
+"""
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Upper
+
+from productManagement.models import Product
+
+
+MIN_QUERY_LENGTH = 3
+# similarity is at most 1, so SKU hits always outrank name-only matches
+SKU_EXACT_BOOST = 3.0
+SKU_CONTAINS_BOOST = 1.0
+
+
+class SearchQueryError(ValueError):
+    pass
+
+
+def parse_search(params):
+    """``(query, category_id or None)`` from ``?q=`` and ``?category=``."""
+    query = params.get('q', '').strip()
+    if len(query) < MIN_QUERY_LENGTH:
+        raise SearchQueryError(f"q must be at least {MIN_QUERY_LENGTH} characters")
+    category = params.get('category')
+    if category in (None, ''):
+        return query, None
+    try:
+        return query, int(category)
+    except ValueError:
+        raise SearchQueryError("category must be an integer id")
+
+
+def search_products(query, category=None):
+    """Products matching ``query``, annotated with ``rank`` and ordered by it."""
+    products = Product.objects.annotate(search_name=Upper('name')).filter(
+        Q(name__icontains=query) | Q(search_name__trigram_similar=query) | Q(sku__icontains=query)
+    )
+    if category is not None:
+        products = products.filter(category_id=category)
+    return products.select_related('category').annotate(
+        rank=TrigramSimilarity('name', query) + Case(
+            When(sku__iexact=query, then=Value(SKU_EXACT_BOOST)),
+            When(sku__icontains=query, then=Value(SKU_CONTAINS_BOOST)),
+            default=Value(0.0), output_field=FloatField(),
+        ),
+    ).order_by(F('rank').desc(), 'pk')
@@ -0,0 +1,176 @@
+"""
+Asynchronous, batched SearchLog writes.
+
+``log_search`` only puts the row on a bounded in-process queue. A daemon
+writer thread drains it with one ``bulk_create`` per batch, flushing every
+``SEARCH_LOG_FLUSH_MS`` or ``SEARCH_LOG_BATCH_SIZE`` rows, whichever comes
+first. A search never waits for the database on its log's account. When
+the queue is full the row is dropped and counted, and a batch that fails
+to insert is dropped and counted too: logging must never take search down
+with it. What is still queued at interpreter exit is flushed from
+``atexit``.
+
+Rows carry the time of the search (``searched_at`` is set when queued), and
+they are written on the writer's own connection, outside the request's
+transaction. ``SEARCH_LOG_ASYNC=False`` switches back to an inline INSERT per
+search.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .models import SearchLog
+
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = getattr(settings, 'SEARCH_LOG_QUEUE_SIZE', 10000)
+BATCH_SIZE = getattr(settings, 'SEARCH_LOG_BATCH_SIZE', 500)
+FLUSH_INTERVAL = getattr(settings, 'SEARCH_LOG_FLUSH_MS', 200) / 1000
+SHUTDOWN_TIMEOUT = 5
+
+_STOP = object()
+
+
+class SearchLogWriter:
+    """A bounded queue of unsaved SearchLog rows and the thread that saves them."""
+
+    def __init__(self, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE, interval=FLUSH_INTERVAL, background=True):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.interval = interval
+        # without a background thread rows wait in the queue for flush()
+        self.background = background
+        self.written = self.dropped = self.failed = 0
+        self._reported = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, entry):
+        """Queue ``entry`` for the writer; False (and counted) if the queue is full."""
+        self._ensure_running()
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        return True
+
+    def _running(self):
+        return self.background and self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+
+    def _ensure_running(self):
+        if not self.background or self._running():
+            return
+        with self._lock:
+            if self._running():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                # forked: the parent's queue (and its locks) came along, its thread didn't
+                self.queue = queue.Queue(maxsize=self.queue.maxsize)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='search-log-writer', daemon=True)
+            self._thread.start()
+
+    def _take(self):
+        """``(batch, stop)``: up to ``batch_size`` rows, waiting at most ``interval`` after the first."""
+        first = self.queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _write(self, batch):
+        if not batch:
+            return
+        try:
+            SearchLog.objects.bulk_create(batch)
+        except Exception:
+            logger.exception('dropped %d search logs', len(batch))
+            connection.close()
+            with self._lock:
+                self.failed += len(batch)
+        else:
+            with self._lock:
+                self.written += len(batch)
+        with self._lock:
+            dropped, self._reported = self.dropped - self._reported, self.dropped
+        if dropped:
+            logger.warning('search log queue full: dropped %d search logs', dropped)
+
+    def _run(self):
+        stop = False
+        try:
+            while not stop:
+                batch, stop = self._take()
+                # the thread's connection, recycled like a request's (CONN_MAX_AGE)
+                close_old_connections()
+                self._write(batch)
+        finally:
+            connection.close()
+
+    def flush(self, timeout=SHUTDOWN_TIMEOUT):
+        """Write everything queued so far and stop the thread (the next submit restarts it)."""
+        if self._running():
+            try:
+                self.queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                pass
+            self._thread.join(timeout)
+            self._thread = None
+            return
+        # no writer in this process (never started, or we're a fork): write here
+        batch = []
+        while True:
+            try:
+                entry = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not _STOP:
+                batch.append(entry)
+        for start in range(0, len(batch), self.batch_size):
+            self._write(batch[start:start + self.batch_size])
+
+    def stats(self):
+        with self._lock:
+            return {'queued': self.queue.qsize(), 'written': self.written,
+                    'dropped': self.dropped, 'failed': self.failed}
+
+
+writer = SearchLogWriter()
+atexit.register(writer.flush)
+
+
+def log_search(user, query, results_count):
+    """Record a search without waiting for the database (see module docstring)."""
+    entry = SearchLog(
+        user=user if user is not None and user.is_authenticated else None,
+        query=query[:SearchLog._meta.get_field('query').max_length],
+        results_count=results_count,
+        searched_at=timezone.now(),
+    )
+    if not getattr(settings, 'SEARCH_LOG_ASYNC', True):
+        entry.save()
+        return
+    writer.submit(entry)
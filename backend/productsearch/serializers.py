@@ -1,8 +1,11 @@
 from rest_framework import serializers
-from products.models import ProductForm 
+from productManagement.models import Product
 from .models import SearchLog
 
 class ProductSerializer(serializers.ModelSerializer):
+    category_name = serializers.CharField(source='category.name', default=None, read_only=True)
+    rank = serializers.FloatField(read_only=True)
+
     class Meta:
-        model = ProductForm  
-        fields = ['product_id', 'product_name', 'product_type', 'price', 'sellable', 'user']
+        model = Product
+        fields = ['id', 'sku', 'name', 'price', 'category', 'category_name', 'current_stock', 'rank']
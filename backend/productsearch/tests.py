@@ -1,3 +1,395 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from productManagement.importer import import_products, read_rows
+from productManagement.models import Category, Product
+from users.models import UserRole
+from users.page_rules import get_rule_set
+
+from productManagement.stock import adjust_stock
+
+from . import analytics, autocomplete, result_cache, search_log
+from .models import SearchLog, SearchQueryHourly
+
+
+class SearchProductsAPITest(TestCase):
+    url = '/api/search/'
+
+    def setUp(self):
+        get_rule_set()
+        self.client = APIClient()
+        # queue logs without a writer thread; flush() writes them in this transaction
+        self.log_writer = search_log.SearchLogWriter(background=False)
+        patcher = mock.patch.object(search_log, 'writer', self.log_writer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # product ids are reused across tests and on_commit never fires here
+        result_cache.clear()
+        self.tools = Category.objects.create(name='Tools')
+        self.toys = Category.objects.create(name='Toys')
+        Product.objects.create(name='Widget', sku='WID-1', price='2.00', category=self.tools)
+        Product.objects.create(name='Blue Widget Deluxe', sku='WID-2', price='3.00', category=self.toys)
+        Product.objects.create(name='Gadget', sku='GAD-1', price='4.00', category=self.tools)
+        Product.objects.create(name='Spanner', sku='WIDGET', price='5.00', category=self.tools)
+
+    def _search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_ranks_matches_with_exact_sku_first(self):
+        with self.assertNumQueries(1):  # the page with its COUNT(*) OVER (); the log is queued
+            body = self._search(q='widget')
+        self.assertEqual(body['count'], 3)
+        self.assertEqual([p['sku'] for p in body['results']], ['WIDGET', 'WID-1', 'WID-2'])
+        self.assertEqual(body['results'][1]['category_name'], 'Tools')
+        self.assertFalse(SearchLog.objects.exists())
+        self.log_writer.flush()
+        self.assertEqual(SearchLog.objects.get().results_count, 3)
+
+    def test_typos_and_sku_substrings_match(self):
+        self.assertEqual([p['sku'] for p in self._search(q='widgt')['results']], ['WID-1'])
+        self.assertEqual({p['sku'] for p in self._search(q='wid-')['results']}, {'WID-1', 'WID-2'})
+
+    def test_category_filter_and_pages(self):
+        self.assertEqual([p['sku'] for p in self._search(q='widget', category=self.toys.pk)['results']], ['WID-2'])
+        first = self._search(q='widget', limit=2)
+        self.assertEqual(first['count'], 3)
+        self.assertEqual(len(first['results']), 2)
+        self.assertIsNotNone(first['next'])
+        rest = self._search(q='widget', limit=2, offset=2)
+        self.assertEqual([p['sku'] for p in rest['results']], ['WID-2'])
+        self.assertIsNone(rest['next'])
+        self.assertEqual(self._search(q='widget', offset=10)['count'], 3)
+
+    def test_rejects_short_queries_and_bad_categories(self):
+        self.assertEqual(self.client.get(self.url, {'q': 'wi'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'q': 'widget', 'category': 'tools'}).status_code, 400)
+        self.log_writer.flush()
+        self.assertFalse(SearchLog.objects.exists())
+
+    def test_full_log_queue_drops_and_counts(self):
+        self.log_writer.queue.maxsize = 2
+        for q in ('widget', 'gadget', 'spanner'):
+            self._search(q=q)
+        self.assertEqual(self.log_writer.stats(), {'queued': 2, 'written': 0, 'dropped': 1, 'failed': 0})
+        with self.assertLogs('productsearch.search_log', 'WARNING') as logs:
+            self.log_writer.flush()
+        self.assertIn('dropped 1 search logs', logs.output[0])
+        self.assertEqual(sorted(SearchLog.objects.values_list('query', flat=True)), ['gadget', 'widget'])
+        self.assertEqual(self.log_writer.stats()['written'], 2)
+
+    def test_inline_logging_when_async_is_off(self):
+        with self.settings(SEARCH_LOG_ASYNC=False), self.assertNumQueries(2):
+            self._search(q='widget')
+        self.assertEqual(SearchLog.objects.get().query, 'widget')
+
+
+class SearchLogWriterTest(TransactionTestCase):
+    # the writer thread commits on its own connection
+    available_apps = ['productsearch']
+
+    def _entry(self, query):
+        return SearchLog(query=query, results_count=0)
+
+    def _wait_for(self, writer, written):
+        deadline = time.monotonic() + 5
+        while writer.stats()['written'] < written and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return writer.stats()['written']
+
+    def test_writes_full_batches_then_on_the_interval(self):
+        writer = search_log.SearchLogWriter(batch_size=2, interval=60)
+        self.addCleanup(writer.flush)
+        writer.submit(self._entry('one'))
+        writer.submit(self._entry('two'))
+        self.assertEqual(self._wait_for(writer, 2), 2)  # a full batch doesn't wait out the interval
+        writer.interval = 0.05
+        writer.submit(self._entry('three'))  # nor does a lone row wait for a full batch
+        writer.submit(self._entry('four'))
+        self.assertEqual(self._wait_for(writer, 4), 4)
+        self.assertEqual(SearchLog.objects.count(), 4)
+
+    def test_flush_writes_what_is_queued_and_stops_the_thread(self):
+        writer = search_log.SearchLogWriter(batch_size=100, interval=60)
+        for n in range(5):
+            writer.submit(self._entry(str(n)))
+        thread = writer._thread
+        writer.flush()
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(SearchLog.objects.count(), 5)
+        self.assertEqual(writer.stats(), {'queued': 0, 'written': 5, 'dropped': 0, 'failed': 0})
+
+
+@override_settings(SEARCH_LOG_ASYNC=False)
+class ResultCacheTest(TestCase):
+    url = '/api/search/'
+
+    def setUp(self):
+        get_rule_set()
+        self.client = APIClient()
+        self.widget = Product.objects.create(name='Widget', sku='WID-1', price='2.00', current_stock=5)
+        Product.objects.create(name='Widget Deluxe', sku='WID-2', price='3.00')
+        result_cache.clear()
+
+    def _search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_repeats_are_served_from_the_cache_with_fresh_stock(self):
+        first = self._search(q='widget')
+        adjust_stock(self.widget.pk, 7)  # stock changes don't invalidate
+        with CaptureQueriesContext(connection) as queries:
+            again = self._search(q='  WIDGET ')
+        self.assertEqual(len(queries), 2)  # the page's rows by primary key, the search log
+        self.assertNotIn('SIMILARITY', queries[0]['sql'].upper())
+        self.assertEqual(again['count'], first['count'])
+        self.assertEqual([(p['id'], p['rank']) for p in again['results']], [(p['id'], p['rank']) for p in first['results']])
+        self.assertEqual(again['results'][0]['current_stock'], 12)
+        self.assertEqual(result_cache.stats()['hits'], 1)
+        self._search(q='widget', limit=1)  # another page is another entry
+        self.assertEqual(result_cache.stats()['misses'], 2)
+
+    def test_product_changes_invalidate(self):
+        self._search(q='widget')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.widget.name = 'Sprocket'
+            self.widget.save()
+        self.assertEqual([p['sku'] for p in self._search(q='widget')['results']], ['WID-2'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.widget.current_stock = 1
+            self.widget.save(update_fields=['current_stock'])
+        self._search(q='widget')
+        self.assertEqual(result_cache.stats()['hits'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            list(import_products(read_rows(['sku,name,price', 'WID-3,Widget Mini,1.00'], 'csv')))
+        self.assertEqual(self._search(q='widget')['count'], 2)
+        self.assertEqual(result_cache.stats()['misses'], 3)
+
+    def test_lru_bound_and_ttl(self):
+        with mock.patch.object(result_cache, 'CACHE_SIZE', 2):
+            for q in ('widget', 'deluxe', 'widget', 'gadget', 'deluxe'):
+                self._search(q=q)
+        self.assertEqual(result_cache.stats(), {
+            'hits': 1, 'misses': 4, 'evictions': 2, 'expirations': 0, 'size': 2, 'capacity': 5000, 'ttl': 300,
+        })
+        with mock.patch.object(result_cache, 'TTL', 0):
+            self._search(q='lamp')
+            self._search(q='lamp')
+        self.assertEqual(result_cache.stats()['expirations'], 1)
+
+    def test_stats_api(self):
+        employee = User.objects.create_user('analyst', password='pw')
+        UserRole.objects.create(user=employee, role='employee')
+        self._search(q='widget')
+        self.client.force_authenticate(employee)
+        body = self.client.get('/api/search/cache/').json()
+        self.assertEqual((body['misses'], body['size']), (1, 1))
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/search/cache/').status_code, 401)
+
+
+class AutocompleteTest(TestCase):
+    url = '/api/search/autocomplete/'
+
+    def setUp(self):
+        get_rule_set()
+        self.client = APIClient()
+        self.lamp = Product.objects.create(name='Acme  Desk Lamp', sku='LAMP-1', price='20.00')
+        self.kettle = Product.objects.create(name='Steel Kettle', sku='KT-9', price='30.00')
+        Product.objects.create(name='Lampshade', sku='SHADE-1', price='5.00')
+        autocomplete.reset()
+        # load inline: a load thread couldn't see the products created above
+        patcher = mock.patch.object(autocomplete, 'BACKGROUND_LOAD', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _names(self, q, **params):
+        response = self.client.get(self.url, {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [p['name'] for p in response.json()['results']]
+
+    def test_prefix_matches_any_name_word_or_the_sku(self):
+        with self.assertNumQueries(1):  # loading the index
+            self.assertEqual(self._names('lamp'), ['Acme Desk Lamp', 'Lampshade'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self._names('DESK l'), ['Acme Desk Lamp'])
+            self.assertEqual(self._names('kt-'), ['Steel Kettle'])
+            self.assertEqual(self._names('lamp', limit=1), ['Acme Desk Lamp'])
+            self.assertEqual(self._names('zebra'), [])
+            self.assertEqual(self._names(' '), [])
+
+    def test_saves_deletes_and_imports_reach_the_index_without_queries(self):
+        self._names('lamp')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.kettle.name = 'Lamp Oil'
+            self.kettle.save()
+            self.lamp.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            list(import_products(read_rows(['sku,name,price', 'LAMP-2,Lamp Post,9.99'], 'csv')))
+        with self.assertNumQueries(0):
+            self.assertEqual(self._names('lamp'), ['Lamp Oil', 'Lamp Post', 'Lampshade'])
+            self.assertEqual(self._names('steel'), [])
+
+    def test_rebuild_keeps_changes_made_while_it_ran(self):
+        self._names('lamp')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.kettle.name = 'Lamp Oil'
+            self.kettle.save()
+        self._names('lamp')
+        state = autocomplete._state
+        snapshot = dict(state['overlay'].products)
+        state['overlay'].apply(self.lamp.pk, None, None)  # arrives during the rebuild
+        autocomplete._rebuild(state['index'], snapshot)
+        self.assertEqual(list(state['overlay'].products), [self.lamp.pk])
+        self.assertEqual(self._names('lamp'), ['Lamp Oil', 'Lampshade'])
+
+    def test_bad_limit(self):
+        self.assertEqual(self.client.get(self.url, {'q': 'la', 'limit': 'ten'}).status_code, 400)
+
+
+class AutocompleteReloadTest(TransactionTestCase):
+    # the reload reads the catalog on its own connection
+    available_apps = ['productManagement', 'productsearch']
+
+    def test_reload_runs_in_the_background_and_catches_up(self):
+        Product.objects.create(name='Desk Lamp', sku='LAMP-1', price='20.00')
+        autocomplete.reset()
+        self.addCleanup(autocomplete.reset)
+        # the first lookup starts the load and doesn't wait for it
+        with self.assertNumQueries(0):
+            self.assertEqual(autocomplete.autocomplete('lamp'), [])
+        autocomplete._state['reloader'].join(5)
+        self.assertEqual([p['name'] for p in autocomplete.autocomplete('lamp')], ['Desk Lamp'])
+
+        release = threading.Event()
+        read_catalog = autocomplete._read_catalog
+
+        def slow_read():
+            release.wait(5)
+            return read_catalog()
+
+        with mock.patch.object(autocomplete, 'MAX_CATCHUP', 1), \
+                mock.patch.object(autocomplete, '_read_catalog', slow_read):
+            for i in range(3):
+                Product.objects.create(name=f'Lamp {i}', sku=f'LAMP-{i + 2}', price='1.00')
+            # too far behind to replay: the old index answers while the reload runs
+            with self.assertNumQueries(0):
+                self.assertEqual([p['name'] for p in autocomplete.autocomplete('lamp')], ['Desk Lamp'])
+            self.assertTrue(autocomplete._reloading())
+            release.set()
+            autocomplete._state['reloader'].join(5)
+        # the new index follows the log again from where it was read
+        Product.objects.create(name='Lamp Post', sku='POST-1', price='1.00')
+        self.assertEqual(
+            [p['name'] for p in autocomplete.autocomplete('lamp')],
+            ['Desk Lamp', 'Lamp 0', 'Lamp 1', 'Lamp 2', 'Lamp Post'],
+        )
+
+
+class SearchAnalyticsTest(TestCase):
+    def setUp(self):
+        get_rule_set()
+        self.client = APIClient()
+        self.hour = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=3)
+        self._log('Lamp', 4, minutes=5)
+        self._log('  lamp ', 0, minutes=40)
+        self._log('desk   LAMP', 2, minutes=50)
+        self._log('lamp', 6, minutes=70)
+        self._log('zebra', 0, minutes=75)
+
+    def _log(self, query, results_count, minutes):
+        return SearchLog.objects.create(
+            query=query, results_count=results_count, searched_at=self.hour + timedelta(minutes=minutes),
+        )
+
+    def _rollups(self):
+        return {
+            (row.query, row.hour - self.hour): (row.searches, row.zero_results, row.results_total)
+            for row in SearchQueryHourly.objects.all()
+        }
+
+    def test_rolls_up_per_normalized_query_and_hour(self):
+        self._log('   ', 0, minutes=20)  # blank: not rolled up
+        self.assertEqual(analytics.rollup_searches(), 6)
+        self.assertEqual(self._rollups(), {
+            ('lamp', timedelta(0)): (2, 1, 4),
+            ('desk lamp', timedelta(0)): (1, 0, 2),
+            (analytics.TOTAL, timedelta(0)): (3, 1, 6),
+            ('lamp', timedelta(hours=1)): (1, 0, 6),
+            ('zebra', timedelta(hours=1)): (1, 1, 0),
+            (analytics.TOTAL, timedelta(hours=1)): (2, 1, 6),
+        })
+
+    def test_reruns_are_idempotent_and_pick_up_late_rows(self):
+        analytics.rollup_searches()
+        self._log('LAMP', 1, minutes=10)  # written late by the batched writer
+        self._log('lamp', 3, minutes=130)
+        analytics.rollup_searches()
+        rollups = self._rollups()
+        self.assertEqual(rollups[('lamp', timedelta(0))], (3, 1, 5))
+        self.assertEqual(rollups[('lamp', timedelta(hours=2))], (1, 0, 3))
+        self.assertEqual(rollups[(analytics.TOTAL, timedelta(0))], (4, 1, 7))
+        self.assertEqual(len(rollups), 8)
+
+    def test_prunes_only_rolled_up_logs_past_retention(self):
+        later = self.hour + timedelta(days=3)
+        self.assertEqual(analytics.prune_search_logs(retention_days=1, now=later), 0)  # nothing rolled up yet
+        analytics.rollup_searches()
+        # the latest rolled-up hour and the one before it are recomputed next time, so they stay
+        self.assertEqual(analytics.prune_search_logs(retention_days=1, now=later), 0)
+        self._log('recent', 1, minutes=60 * 24 * 3)
+        analytics.rollup_searches(now=later)
+        self.assertEqual(analytics.prune_search_logs(retention_days=1, now=later, batch_size=2), 5)
+        self.assertEqual(list(SearchLog.objects.values_list('query', flat=True)), ['recent'])
+        self.assertEqual(SearchQueryHourly.objects.filter(query='lamp').count(), 2)
+
+    def test_command_rolls_up_and_prunes(self):
+        call_command('rollup_search_logs', retention_days=0, stdout=mock.Mock())
+        self.assertEqual(SearchQueryHourly.objects.count(), 6)
+        self.assertEqual(SearchLog.objects.count(), 5)  # all within the hours still being recomputed
+
+    def test_top_and_trend_api(self):
+        analytics.rollup_searches()
+        employee = User.objects.create_user('analyst', password='pw')
+        UserRole.objects.create(user=employee, role='employee')
+        self.client.force_authenticate(employee)
+
+        top = self.client.get('/api/search/analytics/top/').json()['results']
+        self.assertEqual(top[0], {'query': 'lamp', 'searches': 3, 'zero_results': 1, 'avg_results': 3.33})
+        self.assertEqual([row['query'] for row in top], ['lamp', 'desk lamp', 'zebra'])
+        zero = self.client.get('/api/search/analytics/top/', {'zero_results': 'true', 'limit': 1}).json()['results']
+        self.assertEqual([row['query'] for row in zero], ['lamp'])
+
+        trend = self.client.get('/api/search/analytics/trend/', {'query': 'LAMP'}).json()['results']
+        self.assertEqual([(row['searches'], row['zero_results']) for row in trend], [(2, 1), (1, 0)])
+        daily = self.client.get('/api/search/analytics/trend/', {'interval': 'day'}).json()['results']
+        self.assertEqual(sum(row['searches'] for row in daily), 5)
+
+        self.assertEqual(self.client.get('/api/search/analytics/trend/', {'interval': 'week'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/search/analytics/top/', {'since': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/search/analytics/top/', {'limit': 'ten'}).status_code, 400)
+        for url in ('/api/search/analytics/top/', '/api/search/analytics/trend/'):
+            response = self.client.get(url, {'since': '2024-02-30'})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('since', response.json()['error'])
+
+    def test_analytics_are_for_employees(self):
+        customer = User.objects.create_user('customer', password='pw')
+        UserRole.objects.create(user=customer, role='user')
+        self.client.force_authenticate(customer)
+        self.assertEqual(self.client.get('/api/search/analytics/top/').status_code, 403)
+        self.client.force_authenticate(None)
+        for url in ('/api/search/analytics/top/', '/api/search/analytics/trend/'):
+            self.assertEqual(self.client.get(url).status_code, 401)
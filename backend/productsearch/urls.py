@@ -1,6 +1,10 @@
 from django.urls import path
-from .views import SearchProductsAPI
+from .views import AutocompleteAPI, SearchCacheStatsAPI, SearchProductsAPI, SearchTrendAPI, TopSearchesAPI
 
 urlpatterns = [
     path('search/', SearchProductsAPI.as_view()),
+    path('search/autocomplete/', AutocompleteAPI.as_view()),
+    path('search/analytics/top/', TopSearchesAPI.as_view()),
+    path('search/analytics/trend/', SearchTrendAPI.as_view()),
+    path('search/cache/', SearchCacheStatsAPI.as_view()),
 ]
@@ -1,23 +1,97 @@
+import os
+
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from .models import SearchLog
+from rest_framework import status
+from ecombackend.pagination import WindowCountPagination
+from users.permissions import IsEmployee
+from .analytics import INTERVALS, MAX_TOP, AnalyticsParamError, parse_window, query_trend, top_queries
+from .autocomplete import autocomplete
+from .result_cache import cached_search, stats
+from .search import SearchQueryError, parse_search
+from .search_log import log_search
 from .serializers import ProductSerializer
 
 
 class SearchProductsAPI(APIView):
+    """Ranked catalog search: ``?q=`` (at least 3 characters), ``?category=<id>``, ``?limit=`` / ``?offset=``."""
+
+    def get(self, request):
+        try:
+            keyword, category = parse_search(request.GET)
+        except SearchQueryError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = WindowCountPagination()
+        page = cached_search(keyword, category, paginator, request)
+
+        log_search(request.user, keyword, paginator.count)
+
+        serializer = ProductSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class AutocompleteAPI(APIView):
+    """Typeahead from the in-process index: ``?q=`` prefix, ``?limit=`` (default 10, at most 50)."""
+    max_limit = 50
+
     def get(self, request):
-        keyword = request.GET.get("q", "")
-        
-        
-        from products.models import Product
+        try:
+            limit = int(request.GET.get("limit", 10))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, self.max_limit))
+        return Response({"results": autocomplete(request.GET.get("q", ""), limit)})
 
-        results = Product.objects.filter(name__icontains=keyword)
 
-        SearchLog.objects.create(
-            user=request.user if request.user.is_authenticated else None,
-            query=keyword,
-            results_count=results.count()
-        )
+class TopSearchesAPI(APIView):
+    """Top queries from the hourly rollups: ``?since=`` / ``?until=``, ``?limit=``, ``?zero_results=true``."""
+    permission_classes = [IsAuthenticated, IsEmployee]
 
-        serializer = ProductSerializer(results, many=True)
-        return Response(serializer.data)
+    def get(self, request):
+        try:
+            since, until = parse_window(request.GET)
+        except AnalyticsParamError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.GET.get("limit", 10))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, MAX_TOP))
+        zero_results = request.GET.get("zero_results", "").lower() in ("1", "true")
+        return Response({
+            "since": since,
+            "until": until,
+            "results": top_queries(since, until, limit, zero_results),
+        })
+
+
+class SearchTrendAPI(APIView):
+    """Search volume per ``?interval=hour|day`` from the hourly rollups, for one ``?query=`` or all."""
+    permission_classes = [IsAuthenticated, IsEmployee]
+
+    def get(self, request):
+        interval = request.GET.get("interval", "hour")
+        if interval not in INTERVALS:
+            return Response({"error": f"interval must be one of: {', '.join(INTERVALS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            since, until = parse_window(request.GET)
+        except AnalyticsParamError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        query = request.GET.get("query") or None
+        return Response({
+            "since": since,
+            "until": until,
+            "interval": interval,
+            "results": query_trend(since, until, interval, query),
+        })
+
+
+class SearchCacheStatsAPI(APIView):
+    """Hit, miss and eviction counters of the search result cache, for the worker that answers."""
+    permission_classes = [IsAuthenticated, IsEmployee]
+
+    def get(self, request):
+        return Response({"pid": os.getpid(), **stats()})
@@ -5,4 +5,5 @@ class UsersConfig(AppConfig):
     name = 'users'
 
     def ready(self):
-        pass
+        # connect PagePermission cache invalidation signals
+        from . import page_rules  # noqa: F401
@@ -0,0 +1,110 @@
+import random
+import time
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseForbidden
+from django.test import RequestFactory
+
+from users.middleware import PagePermissionMiddleware
+from users.models import PagePermission, UserRole
+
+
+class _Rollback(Exception):
+    pass
+
+
+def legacy_page_permission_check(request):
+    """The per-request query loop PagePermissionMiddleware used before rule compilation."""
+    path = request.path
+    for p in PagePermission.objects.filter(active=True):
+        try:
+            if p.prefix:
+                match = path.startswith(p.path)
+            else:
+                match = path == p.path
+            if not match:
+                continue
+            user = request.user
+            if user and user.is_authenticated:
+                if p.allowed_users.filter(id=user.id).exists():
+                    return None
+                try:
+                    user_role = getattr(user, 'userrole').role
+                except Exception:
+                    user_role = 'user'
+                if user.is_superuser or user_role in p.allowed_roles_list():
+                    return None
+            return HttpResponseForbidden('You do not have permission to access this page')
+        except Exception:
+            continue
+    return None
+
+
+class Command(BaseCommand):
+    help = 'Benchmark PagePermissionMiddleware (legacy query loop vs compiled rules). All data is rolled back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rules', type=int, default=1000)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _run(self, options):
+        rng = random.Random(options['seed'])
+        n_rules = options['rules']
+        n_requests = options['requests']
+
+        users = [User.objects.create(username=f'bench_pp_{i}') for i in range(20)]
+        for i, u in enumerate(users):
+            UserRole.objects.create(user=u, role=('employee', 'user', 'admin')[i % 3])
+
+        perms = PagePermission.objects.bulk_create([
+            PagePermission(
+                name=f'rule {i}',
+                path=f'/api/bench/{i}/' if i % 2 else f'/api/bench/{i}/detail/',
+                prefix=bool(i % 2),
+                allowed_roles='admin,superemployee' if i % 3 else 'employee',
+            )
+            for i in range(n_rules)
+        ])
+        through = PagePermission.allowed_users.through
+        through.objects.bulk_create([
+            through(pagepermission_id=p.id, user_id=rng.choice(users).id)
+            for p in perms[::5]
+        ])
+
+        factory = RequestFactory()
+        reqs = []
+        for _ in range(n_requests):
+            i = rng.randrange(n_rules * 2)
+            path = f'/api/bench/{i}/detail/' if i < n_rules else f'/api/other/{i}/'
+            req = factory.get(path)
+            req.user = rng.choice(users + [AnonymousUser()])
+            reqs.append(req)
+
+        ok = lambda request: HttpResponse('ok')
+        middleware = PagePermissionMiddleware(ok)
+        middleware(reqs[0])  # compile outside the timed loop
+
+        legacy = self._time(lambda r: legacy_page_permission_check(r) or ok(r), reqs)
+        compiled = self._time(middleware, reqs)
+
+        self.stdout.write(f'rules={n_rules} requests={n_requests}')
+        self.stdout.write(f'legacy:   {n_requests / legacy:10.1f} req/s')
+        self.stdout.write(f'compiled: {n_requests / compiled:10.1f} req/s')
+        self.stdout.write(f'speedup:  {legacy / compiled:10.1f}x')
+
+    def _time(self, handler, reqs):
+        start = time.perf_counter()
+        for req in reqs:
+            handler(req)
+        return time.perf_counter() - start
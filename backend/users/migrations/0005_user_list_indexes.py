@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_pagepermission'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userrole',
+            index=models.Index(fields=['role', 'user'], name='users_role_user_idx'),
+        ),
+        # auth_user belongs to contrib.auth, so the prefix indexes for the
+        # admin user list's ?q= filter are created here. They match the
+        # UPPER(col) LIKE 'X%' that istartswith compiles to on Postgres.
+        migrations.RunSQL(
+            sql=[
+                'CREATE INDEX IF NOT EXISTS users_auth_user_username_prefix '
+                'ON auth_user (UPPER(username) text_pattern_ops) INCLUDE (id)',
+                'CREATE INDEX IF NOT EXISTS users_auth_user_email_prefix '
+                'ON auth_user (UPPER(email) text_pattern_ops) INCLUDE (id)',
+            ],
+            reverse_sql=[
+                'DROP INDEX IF EXISTS users_auth_user_username_prefix',
+                'DROP INDEX IF EXISTS users_auth_user_email_prefix',
+            ],
+        ),
+    ]
@@ -16,6 +16,12 @@ class UserRole(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='user')
 
+    class Meta:
+        indexes = [
+            # role filter on the admin user list; user_id rides along for the join
+            models.Index(fields=['role', 'user'], name='users_role_user_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} ({self.role})"
 
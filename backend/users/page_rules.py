@@ -0,0 +1,193 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import PagePermission, UserRole
+
+
+VERSION_CACHE_KEY = 'users:page_rules:version'
+ROLES_VERSION_CACHE_KEY = 'users:page_rules:roles_version'
+# how long a worker trusts its compiled rules before re-reading the shared version
+RECHECK_SECONDS = getattr(settings, 'PAGE_RULES_RECHECK_SECONDS', 1.0)
+# roles remembered per worker; the map is dropped when it fills up or any role changes
+ROLE_CACHE_SIZE = 10000
+
+
+class CompiledRule:
+    """A single active PagePermission with its allowed users/roles preloaded."""
+    __slots__ = ('order', 'pk', 'user_ids', 'roles')
+
+    def __init__(self, order, pk, user_ids, roles):
+        self.order = order
+        self.pk = pk
+        self.user_ids = frozenset(user_ids)
+        self.roles = frozenset(roles)
+
+    def allows(self, user):
+        if not user or not user.is_authenticated:
+            return False
+        if user.id in self.user_ids or user.is_superuser:
+            return True
+        if not self.roles:
+            return False
+        return role_of(user) in self.roles
+
+
+class _TrieNode:
+    __slots__ = ('children', 'rule')
+
+    def __init__(self):
+        self.children = {}
+        self.rule = None
+
+
+class PageRuleSet:
+    """In-memory matcher: exact paths in a dict, prefix paths in a char trie.
+
+    When several rules match a path, the one that comes first in primary key
+    order wins, which is the order the middleware used to walk them in.
+    """
+
+    def __init__(self, rules=()):
+        self.exact = {}
+        self.root = _TrieNode()
+        self.size = 0
+        for path, prefix, rule in rules:
+            self.add(path, prefix, rule)
+
+    def add(self, path, prefix, rule):
+        self.size += 1
+        if not prefix:
+            current = self.exact.get(path)
+            if current is None or rule.order < current.order:
+                self.exact[path] = rule
+            return
+        node = self.root
+        for ch in path:
+            node = node.children.setdefault(ch, _TrieNode())
+        if node.rule is None or rule.order < node.rule.order:
+            node.rule = rule
+
+    def match(self, path):
+        """Return the winning rule for ``path`` or None."""
+        best = self.exact.get(path)
+        node = self.root
+        if node.rule is not None and (best is None or node.rule.order < best.order):
+            best = node.rule
+        for ch in path:
+            node = node.children.get(ch)
+            if node is None:
+                break
+            if node.rule is not None and (best is None or node.rule.order < best.order):
+                best = node.rule
+        return best
+
+    def is_allowed(self, path, user):
+        rule = self.match(path)
+        return rule is None or rule.allows(user)
+
+
+def build_rule_set():
+    """Load all active PagePermission rows (two queries) into a PageRuleSet."""
+    perms = list(
+        PagePermission.objects.filter(active=True)
+        .order_by('id')
+        .values_list('id', 'path', 'prefix', 'allowed_roles')
+    )
+    through = PagePermission.allowed_users.through
+    users_by_perm = {}
+    for perm_id, user_id in through.objects.filter(
+        pagepermission__active=True
+    ).values_list('pagepermission_id', 'user_id'):
+        users_by_perm.setdefault(perm_id, []).append(user_id)
+
+    rules = []
+    for order, (pk, path, prefix, allowed_roles) in enumerate(perms):
+        roles = [r.strip() for r in (allowed_roles or '').split(',') if r.strip()]
+        rules.append((path, prefix, CompiledRule(order, pk, users_by_perm.get(pk, ()), roles)))
+    return PageRuleSet(rules)
+
+
+_compiled = {'version': None, 'rules': None, 'checked': 0.0, 'roles_version': None, 'roles': {}}
+
+
+def role_of(user):
+    """``user``'s UserRole role ('user' without one), remembered until a role changes."""
+    roles = _compiled['roles']
+    role = roles.get(user.id)
+    if role is None:
+        role = UserRole.objects.filter(user_id=user.id).values_list('role', flat=True).first() or 'user'
+        if len(roles) >= ROLE_CACHE_SIZE:
+            roles.clear()
+        roles[user.id] = role
+    return role
+
+
+def get_rule_set():
+    """Return the process-local compiled rules, rebuilding if the shared version moved.
+
+    The shared version is only read every ``RECHECK_SECONDS``, so other
+    workers pick up a change within that long; this one sees its own at once.
+    """
+    now = time.monotonic()
+    if _compiled['rules'] is not None and now - _compiled['checked'] < RECHECK_SECONDS:
+        return _compiled['rules']
+    versions = cache.get_many([VERSION_CACHE_KEY, ROLES_VERSION_CACHE_KEY])
+    for key in (VERSION_CACHE_KEY, ROLES_VERSION_CACHE_KEY):
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            versions[key] = cache.get(key)
+    if _compiled['rules'] is None or _compiled['version'] != versions[VERSION_CACHE_KEY]:
+        _compiled.update(rules=build_rule_set(), version=versions[VERSION_CACHE_KEY])
+    if _compiled['roles_version'] != versions[ROLES_VERSION_CACHE_KEY]:
+        _compiled.update(roles={}, roles_version=versions[ROLES_VERSION_CACHE_KEY])
+    _compiled['checked'] = now
+    return _compiled['rules']
+
+
+def invalidate_rule_set():
+    """Drop the local compiled rules, and bump the shared version for other workers on commit.
+
+    A bump before commit would let another worker rebuild from the old rows
+    and keep them under the new version.
+    """
+    _compiled['rules'] = None
+    transaction.on_commit(_bump_rule_set_version)
+
+
+def _bump_rule_set_version():
+    # again: a lookup while the transaction was open may have rebuilt without the change
+    _compiled['rules'] = None
+    cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+
+
+@receiver(post_save, sender=PagePermission)
+@receiver(post_delete, sender=PagePermission)
+def _page_permission_changed(sender, **kwargs):
+    invalidate_rule_set()
+
+
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+def _user_role_changed(sender, instance, **kwargs):
+    # forgotten here at once; other workers drop their roles at their next recheck
+    _compiled['roles'].pop(instance.user_id, None)
+    user_id = instance.user_id
+
+    def bump():
+        _compiled['roles'].pop(user_id, None)
+        cache.set(ROLES_VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+
+    # like the rule set, only once the new role is visible to other workers
+    transaction.on_commit(bump)
+
+
+@receiver(m2m_changed, sender=PagePermission.allowed_users.through)
+def _page_permission_users_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_rule_set()
@@ -1,3 +1,129 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser, User
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from rest_framework.test import APIClient
+
+from . import page_rules
+from .middleware import PagePermissionMiddleware
+from .models import PagePermission, UserRole
+from .page_rules import invalidate_rule_set
+
+
+class PagePermissionMiddlewareTest(TestCase):
+    def setUp(self):
+        invalidate_rule_set()
+        self.factory = RequestFactory()
+        self.middleware = PagePermissionMiddleware(lambda request: HttpResponse('ok'))
+        self.employee = User.objects.create(username='emp')
+        UserRole.objects.create(user=self.employee, role='employee')
+        self.customer = User.objects.create(username='cust')
+        UserRole.objects.create(user=self.customer, role='user')
+
+    def _status(self, path, user):
+        request = self.factory.get(path)
+        request.user = user
+        return self.middleware(request).status_code
+
+    def test_prefix_and_exact_rules(self):
+        PagePermission.objects.create(name='admin', path='/api/admin/', prefix=True, allowed_roles='employee')
+        PagePermission.objects.create(name='report', path='/api/report/', prefix=False, allowed_roles='admin')
+        self.assertEqual(self._status('/api/admin/users/', self.employee), 200)
+        self.assertEqual(self._status('/api/admin/users/', self.customer), 403)
+        self.assertEqual(self._status('/api/admin/users/', AnonymousUser()), 403)
+        self.assertEqual(self._status('/api/report/', self.employee), 403)
+        self.assertEqual(self._status('/api/report/extra/', self.employee), 200)
+        self.assertEqual(self._status('/api/other/', self.customer), 200)
+
+    def test_first_matching_rule_wins(self):
+        PagePermission.objects.create(name='wide', path='/api/', prefix=True, allowed_roles='user')
+        PagePermission.objects.create(name='narrow', path='/api/secret/', prefix=True, allowed_roles='admin')
+        self.assertEqual(self._status('/api/secret/x/', self.customer), 200)
+
+    def test_allowed_users_change_invalidates_rules(self):
+        perm = PagePermission.objects.create(name='vip', path='/api/vip/', prefix=True, allowed_roles='')
+        self.assertEqual(self._status('/api/vip/', self.customer), 403)
+        perm.allowed_users.add(self.customer)
+        self.assertEqual(self._status('/api/vip/', self.customer), 200)
+        perm.active = False
+        perm.save()
+        self.assertEqual(self._status('/api/vip/', self.employee), 200)
+
+    def test_matching_runs_no_queries_once_compiled(self):
+        perm = PagePermission.objects.create(name='vip', path='/api/vip/', prefix=True, allowed_roles='admin')
+        perm.allowed_users.add(self.customer)
+        self._status('/api/vip/', self.customer)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._status('/api/vip/', self.customer), 200)
+            self.assertEqual(self._status('/api/open/', self.employee), 200)
+
+    def test_roles_are_loaded_once_per_user(self):
+        PagePermission.objects.create(name='staff', path='/api/staff/', prefix=True, allowed_roles='employee')
+        self.assertEqual(self._status('/api/staff/', User.objects.get(pk=self.employee.pk)), 200)
+        # a fresh user object each request, as the auth middleware hands over
+        user = User.objects.get(pk=self.employee.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._status('/api/staff/', user), 200)
+        role = self.employee.userrole
+        role.role = 'user'
+        role.save()
+        self.assertEqual(self._status('/api/staff/', User.objects.get(pk=self.employee.pk)), 403)
+
+    def test_shared_version_is_rechecked_periodically(self):
+        self._status('/api/open/', self.customer)
+        with mock.patch.object(page_rules.cache, 'get_many', wraps=page_rules.cache.get_many) as get_many:
+            self._status('/api/open/', self.customer)
+            get_many.assert_not_called()
+            with mock.patch.object(page_rules, 'RECHECK_SECONDS', 0):
+                self._status('/api/open/', self.customer)
+            get_many.assert_called_once()
+
+    def test_shared_version_moves_only_on_commit(self):
+        self._status('/api/open/', self.customer)
+        version = page_rules.cache.get(page_rules.VERSION_CACHE_KEY)
+        with self.captureOnCommitCallbacks() as callbacks:
+            PagePermission.objects.create(name='vip', path='/api/vip/', prefix=True, allowed_roles='admin')
+            # this worker sees its own change at once, others only after the commit
+            self.assertEqual(self._status('/api/vip/', self.customer), 403)
+            self.assertEqual(page_rules.cache.get(page_rules.VERSION_CACHE_KEY), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(page_rules.cache.get(page_rules.VERSION_CACHE_KEY), version)
+
+
+class UsersListViewTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create(username='root', email='root@example.com', is_staff=True)
+        UserRole.objects.create(user=self.admin, role='admin')
+        for i in range(5):
+            user = User.objects.create(username=f'emp{i}', email=f'staff{i}@example.com')
+            UserRole.objects.create(user=user, role='employee')
+        # no UserRole row: listed as a plain user
+        User.objects.create(username='Alice', email='alice@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _list(self, **params):
+        response = self.client.get('/api/users/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_page_is_one_query(self):
+        with self.assertNumQueries(1):
+            self._list()
+        for i in range(20):
+            User.objects.create(username=f'more{i}')
+        with self.assertNumQueries(1):
+            rows = self._list()
+        self.assertEqual(len(rows), 27)
+
+    def test_filters_by_role(self):
+        self.assertEqual({r['username'] for r in self._list(role='employee')}, {f'emp{i}' for i in range(5)})
+        self.assertEqual([r['username'] for r in self._list(role='user')], ['Alice'])
+        self.assertEqual(self.client.get('/api/users/', {'role': 'owner'}).status_code, 400)
+
+    def test_filters_by_username_or_email_prefix(self):
+        self.assertEqual([r['username'] for r in self._list(q='ali')], ['Alice'])
+        self.assertEqual(len(self._list(q='STAFF')), 5)
+        self.assertEqual([r['role'] for r in self._list(q='emp', role='employee', page_size=2)], ['employee'] * 2)
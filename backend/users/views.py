@@ -2,6 +2,7 @@ import os
 import requests
 from dotenv import load_dotenv
 from django.contrib.auth.models import User
+from django.db.models import Q
 from django.shortcuts import redirect
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -14,6 +15,7 @@ from rest_framework.permissions import IsAdminUser
 from rest_framework.decorators import permission_classes
 from rest_framework import generics
 from django.contrib.auth.models import User
+from ecombackend.pagination import NewestIdPagination
 
 load_dotenv()
 
@@ -413,24 +415,39 @@ class EmailTokenObtainPairView(APIView):
 
 
 class UsersListView(APIView):
-    """List all users (admin only)"""
+    """List all users (admin only)
+
+    Optional filters: ``?role=`` and ``?q=`` (case-insensitive prefix of the
+    username or email). Role and profile are joined in, so a page is one query.
+    """
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        users = User.objects.all().select_related()
+        users = User.objects.select_related('userrole', 'userprofile').only(
+            'id', 'username', 'email', 'userrole__role', 'userprofile__avatar',
+        )
+        role = request.query_params.get('role')
+        if role:
+            if role not in dict(UserRole.ROLE_CHOICES):
+                return Response({'error': 'Invalid role'}, status=status.HTTP_400_BAD_REQUEST)
+            match = Q(userrole__role=role)
+            if role == 'user':
+                # users without a UserRole row are listed as plain users
+                match |= Q(userrole__isnull=True)
+            users = users.filter(match)
+        q = request.query_params.get('q', '').strip()
+        if q:
+            users = users.filter(Q(username__istartswith=q) | Q(email__istartswith=q))
+
+        paginator = NewestIdPagination()
+        page = paginator.paginate_queryset(users, request, view=self)
         data = []
-        for u in users:
-            try:
-                role = UserRole.objects.get(user=u).role
-            except UserRole.DoesNotExist:
-                role = 'user'
+        for u in page:
+            role = getattr(getattr(u, 'userrole', None), 'role', None) or 'user'
             avatar = None
-            try:
-                prof = getattr(u, 'userprofile', None)
-                if prof and prof.avatar and hasattr(prof.avatar, 'url'):
-                    avatar = request.build_absolute_uri(prof.avatar.url)
-            except Exception:
-                avatar = None
+            prof = getattr(u, 'userprofile', None)
+            if prof and prof.avatar:
+                avatar = request.build_absolute_uri(prof.avatar.url)
             data.append({
                 'id': u.id,
                 'username': u.username,
@@ -438,7 +455,7 @@ class UsersListView(APIView):
                 'role': role,
                 'avatar': avatar,
             })
-        return Response({'count': len(data), 'results': data})
+        return paginator.get_paginated_response(data)
 
 
 class SetUserRoleView(APIView):
@@ -482,7 +499,7 @@ class PagePermissionListCreateView(APIView):
     permission_classes = [IsAdminOrSuperEmployee]
 
     def get(self, request):
-        perms = PagePermission.objects.all()
+        perms = PagePermission.objects.prefetch_related('allowed_users')
         serializer = PagePermissionSerializer(perms, many=True, context={'request': request})
         return Response(serializer.data)
 
@@ -1,6 +1,6 @@
 "use client";
 
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import apiClient from '@/lib/api-client';
 
 export default function GroupsManager() {
@@ -13,7 +13,9 @@ export default function GroupsManager() {
   const [debugInfo, setDebugInfo] = useState<string | null>(null);
   const [expanded, setExpanded] = useState<Record<string, boolean>>({});
   const [membersMap, setMembersMap] = useState<Record<string, any[]>>({});
-  const [allUsers, setAllUsers] = useState<any[]>([]);
+  const [userQuery, setUserQuery] = useState<Record<string, string>>({});
+  const [userMatches, setUserMatches] = useState<Record<string, any[]>>({});
+  const latestQuery = useRef<Record<string, string>>({});
   const [addingMember, setAddingMember] = useState<Record<string, boolean>>({});
   const [selectedUser, setSelectedUser] = useState<Record<string, string>>({});
 
@@ -67,11 +69,15 @@ export default function GroupsManager() {
     }
   };
 
-  const loadUsers = async () => {
-    if (allUsers.length) return;
+  // the picker offers the first page of server-side matches (?q=), not the whole user table
+  const searchUsers = async (key: string, q: string) => {
+    setUserQuery(s => ({ ...s, [key]: q }));
+    latestQuery.current[key] = q;
     try {
-      const u = await apiClient.users.listUsers();
-      setAllUsers(Array.isArray(u) ? u : (u.results ?? []));
+      const page = await apiClient.users.listUsers(q.trim() ? { q: q.trim() } : undefined);
+      // a slower response for an earlier keystroke must not replace newer matches
+      if (latestQuery.current[key] !== q) return;
+      setUserMatches(m => ({ ...m, [key]: page.results }));
     } catch (err) {
       console.error('Failed to load users', err);
       const e = err as any;
@@ -169,7 +175,7 @@ export default function GroupsManager() {
                       <div className="text-xs text-gray-500 dark:text-gray-400">{g.description ?? ''}</div>
                     </div>
                     <div className="flex items-center gap-2">
-                      <button onClick={() => { toggleExpand(g); loadUsers(); }} className="text-sm text-indigo-600 hover:underline">{expanded[key] ? 'Hide' : 'Members'}</button>
+                      <button onClick={() => { toggleExpand(g); if (!userMatches[key]) searchUsers(key, ''); }} className="text-sm text-indigo-600 hover:underline">{expanded[key] ? 'Hide' : 'Members'}</button>
                       <button onClick={() => { /* could open edit */ }} className="text-sm text-gray-600 dark:text-gray-300">Edit</button>
                     </div>
                   </div>
@@ -190,9 +196,10 @@ export default function GroupsManager() {
                         )) : <div className="text-sm text-gray-500 dark:text-gray-400">No members</div>}
 
                         <div className="mt-2 flex items-center gap-2">
+                          <input value={userQuery[key] ?? ''} onChange={(e) => searchUsers(key, e.target.value)} placeholder="Search users" className="border border-gray-200 dark:border-gray-600 bg-white dark:bg-gray-700 text-gray-900 dark:text-gray-100 rounded p-2" />
                           <select value={selectedUser[key] ?? ''} onChange={(e) => setSelectedUser(s => ({ ...s, [key]: e.target.value }))} className="border border-gray-200 dark:border-gray-600 bg-white dark:bg-gray-700 text-gray-900 dark:text-gray-100 rounded p-2">
                             <option value="">Select user to add</option>
-                            {allUsers.map((u) => <option key={u.id ?? u.pk} value={u.id ?? u.pk}>{u.username ?? u.email}</option>)}
+                            {(userMatches[key] || []).map((u) => <option key={u.id ?? u.pk} value={u.id ?? u.pk}>{u.username ?? u.email}</option>)}
                           </select>
                           <button onClick={() => handleAddMember(g)} disabled={addingMember[key]} className="px-3 py-2 bg-indigo-600 hover:bg-indigo-700 dark:bg-indigo-500 dark:hover:bg-indigo-600 text-white rounded">{addingMember[key] ? 'Adding…' : 'Add Member'}</button>
                         </div>
@@ -1,7 +1,7 @@
 "use client";
 
 import React, { useEffect, useState } from 'react';
-import apiClient from '@/lib/api-client';
+import apiClient, { nextCursor } from '@/lib/api-client';
 
 export default function SubmissionsTable() {
   const [forms, setForms] = useState<any[]>([]);
@@ -10,6 +10,7 @@ export default function SubmissionsTable() {
 
   const [expandedSlug, setExpandedSlug] = useState<string | null>(null);
   const [submissionsMap, setSubmissionsMap] = useState<Record<string, any[]>>({});
+  const [cursorMap, setCursorMap] = useState<Record<string, string | null>>({});
   const [loadingSubmissions, setLoadingSubmissions] = useState<string | null>(null);
   const [selected, setSelected] = useState<any | null>(null);
 
@@ -41,8 +42,9 @@ export default function SubmissionsTable() {
 
     setLoadingSubmissions(slug);
     try {
-      const subs = await apiClient.forms.getFormSubmissions(slug);
-      setSubmissionsMap(prev => ({ ...prev, [slug]: subs || [] }));
+      const page = await apiClient.forms.getFormSubmissions(slug);
+      setSubmissionsMap(prev => ({ ...prev, [slug]: page.results }));
+      setCursorMap(prev => ({ ...prev, [slug]: nextCursor(page) }));
       setExpandedSlug(slug);
     } catch (err) {
       console.error('Failed to load submissions for', slug, err);
@@ -52,6 +54,22 @@ export default function SubmissionsTable() {
     }
   }
 
+  async function loadMoreSubmissions(slug: string) {
+    const cursor = cursorMap[slug];
+    if (!cursor) return;
+    setLoadingSubmissions(slug);
+    try {
+      const page = await apiClient.forms.getFormSubmissions(slug, { cursor });
+      setSubmissionsMap(prev => ({ ...prev, [slug]: [...(prev[slug] || []), ...page.results] }));
+      setCursorMap(prev => ({ ...prev, [slug]: nextCursor(page) }));
+    } catch (err) {
+      console.error('Failed to load submissions for', slug, err);
+      setFormsError('Failed to load submissions');
+    } finally {
+      setLoadingSubmissions(null);
+    }
+  }
+
   async function handleDeleteSubmission(formSlug: string, submissionId: number) {
     if (!confirm('Delete this submission? This action cannot be undone.')) return;
     try {
@@ -67,14 +85,19 @@ export default function SubmissionsTable() {
 
   async function handleDeleteAll(formSlug: string) {
     if (!confirm('Delete ALL submissions for this form? This cannot be undone.')) return;
-    const subs = submissionsMap[formSlug] || [];
-    if (!subs.length) return alert('No submissions to delete');
+    if (!(submissionsMap[formSlug] || []).length) return alert('No submissions to delete');
     try {
-      for (const s of subs) {
-        // sequential deletes to avoid overwhelming backend
-        await apiClient.submissions.deleteSubmission(s.id);
+      // only the loaded pages are in submissionsMap; keep taking the first page until it comes back empty
+      let page = await apiClient.forms.getFormSubmissions(formSlug);
+      while (page.results.length) {
+        for (const s of page.results) {
+          // sequential deletes to avoid overwhelming backend
+          await apiClient.submissions.deleteSubmission(s.id);
+        }
+        page = await apiClient.forms.getFormSubmissions(formSlug);
       }
       setSubmissionsMap(prev => ({ ...prev, [formSlug]: [] }));
+      setCursorMap(prev => ({ ...prev, [formSlug]: null }));
       setForms(prev => prev.map(f => f.slug === formSlug ? { ...f, submission_count: 0 } : f));
       alert('All submissions deleted');
     } catch (err: any) {
@@ -168,6 +191,13 @@ export default function SubmissionsTable() {
                               )}
                             </tbody>
                           </table>
+                          {cursorMap[f.slug] && (
+                            <div className="p-2 text-center">
+                              <button onClick={() => loadMoreSubmissions(f.slug)} disabled={loadingSubmissions === f.slug} className="px-3 py-1 text-sm text-pink-600 hover:underline">
+                                {loadingSubmissions === f.slug ? 'Loading…' : 'Load more'}
+                              </button>
+                            </div>
+                          )}
                         </div>
                       </div>
                     )}
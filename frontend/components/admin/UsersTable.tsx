@@ -1,11 +1,13 @@
 "use client";
 
 import React, { useEffect, useState } from 'react';
-import apiClient from '@/lib/api-client';
+import apiClient, { nextCursor } from '@/lib/api-client';
 
 export default function UsersTable() {
   const [users, setUsers] = useState<any[]>([]);
+  const [cursor, setCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState<boolean>(true);
+  const [loadingMore, setLoadingMore] = useState<boolean>(false);
   const [error, setError] = useState<string | null>(null);
   const [updating, setUpdating] = useState<number | null>(null);
 
@@ -19,8 +21,9 @@ export default function UsersTable() {
     setLoading(true);
     setError(null);
     try {
-      const res = await apiClient.users.listUsers();
-      setUsers(res.results || res);
+      const page = await apiClient.users.listUsers();
+      setUsers(page.results);
+      setCursor(nextCursor(page));
     } catch (e: any) {
       setError(e?.data?.message || e?.message || 'Failed to load users');
     } finally {
@@ -28,6 +31,21 @@ export default function UsersTable() {
     }
   };
 
+  const loadMore = async () => {
+    if (!cursor) return;
+    setLoadingMore(true);
+    setError(null);
+    try {
+      const page = await apiClient.users.listUsers({ cursor });
+      setUsers(prev => [...prev, ...page.results]);
+      setCursor(nextCursor(page));
+    } catch (e: any) {
+      setError(e?.data?.message || e?.message || 'Failed to load users');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => { load(); }, []);
 
   const handleRoleChange = async (userId: number, role: string) => {
@@ -135,6 +153,13 @@ export default function UsersTable() {
           ))}
         </tbody>
       </table>
+      {cursor && (
+        <div className="mt-3 text-center">
+          <button onClick={loadMore} disabled={loadingMore} className="px-3 py-1 text-sm text-indigo-600 hover:underline">
+            {loadingMore ? 'Loading…' : 'Load more'}
+          </button>
+        </div>
+      )}
     </div>
   );
 }
@@ -2,7 +2,7 @@
 
 import { useState, useEffect } from 'react';
 import { Loader2, AlertCircle, Inbox } from 'lucide-react';
-import { FormSchema, FormSubmission } from '@/lib/api-client';
+import { FormSchema, FormSubmission, nextCursor } from '@/lib/api-client';
 import { fromBackendFieldStructure, FormField } from '@/lib/form-builder-types';
 import SubmissionCard from './SubmissionCard';
 import apiClient from '@/lib/api-client';
@@ -16,6 +16,8 @@ type LoadingState = 'idle' | 'loading' | 'success' | 'error';
 
 export default function SubmissionsTab({ form, refreshTrigger = 0 }: SubmissionsTabProps) {
   const [submissions, setSubmissions] = useState<FormSubmission[]>([]);
+  const [cursor, setCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState<boolean>(false);
   const [loadingState, setLoadingState] = useState<LoadingState>('idle');
   const [errorMessage, setErrorMessage] = useState<string>('');
   const [fields, setFields] = useState<FormField[]>([]);
@@ -33,8 +35,9 @@ export default function SubmissionsTab({ form, refreshTrigger = 0 }: Submissions
     setErrorMessage('');
 
     try {
-      const data = await apiClient.forms.getFormSubmissions(form.slug);
-      setSubmissions(data);
+      const page = await apiClient.forms.getFormSubmissions(form.slug);
+      setSubmissions(page.results);
+      setCursor(nextCursor(page));
       setLoadingState('success');
     } catch (error) {
       setLoadingState('error');
@@ -46,6 +49,21 @@ export default function SubmissionsTab({ form, refreshTrigger = 0 }: Submissions
     }
   };
 
+  const fetchMore = async () => {
+    if (!cursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await apiClient.forms.getFormSubmissions(form.slug, { cursor });
+      setSubmissions(prev => [...prev, ...page.results]);
+      setCursor(nextCursor(page));
+    } catch (error) {
+      setLoadingState('error');
+      setErrorMessage(error instanceof Error ? error.message || 'Failed to load submissions' : 'An unexpected error occurred');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchSubmissions();
     // eslint-disable-next-line react-hooks/exhaustive-deps
@@ -104,7 +122,7 @@ export default function SubmissionsTab({ form, refreshTrigger = 0 }: Submissions
       <div className="flex items-center justify-between mb-2">
         <div>
           <h3 className="text-sm font-semibold text-gray-900">
-            Submissions ({submissions.length})
+            Submissions ({submissions.length}{cursor ? '+' : ''})
           </h3>
           <p className="text-xs text-gray-600">
             Most recent submissions appear first
@@ -128,6 +146,16 @@ export default function SubmissionsTab({ form, refreshTrigger = 0 }: Submissions
           />
         ))}
       </div>
+
+      {cursor && (
+        <button
+          onClick={fetchMore}
+          disabled={loadingMore}
+          className="w-full py-2 text-xs text-blue-600 hover:text-blue-700 font-medium"
+        >
+          {loadingMore ? 'Loading...' : 'Load more'}
+        </button>
+      )}
     </div>
   );
 }
@@ -57,6 +57,26 @@ export interface FormSchema {
   submission_count: number;
 }
 
+export interface Paginated<T> {
+  next: string | null;
+  previous: string | null;
+  results: T[];
+}
+
+/** Background storage cleanup started by a form/submission delete (HTTP 202). */
+export interface DeletionJob {
+  id: number;
+  kind: 'form' | 'submission';
+  target: string;
+  status: 'pending' | 'running' | 'done';
+  files_total: number;
+  files_deleted: number;
+  files_failed: number;
+  created_at: string;
+  finished_at: string | null;
+  status_url?: string;
+}
+
 export interface CreateFormPayload {
   title: string;
   description?: string;
@@ -265,6 +285,16 @@ async function request<T>(
   }
 }
 
+/**
+ * The `cursor` to pass for the page after `page`, or null on the last page.
+ * `next` is an absolute URL built from the backend's host, so only its
+ * cursor is reused and the follow-up request still goes through API_BASE_URL.
+ */
+export function nextCursor(page: Paginated<unknown>): string | null {
+  if (!page.next) return null;
+  return new URL(page.next, API_BASE_URL).searchParams.get('cursor');
+}
+
 // ==================== Authentication API ====================
 
 /**
@@ -428,9 +458,18 @@ export const formsAPI = {
   /**
    * Delete form by slug (SuperEmployee / admin only)
    * Backend endpoint: DELETE /api/forms/{slug}/
+   * Rows are removed immediately; poll the returned job for file cleanup.
+   */
+  async deleteForm(slug: string): Promise<DeletionJob> {
+    return request<DeletionJob>(`/api/forms/${slug}/`, { method: 'DELETE', requireAuth: true });
+  },
+
+  /**
+   * Status of a deletion job
+   * Backend endpoint: GET /api/deletion-jobs/{id}/
    */
-  async deleteForm(slug: string): Promise<void> {
-    return request<void>(`/api/forms/${slug}/`, { method: 'DELETE', requireAuth: true });
+  async getDeletionJob(id: number): Promise<DeletionJob> {
+    return request<DeletionJob>(`/api/deletion-jobs/${id}/`, { requireAuth: true });
   },
 
   /**
@@ -439,8 +478,8 @@ export const formsAPI = {
    */
   async getFormSubmissions(
     slug: string,
-    filters?: { search?: string; [key: string]: any }
-  ): Promise<FormSubmission[]> {
+    filters?: { search?: string; cursor?: string; [key: string]: any }
+  ): Promise<Paginated<FormSubmission>> {
     const queryParams = new URLSearchParams();
     if (filters) {
       Object.entries(filters).forEach(([key, value]) => {
@@ -454,20 +493,26 @@ export const formsAPI = {
       ? `/api/forms/${slug}/submissions/?${queryString}`
       : `/api/forms/${slug}/submissions/`;
 
-    return request<FormSubmission[]>(endpoint, { requireAuth: true });
+    // one cursor page (no `count`); pass nextCursor(page) as `cursor` for the next one
+    return request<Paginated<FormSubmission>>(endpoint, { requireAuth: true });
   },
 
   /**
    * Get related form data for dropdowns
    * Backend endpoint: GET /api/forms/{slug}/related_data/
+   * Optional `q` matches label prefixes and `limit` caps the option count.
    */
   async getRelatedData(
     slug: string,
     targetSlug: string,
-    displayField: string
+    displayField: string,
+    options?: { q?: string; limit?: number }
   ): Promise<any[]> {
+    const params = new URLSearchParams({ target_slug: targetSlug, display_field: displayField });
+    if (options?.q) params.append('q', options.q);
+    if (options?.limit) params.append('limit', String(options.limit));
     return request<any[]>(
-      `/api/forms/${slug}/related_data/?target_slug=${targetSlug}&display_field=${displayField}`,
+      `/api/forms/${slug}/related_data/?${params.toString()}`,
       { requireAuth: true }
     );
   },
@@ -494,8 +539,10 @@ export const submissionsAPI = {
    * List all submissions (only for user's forms)
    * Backend endpoint: GET /api/submissions/
    */
-  async listSubmissions(): Promise<FormSubmission[]> {
-    return request<FormSubmission[]>('/api/submissions/', { requireAuth: true });
+  async listSubmissions(cursor?: string): Promise<Paginated<FormSubmission>> {
+    // cursor-paginated like the per-form listing
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+    return request<Paginated<FormSubmission>>(`/api/submissions/${query}`, { requireAuth: true });
   },
 
   /**
@@ -509,8 +556,8 @@ export const submissionsAPI = {
    * Delete a specific submission
    * Backend endpoint: DELETE /api/submissions/{id}/
    */
-  async deleteSubmission(id: number): Promise<void> {
-    return request<void>(`/api/submissions/${id}/`, { method: 'DELETE', requireAuth: true });
+  async deleteSubmission(id: number): Promise<DeletionJob> {
+    return request<DeletionJob>(`/api/submissions/${id}/`, { method: 'DELETE', requireAuth: true });
   },
 };
 
@@ -631,8 +678,13 @@ export const userAPI = {
 };
 
 export const usersAPI = {
-  async listUsers() {
-    return request<any>('/api/users/', { requireAuth: true });
+  async listUsers(filters?: { role?: string; q?: string; cursor?: string }) {
+    const params = new URLSearchParams();
+    if (filters?.role) params.append('role', filters.role);
+    if (filters?.q) params.append('q', filters.q);
+    if (filters?.cursor) params.append('cursor', filters.cursor);
+    const query = params.toString();
+    return request<Paginated<any>>(`/api/users/${query ? `?${query}` : ''}`, { requireAuth: true });
   },
   async setRole(userId: number, role: string) {
     return request<any>(`/api/users/${userId}/role/`, { method: 'POST', body: JSON.stringify({ role }), requireAuth: true });